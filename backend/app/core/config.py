@@ -5,7 +5,7 @@ import json
 class Settings(BaseSettings):
     # API Keys
     GEMINI_API_KEY: str
-    FIREBASE_CREDENTIALS_PATH: str
+    FIREBASE_CREDENTIALS_PATH: str = ""
     
     # Security
     JWT_SECRET_KEY: str
@@ -19,6 +19,89 @@ class Settings(BaseSettings):
     def cors_origins_list(self) -> List[str]:
         return json.loads(self.CORS_ORIGINS)
     
+    # Storage ("firestore" or "sqlite")
+    STORAGE_BACKEND: str = "firestore"
+    SQLITE_PATH: str = "./data/app.db"
+    
+    # Gemini models by tier (see services/model_router.py)
+    GEMINI_MODEL_FAST: str = "models/gemini-2.5-flash-lite"
+    GEMINI_MODEL_DEFAULT: str = "models/gemini-2.5-flash"
+    GEMINI_MODEL_LARGE: str = "models/gemini-2.5-pro"
+    # Error rate above which a tier's requests are routed to the next larger model
+    MODEL_MAX_ERROR_RATE: float = 0.3
+    
+    # Generation
+    GENERATION_CONTEXT_TOKEN_BUDGET: int = 600
+    # Estimated input tokens per prompt; optional context is trimmed to fit (see services/prompt_registry.py)
+    PROMPT_TOKEN_BUDGET: int = 6000
+    REFINE_MAX_CONCURRENCY: int = 5
+    # Sections longer than this (estimated tokens) are refined as concurrent paragraph chunks
+    REFINE_CHUNK_TOKENS: int = 700
+    # Neighbouring text each chunk sees as read-only context
+    REFINE_OVERLAP_TOKENS: int = 120
+    # Characters of surrounding text sent with a span refinement, on each side
+    REFINE_SPAN_CONTEXT_CHARS: int = 400
+    # Sections per packed generation request (1 = one request per section)
+    PACKED_BATCH_SIZE_PPTX: int = 6
+    PACKED_BATCH_SIZE_DOCX: int = 1
+    
+    # Version retention: older versions are compacted into the archive store
+    VERSION_RETAIN_LAST: int = 10
+    VERSION_RETAIN_LIKED: bool = True
+    VERSION_RETAIN_FIRST: bool = True
+    VERSION_COMPACTION_INTERVAL_HOURS: float = 24  # 0 disables the periodic job
+    # Cache hit rates, model routing and prompt stats are logged this often (0 disables)
+    METRICS_LOG_INTERVAL_MINUTES: float = 15
+    ARCHIVE_BACKEND: str = "local"  # "local" or "gcs"
+    ARCHIVE_PATH: str = "./data/archive"
+    ARCHIVE_BUCKET: str = ""
+    
+    # Unreferenced section text is kept this long before garbage collection
+    BLOB_GC_GRACE_HOURS: float = 24
+    
+    # Most projects one bulk create/duplicate/delete request may touch
+    BULK_MAX_PROJECTS: int = 100
+    
+    # Feedback/comment writes are coalesced per project for this long (0 writes through)
+    FEEDBACK_FLUSH_DELAY_SECONDS: float = 2.0
+    # Failed timed flushes are retried with backoff this many times
+    FEEDBACK_FLUSH_MAX_RETRIES: int = 5
+    
+    # Full-text search: in-memory per-user index shards
+    SEARCH_MAX_SHARDS: int = 500
+    SEARCH_SNIPPET_CHARS: int = 160
+    
+    # Login identity and user profile caches
+    AUTH_CACHE_TTL_SECONDS: float = 300.0
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Background jobs
+    JOB_WORKERS: int = 4
+    # Finished jobs and their files are deleted this long after they last changed (0 keeps them)
+    JOB_RETENTION_HOURS: float = 24
+    
+    # Draft empty sections in the background after project creation (per-request opt-in overrides)
+    PREGENERATE_DRAFTS: bool = False
+    # Background job workers and concurrent background Gemini calls
+    PREGENERATE_CONCURRENCY: int = 1
+    
+    # Export pre-rendering after content changes
+    EXPORT_PRERENDER: bool = True
+    EXPORT_PRERENDER_DELAY_SECONDS: float = 5.0
+    EXPORT_CACHE_MAX_ENTRIES: int = 64
+    # Rendered section fragments reused across exports
+    EXPORT_FRAGMENT_CACHE_ENTRIES: int = 4096
+    
+    # HTML previews: whole documents per revision, and rendered sections
+    PREVIEW_CACHE_MAX_ENTRIES: int = 128
+    PREVIEW_FRAGMENT_CACHE_ENTRIES: int = 4096
+    
+    # Responses larger than this are gzip-compressed
+    GZIP_MIN_SIZE: int = 1024
+    
+    # Live updates
+    WS_HEARTBEAT_SECONDS: int = 30
+    
     # App Config
     APP_NAME: str = "AI Document Generator"
     APP_VERSION: str = "1.0.0"
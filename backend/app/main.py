@@ -1,8 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.routers import auth, projects, generate, export, refinement
+from app.routers import auth, projects, generate, export, refinement, jobs, search
+from app.services.job_service import job_queue
+from app.services.document_service import export_cache
+from app.services.version_archive_service import version_compactor
+from app.services.feedback_buffer import feedback_buffer
+from app.services.metrics_service import metrics_reporter
 from app.utils.logger import setup_logger
+from app.utils.responses import FastJSONResponse, CompressionMiddleware
 
 # Setup logging
 setup_logger()
@@ -11,7 +17,8 @@ setup_logger()
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    description="AI-powered document authoring and generation platform"
+    description="AI-powered document authoring and generation platform",
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -23,12 +30,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON/HTML responses (project payloads with full version history);
+# exports and streamed previews are sent as they are
+app.add_middleware(CompressionMiddleware, minimum_size=settings.GZIP_MIN_SIZE, compresslevel=6)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(projects.router, prefix="/api/projects", tags=["Projects"])
 app.include_router(generate.router, prefix="/api/generate", tags=["Generation"])
 app.include_router(refinement.router, prefix="/api/refine", tags=["Refinement"])
 app.include_router(export.router, prefix="/api/export", tags=["Export"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
+app.include_router(search.router, prefix="/api/search", tags=["Search"])
+
+@app.on_event("startup")
+async def start_background_workers():
+    """Start the background job workers"""
+    await job_queue.start()
+    version_compactor.start()
+    metrics_reporter.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """Stop job workers and cancel anything still running"""
+    await metrics_reporter.stop()
+    await version_compactor.stop()
+    await job_queue.stop()
+    await feedback_buffer.stop()
+    await export_cache.stop()
 
 @app.get("/")
 async def root():
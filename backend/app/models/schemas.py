@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional, Literal
+from typing import Any, List, Optional, Literal
 from datetime import datetime
 
 # AUTH SCHEMAS
@@ -68,6 +68,20 @@ class ProjectCreate(BaseModel):
     topic: str
     description: Optional[str] = None
     sections: List[SectionInput] = []   # take sections from frontend
+    pregenerate: Optional[bool] = None   # draft empty sections in the background (defaults to PREGENERATE_DRAFTS)
+
+
+class BulkProjectCreate(BaseModel):
+    projects: List[ProjectCreate]
+
+
+class BulkProjectIds(BaseModel):
+    project_ids: List[str]
+
+
+class ProjectClone(BaseModel):
+    title: Optional[str] = None   # defaults to "<title> (copy)"
+    with_history: bool = True     # False copies only the current content (template use)
 
 
 class ProjectUpdate(BaseModel):
@@ -96,8 +110,15 @@ class AIOutlineRequest(BaseModel):
     num_sections: int = Field(default=5, ge=3, le=10)
 
 
+class OutlineSection(BaseModel):
+    title: str = Field(min_length=1)
+    description: str = ""
+    key_points: Optional[List[str]] = None   # docx only
+
+
 class AIOutlineResponse(BaseModel):
-    sections: List[dict]  # [{"title": "...", "description": "..."}]
+    title: Optional[str] = None
+    sections: List[OutlineSection]
 
 
 class GenerateContentRequest(BaseModel):
@@ -113,11 +134,31 @@ class GenerateContentResponse(BaseModel):
     version: int
 
 
+class GenerateSectionsRequest(BaseModel):
+    """Generate several sections in one background job (all sections when section_ids is omitted)"""
+    project_id: str
+    section_ids: Optional[List[str]] = None
+    context: Optional[str] = None
+    tone: Literal["professional", "casual", "academic"] = "professional"
+
+
 #  REFINEMENT SCHEMAS 
 class RefineContentRequest(BaseModel):
+    """
+    Refine a whole section, or only a passage of it: a character range
+    [span_start, span_end) or a paragraph index (a bullet line for slides)
+    """
     project_id: str
     section_id: str
     refinement_prompt: str
+    span_start: Optional[int] = Field(default=None, ge=0)
+    span_end: Optional[int] = Field(default=None, ge=0)
+    paragraph_index: Optional[int] = Field(default=None, ge=0)
+
+
+class TextSpan(BaseModel):
+    start: int
+    end: int
 
 
 class RefineContentResponse(BaseModel):
@@ -125,6 +166,24 @@ class RefineContentResponse(BaseModel):
     content: str
     version: int
     diff: List[dict]  # Diff data for frontend visualization
+    span: Optional[TextSpan] = None  # Refined passage in the new content (span refinements only)
+
+
+class RefineProjectRequest(BaseModel):
+    """Apply one refinement prompt to several sections (all sections when section_ids is omitted)"""
+    project_id: str
+    refinement_prompt: str
+    section_ids: Optional[List[str]] = None
+
+
+class SectionFailure(BaseModel):
+    section_id: str
+    error: str
+
+
+class RefineProjectResponse(BaseModel):
+    sections: List[RefineContentResponse]
+    failed: List[SectionFailure] = []
 
 
 class FeedbackRequest(BaseModel):
@@ -144,3 +203,22 @@ class RevertVersionRequest(BaseModel):
 #  EXPORT SCHEMAS 
 class ExportRequest(BaseModel):
     project_id: str
+
+
+#  JOB SCHEMAS 
+class JobProgress(BaseModel):
+    done: int = 0
+    total: int = 0
+    message: str = ""
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    progress: Optional[JobProgress] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    has_artifact: bool = False
+    created_at: datetime
+    updated_at: datetime
@@ -11,7 +11,7 @@ async def register(user_data: UserRegister):
     """
     Register a new user
     - Creates Firebase Auth account
-    - Stores profile in Firestore
+    - Stores profile in the configured storage backend
     - Returns JWT token
     """
     return await auth_service.register_user(user_data)
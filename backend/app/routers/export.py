@@ -1,13 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from app.models.schemas import ExportRequest
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from app.models.schemas import ExportRequest, JobResponse
 from app.core.dependencies import get_current_user
 from app.services.document_service import DocumentService
-from app.utils.firebase_client import db
-from datetime import datetime
+from app.services.preview_service import PreviewService
+from app.services.job_service import job_queue, public_job
 
 router = APIRouter()
 document_service = DocumentService()
 
+def _export_response(project_id: str, doc_type: str, user_id: str) -> Response:
+    """Return a project as a download, pre-rendered if the content has not changed since"""
+    project_data = document_service.load_for_export(project_id, doc_type, user_id)
+    content, filename, media_type = document_service.get_export(project_data, doc_type)
+
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}"
+        }
+    )
+
 @router.post("/docx")
 async def export_word(
     request: ExportRequest,
@@ -20,43 +34,8 @@ async def export_word(
     - Returns file for download
     """
     try:
-        # Get project
-        project_ref = db.collection('projects').document(request.project_id)
-        project_doc = project_ref.get()
-        
-        if not project_doc.exists:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        project_data = project_doc.to_dict()
-        
-        # Verify ownership
-        if project_data['user_id'] != current_user['sub']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        # Verify document type
-        if project_data['doc_type'] != 'docx':
-            raise HTTPException(
-                status_code=400,
-                detail="Project is not a Word document"
-            )
-        
-        # Add formatted date for document
-        project_data['created_date'] = project_data['created_at'].strftime('%B %d, %Y')
-        
-        # Generate Word document
-        doc_bytes = document_service.create_word_document(project_data)
-        
-        # Return as downloadable file
-        filename = f"{project_data['title'].replace(' ', '_')}.docx"
-        
-        return Response(
-            content=doc_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
-        
+        return _export_response(request.project_id, 'docx', current_user['sub'])
+
     except HTTPException:
         raise
     except Exception as e:
@@ -77,43 +56,8 @@ async def export_powerpoint(
     - Returns file for download
     """
     try:
-        # Get project
-        project_ref = db.collection('projects').document(request.project_id)
-        project_doc = project_ref.get()
-        
-        if not project_doc.exists:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        project_data = project_doc.to_dict()
-        
-        # Verify ownership
-        if project_data['user_id'] != current_user['sub']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        # Verify document type
-        if project_data['doc_type'] != 'pptx':
-            raise HTTPException(
-                status_code=400,
-                detail="Project is not a PowerPoint presentation"
-            )
-        
-        # Add formatted date
-        project_data['created_date'] = project_data['created_at'].strftime('%B %d, %Y')
-        
-        # Generate PowerPoint
-        pptx_bytes = document_service.create_powerpoint(project_data)
-        
-        # Return as downloadable file
-        filename = f"{project_data['title'].replace(' ', '_')}.pptx"
-        
-        return Response(
-            content=pptx_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
-        
+        return _export_response(request.project_id, 'pptx', current_user['sub'])
+
     except HTTPException:
         raise
     except Exception as e:
@@ -121,3 +65,60 @@ async def export_powerpoint(
             status_code=500,
             detail=f"Presentation export failed: {str(e)}"
         )
+
+@router.post("/{doc_type}/async", response_model=JobResponse, status_code=202)
+async def export_async(
+    doc_type: str,
+    request: ExportRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Queue an export as a background job
+    Poll /api/jobs/{job_id} and download from /api/jobs/{job_id}/result
+    """
+    if doc_type not in ('docx', 'pptx'):
+        raise HTTPException(status_code=404, detail="Unknown export format")
+
+    job = await job_queue.submit(
+        'export', current_user['sub'],
+        {'project_id': request.project_id, 'doc_type': doc_type}
+    )
+    return public_job(job)
+
+@router.get("/preview/{project_id}")
+async def preview(
+    project_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Lightweight HTML preview with the export's layout
+    - Title page, table of contents and sections (Word) or title and bullet slides (PowerPoint)
+    - Streamed section by section on first render, then cached per project revision
+    - Supports If-None-Match revalidation
+    """
+    try:
+        project_data = PreviewService.load_for_preview(project_id, current_user['sub'])
+        etag = PreviewService.etag(project_data)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        cached = PreviewService.get_cached(project_data)
+        if cached is not None:
+            return Response(content=cached, media_type="text/html", headers=headers)
+
+        return StreamingResponse(
+            PreviewService.render(project_data),
+            media_type="text/html",
+            headers=headers
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Preview failed: {str(e)}"
+        )
@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.models.schemas import (
     AIOutlineRequest, AIOutlineResponse,
-    GenerateContentRequest, GenerateContentResponse
+    GenerateContentRequest, GenerateContentResponse,
+    GenerateSectionsRequest, JobResponse
 )
 from app.core.dependencies import get_current_user
 from app.services.gemini_service import GeminiService
-from app.utils.firebase_client import db
+from app.services.generation_service import GenerationService
+from app.services.job_service import job_queue, public_job
+from app.services.event_hub import event_hub, SECTION_ADDED
+from app.services.feedback_buffer import feedback_buffer
+from app.storage import get_storage
 from datetime import datetime
 import uuid
 
@@ -49,68 +54,14 @@ async def generate_content(
     - Stores generated content with version tracking
     """
     try:
-        # Get project for context
-        project_ref = db.collection('projects').document(request.project_id)
-        project_doc = project_ref.get()
-        
-        if not project_doc.exists:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        project_data = project_doc.to_dict()
-        
-        # Verify ownership
-        if project_data['user_id'] != current_user['sub']:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        # Find section
-        section = None
-        section_index = None
-        for idx, sec in enumerate(project_data['sections']):
-            if sec['id'] == request.section_id:
-                section = sec
-                section_index = idx
-                break
-        
-        if section is None:
-            raise HTTPException(status_code=404, detail="Section not found")
-        
-        # Generate content using AI with doc_type awareness
-        content = await gemini_service.generate_section_content(
-            section_title=section['title'],
-            project_topic=project_data['topic'],
+        return await GenerationService.generate_section(
+            project_id=request.project_id,
+            section_id=request.section_id,
+            user_id=current_user['sub'],
             context=request.context or "",
-            tone=request.tone,
-            doc_type=project_data.get('doc_type', 'docx')  # ✅ ADDED THIS LINE
+            tone=request.tone
         )
         
-        # Create initial version
-        version = {
-            'version': 1,
-            'content': content,
-            'prompt': f"Initial generation with {request.tone} tone",
-            'timestamp': datetime.utcnow(),
-            'feedback': None,
-            'comment': ''
-        }
-        
-        # Update section
-        section['content'] = content
-        section['versions'] = [version]
-        
-        # Update Firestore
-        project_data['sections'][section_index] = section
-        project_data['updated_at'] = datetime.utcnow()
-        project_ref.update({
-            'sections': project_data['sections'],
-            'updated_at': project_data['updated_at']
-        })
-        
-        return {
-            'section_id': request.section_id,
-            'content': content,
-            'version': 1
-        }
-        
     except HTTPException:
         raise
     except Exception as e:
@@ -119,6 +70,24 @@ async def generate_content(
             detail=f"Content generation failed: {str(e)}"
         )
 
+@router.post("/sections", response_model=JobResponse, status_code=202)
+async def generate_sections(
+    request: GenerateSectionsRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Generate content for several sections as a background job
+    - Returns immediately with a job id
+    - Poll /api/jobs/{job_id} for progress and per-section results
+    """
+    job = await job_queue.submit('generate_sections', current_user['sub'], {
+        'project_id': request.project_id,
+        'section_ids': request.section_ids,
+        'context': request.context or "",
+        'tone': request.tone
+    })
+    return public_job(job)
+
 @router.post("/add-section/{project_id}")
 async def add_section(
     project_id: str,
@@ -131,14 +100,13 @@ async def add_section(
     Used when user manually adds sections to outline
     """
     try:
-        project_ref = db.collection('projects').document(project_id)
-        project_doc = project_ref.get()
+        storage = get_storage()
+        await feedback_buffer.flush(project_id)
+        project_data = storage.get_project(project_id)
         
-        if not project_doc.exists:
+        if project_data is None:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project_data = project_doc.to_dict()
-        
         if project_data['user_id'] != current_user['sub']:
             raise HTTPException(status_code=403, detail="Access denied")
         
@@ -155,10 +123,11 @@ async def add_section(
         project_data['sections'].append(new_section)
         project_data['updated_at'] = datetime.utcnow()
         
-        project_ref.update({
+        storage.update_project(project_id, {
             'sections': project_data['sections'],
             'updated_at': project_data['updated_at']
         })
+        event_hub.publish(project_id, SECTION_ADDED, new_section['id'], section=new_section)
         
         return new_section
         
@@ -0,0 +1,60 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Response
+from app.models.schemas import JobResponse
+from app.core.dependencies import get_current_user
+from app.services.job_service import job_queue, public_job, load_artifact, SUCCEEDED
+
+router = APIRouter()
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Poll a background job
+    Returns status, progress and the JSON result once finished
+    """
+    job = job_queue.get_for_user(job_id, current_user['sub'])
+    return public_job(job)
+
+@router.get("/{job_id}/result")
+async def get_job_result(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Download the file produced by a finished job (e.g. an export)
+    Jobs without a file return their JSON result
+    """
+    job = job_queue.get_for_user(job_id, current_user['sub'])
+
+    if job['status'] != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    if not public_job(job)['has_artifact']:
+        return job.get('result')
+
+    content = await asyncio.to_thread(load_artifact, job)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Job result not found")
+
+    return Response(
+        content=content,
+        media_type=job['artifact_media_type'],
+        headers={
+            "Content-Disposition": f"attachment; filename={job['artifact_filename']}"
+        }
+    )
+
+@router.delete("/{job_id}", response_model=JobResponse)
+async def cancel_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Cancel a queued or running job
+    Finished jobs are returned unchanged
+    """
+    job = await job_queue.cancel_for_user(job_id, current_user['sub'])
+    return public_job(job)
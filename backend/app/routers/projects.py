@@ -1,39 +1,155 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.models.schemas import ProjectCreate, ProjectUpdate, ProjectResponse
+from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, Query
+from app.models.schemas import (
+    ProjectCreate, ProjectUpdate, ProjectClone, BulkProjectCreate, BulkProjectIds
+)
+from app.core.config import settings
 from app.core.dependencies import get_current_user
-from app.utils.firebase_client import db
-from google.cloud import firestore
+from app.core.security import verify_token
+from app.services.event_hub import event_hub, PROJECT_CREATED, PROJECT_UPDATED, PROJECT_DELETED
+from app.services.job_service import job_queue
+from app.services.feedback_buffer import feedback_buffer
+from app.services.version_archive_service import VersionArchiveService
+from app.storage import get_storage
+from app.storage.base import clone_data
+from app.utils.responses import fast_json
+import asyncio
 from datetime import datetime
 import uuid
-from typing import List
+from typing import List, Optional, Set
 
 router = APIRouter()
 
-@router.get("/", response_model=List[ProjectResponse])
-async def list_projects(current_user: dict = Depends(get_current_user)):
+# Heavy per-section fields that clients can opt out of with ?include=
+SECTION_PARTS = {'content', 'versions'}
+
+# Server-side bookkeeping never sent to clients (cached context summaries)
+INTERNAL_SECTION_FIELDS = {'summary'}
+
+
+def _parse_include(include: Optional[str]) -> Set[str]:
+    """Parse ?include=content,versions (omitted = everything, empty = neither)"""
+    if include is None:
+        return SECTION_PARTS
+    parts = {part.strip() for part in include.split(',') if part.strip()}
+    unknown = parts - SECTION_PARTS
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown include value: {', '.join(sorted(unknown))}"
+        )
+    return parts
+
+
+def _sparse_project(project_data: dict, include: Set[str]) -> dict:
+    """
+    Drop the section fields the client did not ask for, and internal ones
+    Storage already omits versions (leaving 'version_count') when they were not requested
+    """
+    excluded = (SECTION_PARTS - include) | INTERNAL_SECTION_FIELDS
+    return {
+        **project_data,
+        'sections': [
+            {key: value for key, value in section.items() if key not in excluded}
+            for section in project_data.get('sections', [])
+        ]
+    }
+
+
+@router.get("/")
+async def list_projects(
+    include: Optional[str] = Query(None, description="Section fields to return: content, versions"),
+    current_user: dict = Depends(get_current_user)
+):
     """
     Get all projects for current user
     Returns list of projects with metadata
+    - include= limits heavy section fields (e.g. include= for titles only)
     """
     try:
         user_id = current_user['sub']
-        projects_ref = db.collection('projects').where('user_id', '==', user_id)
-        projects = projects_ref.stream()
-        
-        result = []
-        for project in projects:
-            project_data = project.to_dict()
-            project_data['id'] = project.id
-            result.append(project_data)
+        parts = _parse_include(include)
+        result = get_storage().list_projects(user_id, with_versions='versions' in parts)
+        if 'versions' in parts:
+            for project in result:
+                feedback_buffer.overlay(project)
         
         # Sort by updated_at descending
         result.sort(key=lambda x: x.get('updated_at', datetime.min), reverse=True)
-        return result
+        return fast_json([_sparse_project(project, parts) for project in result])
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _new_project(project: ProjectCreate, user_id: str) -> dict:
+    """Build a project record (with ids) from a create request"""
+    now = datetime.utcnow()
+    return {
+        'id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'title': project.title,
+        'doc_type': project.doc_type,
+        'topic': project.topic,
+        'description': project.description,
+        # Build sections with ids and empty versions
+        'sections': [
+            {
+                "id": str(uuid.uuid4()),
+                "title": s.title,
+                "content": s.content,
+                "order": s.order,
+                "versions": []
+            }
+            for s in project.sections
+        ],
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+def _copy_fields(source: dict, title: Optional[str] = None) -> dict:
+    """Top-level fields that differ between a project and its copy"""
+    now = datetime.utcnow()
+    return {'title': title or f"{source['title']} (copy)", 'created_at': now, 'updated_at': now}
+
+
+def _copy_project(source: dict) -> dict:
+    """Copy of a project under a new id, with its content and inline version history"""
+    return {'id': str(uuid.uuid4()), **clone_data(source), **_copy_fields(source)}
+
+
+def _store_projects(user_id: str, projects: List[dict]) -> None:
+    """Write new projects and the user's project count in one batch"""
+    # Storage stamps revisions in place; 'id' is the key, not a stored field
+    records = {project.pop('id'): project for project in projects}
+    get_storage().create_projects(user_id, records)
+    for project_id, project in records.items():
+        project['id'] = project_id
+        event_hub.publish(project_id, PROJECT_CREATED, project=project)
+
+
+async def _pregenerate(project_data: dict, requested: Optional[bool]) -> None:
+    """Queue background drafts for empty sections when requested (or enabled by default)"""
+    pregenerate = settings.PREGENERATE_DRAFTS if requested is None else requested
+    if pregenerate and any(not s['content'].strip() for s in project_data['sections']):
+        job = await job_queue.submit(
+            "pregenerate_drafts", project_data['user_id'], {'project_id': project_data['id']}, background=True
+        )
+        project_data['pregeneration_job_id'] = job['id']
+
+
+def _check_bulk_size(count: int) -> None:
+    if count == 0:
+        raise HTTPException(status_code=400, detail="No projects given")
+    if count > settings.BULK_MAX_PROJECTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BULK_MAX_PROJECTS} projects per request"
+        )
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_project(
     project: ProjectCreate,
@@ -42,71 +158,134 @@ async def create_project(
     """
     Create a new project
     - Stores initial sections from configuration
+    - Optionally queues background drafts for empty sections (pregenerate)
     """
     try:
-        user_id = current_user['sub']
-        project_id = str(uuid.uuid4())
+        project_data = _new_project(project, current_user['sub'])
+        _store_projects(current_user['sub'], [project_data])
+        await _pregenerate(project_data, project.pregenerate)
+        return project_data
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Build sections with ids and empty versions
-        sections_data = [
-            {
-                "id": str(uuid.uuid4()),
-                "title": s.title,
-                "content": s.content,
-                "order": s.order,
-                "versions": []
-            }
-            for s in project.sections
-        ]
 
-        project_data = {
-            'user_id': user_id,
-            'title': project.title,
-            'doc_type': project.doc_type,
-            'topic': project.topic,
-            'description': project.description,
-            'sections': sections_data,  # use sections from request
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow()
-        }
+@router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def create_projects(
+    request: BulkProjectCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Create several projects at once (e.g. onboarding imports)
+    - All projects and the user's project count are written in one batch
+    """
+    try:
+        _check_bulk_size(len(request.projects))
         
-        db.collection('projects').document(project_id).set(project_data)
+        projects = [_new_project(project, current_user['sub']) for project in request.projects]
+        _store_projects(current_user['sub'], projects)
+        for project_data, project in zip(projects, request.projects):
+            await _pregenerate(project_data, project.pregenerate)
         
-        # Update user project count
-        user_ref = db.collection('users').document(user_id)
-        user_ref.update({'total_projects': firestore.Increment(1)})
+        return fast_json({'projects': projects}, status_code=status.HTTP_201_CREATED)
         
-        project_data['id'] = project_id
-        return project_data
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/bulk/duplicate", status_code=status.HTTP_201_CREATED)
+async def duplicate_projects(
+    request: BulkProjectIds,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Duplicate several projects with their content and version history
+    - Sources are read in one round trip; copies are written in one batch
+    - Ids that do not exist or belong to another user are returned in not_found
+    """
+    try:
+        _check_bulk_size(len(request.project_ids))
+        user_id = current_user['sub']
+        
+        for project_id in request.project_ids:
+            await feedback_buffer.flush(project_id)
+        sources = [
+            project for project in get_storage().get_projects(request.project_ids)
+            if project['user_id'] == user_id
+        ]
+        copies = [_copy_project(source) for source in sources]
+        if copies:
+            _store_projects(user_id, copies)
+        
+        found = {source['id'] for source in sources}
+        return fast_json({
+            'projects': copies,
+            'source_ids': [source['id'] for source in sources],
+            'not_found': [project_id for project_id in request.project_ids if project_id not in found]
+        }, status_code=status.HTTP_201_CREATED)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/bulk/delete")
+async def delete_projects(
+    request: BulkProjectIds,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Delete several projects at once
+    - Projects and the user's project count are updated in one batch
+    - Ids that do not exist or belong to another user are returned in not_found
+    """
+    try:
+        _check_bulk_size(len(request.project_ids))
+        
+        deleted = get_storage().delete_projects(current_user['sub'], request.project_ids)
+        for project_id in deleted:
+            event_hub.publish(project_id, PROJECT_DELETED, user_id=current_user['sub'])
+            await asyncio.to_thread(VersionArchiveService.delete_project, project_id)
+        
+        removed = set(deleted)
+        return {
+            'deleted': deleted,
+            'not_found': [project_id for project_id in request.project_ids if project_id not in removed]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{project_id}")
 async def get_project(
     project_id: str,
+    include: Optional[str] = Query(None, description="Section fields to return: content, versions"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get specific project by ID
     Verifies user ownership
+    - include= limits heavy section fields (e.g. include=content to skip version history)
     """
     try:
-        project_ref = db.collection('projects').document(project_id)
-        project = project_ref.get()
+        parts = _parse_include(include)
+        project_data = get_storage().get_project(project_id, with_versions='versions' in parts)
+        if 'versions' in parts:
+            feedback_buffer.overlay(project_data)
         
-        if not project.exists:
+        if project_data is None:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project_data = project.to_dict()
-        
         # Verify ownership
         if project_data['user_id'] != current_user['sub']:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        project_data['id'] = project_id
-        return project_data
+        return fast_json(_sparse_project(project_data, parts))
         
     except HTTPException:
         raise
@@ -126,13 +305,13 @@ async def update_project(
     - Tracks update timestamp
     """
     try:
-        project_ref = db.collection('projects').document(project_id)
-        project = project_ref.get()
+        storage = get_storage()
+        await feedback_buffer.flush(project_id)
+        project_data = storage.get_project(project_id)
         
-        if not project.exists:
+        if project_data is None:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project_data = project.to_dict()
         if project_data['user_id'] != current_user['sub']:
             raise HTTPException(status_code=403, detail="Access denied")
         
@@ -140,7 +319,8 @@ async def update_project(
         update_data = updates.dict(exclude_unset=True)
         update_data['updated_at'] = datetime.utcnow()
         
-        project_ref.update(update_data)
+        storage.update_project(project_id, update_data)
+        event_hub.publish(project_id, PROJECT_UPDATED, changes=update_data)
         
         return {"message": "Project updated successfully"}
         
@@ -160,21 +340,19 @@ async def delete_project(
     Verifies ownership before deletion
     """
     try:
-        project_ref = db.collection('projects').document(project_id)
-        project = project_ref.get()
+        storage = get_storage()
+        project_data = storage.get_project(project_id, with_versions=False)
         
-        if not project.exists:
+        if project_data is None:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project_data = project.to_dict()
         if project_data['user_id'] != current_user['sub']:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        project_ref.delete()
-        
-        # Update user project count
-        user_ref = db.collection('users').document(current_user['sub'])
-        user_ref.update({'total_projects': firestore.Increment(-1)})
+        # Deletes the project and updates the user's project count together
+        storage.delete_projects(current_user['sub'], [project_id])
+        event_hub.publish(project_id, PROJECT_DELETED, user_id=current_user['sub'])
+        await asyncio.to_thread(VersionArchiveService.delete_project, project_id)
         
         return {"message": "Project deleted successfully"}
         
@@ -182,3 +360,249 @@ async def delete_project(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/{project_id}/clone", status_code=status.HTTP_201_CREATED)
+async def clone_project(
+    project_id: str,
+    request: ProjectClone,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Copy-on-write clone of a project (with_history=false for a template-style copy)
+    - Section and version text is shared with the source until either side changes it
+    """
+    try:
+        storage = get_storage()
+        await feedback_buffer.flush(project_id)
+        source = storage.get_project(project_id, with_versions=False)
+        
+        if source is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        if source['user_id'] != current_user['sub']:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        new_id = str(uuid.uuid4())
+        if not storage.clone_project(project_id, new_id, _copy_fields(source, request.title), request.with_history):
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        project_data = storage.get_project(new_id, with_versions=False)
+        event_hub.publish(new_id, PROJECT_CREATED, project=project_data)
+        return fast_json(project_data, status_code=status.HTTP_201_CREATED)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{project_id}/changes")
+async def get_project_changes(
+    project_id: str,
+    since: int = Query(..., ge=0, description="Revision the client already has"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Delta sync: sections and versions changed after revision `since`
+    - Changed sections come back with only their new versions, plus `version_count`
+      so clients can tell when history was replaced
+    - `removed_section_ids` lists sections deleted since then
+    - `full` is true (with the whole project) when the delta cannot be computed
+    - Buffered feedback is included, like GET /projects/{id}; versions it touches
+      are sent again until it has been written
+    """
+    try:
+        project_data = get_storage().get_project(project_id)
+        
+        if project_data is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        if project_data['user_id'] != current_user['sub']:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        unwritten = feedback_buffer.unwritten_versions(project_id)
+        feedback_buffer.overlay(project_data)
+        
+        revision = project_data.get('revision', 0)
+        if since > revision or since < project_data.get('tombstone_horizon', 0):
+            return fast_json({
+                'revision': revision,
+                'since': since,
+                'full': True,
+                'project': _sparse_project(project_data, SECTION_PARTS)
+            })
+        
+        sections = []
+        for section in project_data['sections']:
+            versions = section.get('versions') or []
+            changed = [
+                v for v in versions
+                if v.get('revision', 0) > since or (section['id'], v['version']) in unwritten
+            ]
+            if section.get('revision', 0) <= since and not changed:
+                continue
+            sections.append({
+                **{key: value for key, value in section.items() if key not in INTERNAL_SECTION_FIELDS},
+                'versions': changed,
+                'version_count': len(versions)
+            })
+        
+        project_fields = None
+        if project_data.get('meta_revision', 0) > since:
+            project_fields = {
+                key: project_data.get(key)
+                for key in ('title', 'description', 'topic', 'doc_type', 'updated_at')
+            }
+        
+        return fast_json({
+            'revision': revision,
+            'since': since,
+            'full': False,
+            'project': project_fields,
+            'sections': sections,
+            'removed_section_ids': [
+                tombstone['id'] for tombstone in project_data.get('removed_sections', [])
+                if tombstone['revision'] > since
+            ]
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _check_owner(project_id: str, user_id: str) -> dict:
+    """404/403 unless the project exists and belongs to the user (skips loading history)"""
+    project_data = get_storage().get_project(project_id, with_versions=False)
+    
+    if project_data is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    if project_data['user_id'] != user_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return project_data
+
+
+def _archived_section(project_data: dict, section_id: str) -> Optional[dict]:
+    """The section, if part of its history has been moved to the archive"""
+    for section in project_data['sections']:
+        if section['id'] == section_id and section.get('archive'):
+            return section
+    return None
+
+
+@router.get("/{project_id}/sections/{section_id}/versions")
+async def list_section_versions(
+    project_id: str,
+    section_id: str,
+    cursor: Optional[int] = Query(None, ge=1, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Version history for one section, newest first, without content
+    - Returns version, prompt, timestamp, feedback and comment per version
+    - Pass next_cursor back as cursor to get the next (older) page
+    """
+    try:
+        project_data = _check_owner(project_id, current_user['sub'])
+        
+        versions = get_storage().list_versions(project_id, section_id, before=cursor, limit=limit + 1)
+        if versions is None:
+            raise HTTPException(status_code=404, detail="Section not found")
+        
+        # Retained versions (first draft, liked) can be older than archived ones, so merge by number
+        section = _archived_section(project_data, section_id)
+        if section is not None:
+            archived = await asyncio.to_thread(
+                VersionArchiveService.list_archived_metadata, project_id, section, cursor, limit + 1
+            )
+            versions = sorted(versions + archived, key=lambda v: v['version'], reverse=True)
+        
+        has_more = len(versions) > limit
+        versions = feedback_buffer.overlay_versions(project_id, section_id, versions[:limit])
+        return fast_json({
+            'versions': versions,
+            'next_cursor': versions[-1]['version'] if has_more else None
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{project_id}/sections/{section_id}/versions/{version}")
+async def get_section_version(
+    project_id: str,
+    section_id: str,
+    version: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get one version of a section including its content"""
+    try:
+        project_data = _check_owner(project_id, current_user['sub'])
+        
+        version_data = get_storage().get_version(project_id, section_id, version)
+        section = _archived_section(project_data, section_id)
+        if version_data is None and section is not None:
+            version_data = await asyncio.to_thread(
+                VersionArchiveService.find_version, project_id, section, version
+            )
+        if version_data is None:
+            raise HTTPException(status_code=404, detail="Version not found")
+        
+        return fast_json(feedback_buffer.overlay_versions(project_id, section_id, [version_data])[0])
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.websocket("/{project_id}/ws")
+async def project_updates(
+    websocket: WebSocket,
+    project_id: str,
+    token: str = Query(...)
+):
+    """
+    Push channel for section-level changes to a project
+    - Authenticates with the JWT passed as `token` (browsers cannot set headers on WebSockets)
+    - Sends one JSON message per change; a `resync` message means the client should re-fetch
+    - Sends a `ping` message when idle so dead connections are detected
+    """
+    # Accept before refusing, so the client receives the close code instead of a failed handshake
+    await websocket.accept()
+
+    payload = verify_token(token)
+    if payload is None:
+        await websocket.close(code=4401)
+        return
+
+    project_data = get_storage().get_project(project_id, with_versions=False)
+    if project_data is None or project_data['user_id'] != payload['sub']:
+        await websocket.close(code=4403)
+        return
+
+    subscription = event_hub.subscribe(project_id)
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    subscription.queue.get(),
+                    timeout=settings.WS_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                message = '{"type": "ping"}'
+
+            if subscription.queue.empty():
+                subscription.overflowed = False
+            await websocket.send_text(message)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        event_hub.unsubscribe(subscription)
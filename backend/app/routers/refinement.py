@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.models.schemas import (
     RefineContentRequest, RefineContentResponse,
-    FeedbackRequest, RevertVersionRequest
+    FeedbackRequest, RevertVersionRequest,
+    RefineProjectRequest, RefineProjectResponse, JobResponse
 )
 from app.core.dependencies import get_current_user
 from app.services.refinement_service import RefinementService
+from app.services.job_service import job_queue, public_job
 
 router = APIRouter()
 refinement_service = RefinementService()
@@ -17,6 +19,7 @@ async def refine_content(
     """
     Refine section content based on user prompt
     - Applies AI-powered refinements
+    - Optionally only to a character range or paragraph, spliced back into the section
     - Saves as new version with history
     - Returns diff for visualization
     """
@@ -25,7 +28,10 @@ async def refine_content(
             project_id=request.project_id,
             section_id=request.section_id,
             refinement_prompt=request.refinement_prompt,
-            user_id=current_user['sub']
+            user_id=current_user['sub'],
+            span_start=request.span_start,
+            span_end=request.span_end,
+            paragraph_index=request.paragraph_index
         )
         return result
         
@@ -37,6 +43,49 @@ async def refine_content(
             detail=f"Refinement failed: {str(e)}"
         )
 
+@router.post("/project", response_model=RefineProjectResponse)
+async def refine_project(
+    request: RefineProjectRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Refine the whole document (or selected sections) with one prompt
+    - Sections are refined concurrently with bounded fan-out
+    - One new version per section, committed in a single write
+    - Returns per-section diffs and any sections that failed
+    """
+    try:
+        return await refinement_service.refine_project(
+            project_id=request.project_id,
+            refinement_prompt=request.refinement_prompt,
+            user_id=current_user['sub'],
+            section_ids=request.section_ids
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Refinement failed: {str(e)}"
+        )
+
+@router.post("/bulk", response_model=JobResponse, status_code=202)
+async def refine_bulk(
+    request: RefineProjectRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Same as /project, run as a background job
+    Poll /api/jobs/{job_id} for progress and per-section diffs
+    """
+    job = await job_queue.submit('refine_project', current_user['sub'], {
+        'project_id': request.project_id,
+        'refinement_prompt': request.refinement_prompt,
+        'section_ids': request.section_ids
+    })
+    return public_job(job)
+
 @router.post("/feedback")
 async def add_feedback(
     request: FeedbackRequest,
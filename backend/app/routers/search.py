@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.core.dependencies import get_current_user
+from app.services.search_service import search_index
+from app.utils.responses import fast_json
+
+router = APIRouter()
+
+@router.get("")
+async def search_projects(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Search titles, topics and current section content across the user's projects
+    - Results are ranked by relevance (BM25, title matches weigh more)
+    - Each hit carries an HTML-escaped snippet with matches wrapped in <mark>
+    """
+    try:
+        return fast_json({
+            'query': q,
+            'results': search_index.search(current_user['sub'], q, limit)
+        })
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,108 @@
+import asyncio
+import re
+from typing import List, Tuple
+from app.core.config import settings
+from app.services.gemini_service import GeminiService
+from app.storage.blobs import content_hash
+from app.utils.cache import LRUCache
+from app.utils.tokens import estimate_tokens, trim_to_tokens
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+gemini_service = GeminiService()
+
+# Summaries are keyed by content hash, so each section version is summarized once
+_summary_cache = LRUCache(max_entries=2048)
+
+SUMMARY_MAX_WORDS = 50
+
+
+def _extractive_summary(content: str) -> str:
+    """Fallback summary when the model is unavailable: the opening sentences"""
+    text = re.sub(r'\s+', ' ', content.replace('- ', ' ')).strip()
+    words = text.split(' ')
+    return ' '.join(words[:SUMMARY_MAX_WORDS]) + ('...' if len(words) > SUMMARY_MAX_WORDS else '')
+
+
+class ContextService:
+    @staticmethod
+    async def get_summary(section: dict) -> str:
+        """
+        Return a compact summary of a section's current content
+        Cached on the section dict (persisted with the project) and in-process by content hash
+        """
+        content = section.get('content', '')
+        digest = content_hash(content)
+
+        cached = section.get('summary')
+        if cached and cached.get('hash') == digest:
+            return cached['text']
+
+        text = _summary_cache.get(digest)
+        if text is None:
+            try:
+                text = await gemini_service.summarize_content(
+                    section_title=section['title'],
+                    content=content,
+                    max_words=SUMMARY_MAX_WORDS
+                )
+            except Exception:
+                text = _extractive_summary(content)
+            _summary_cache.set(digest, text)
+
+        section['summary'] = {'hash': digest, 'text': text}
+        return text
+
+    @staticmethod
+    async def build_context(project_data: dict, section: dict, user_context: str = "") -> str:
+        """
+        Build generation context from summaries of the sections before `section`
+        Walks backwards from the nearest preceding section so the most relevant
+        summaries are kept when the token budget runs out. Missing summaries of the
+        sections that can fit are requested concurrently (at most REFINE_MAX_CONCURRENCY
+        at a time), not one round-trip after another.
+        """
+        budget = settings.GENERATION_CONTEXT_TOKEN_BUDGET
+        ordered = sorted(project_data['sections'], key=lambda s: s.get('order', 0))
+        position = next(i for i, s in enumerate(ordered) if s['id'] == section['id'])
+        preceding = [s for s in ordered[:position] if s.get('content', '').strip()]
+
+        # User-supplied context may use at most half the budget when there is document context to add
+        user_budget = budget // 2 if preceding else budget
+        user_context = trim_to_tokens(user_context.strip(), user_budget)
+        remaining = budget - estimate_tokens(user_context)
+
+        # Summaries are at most SUMMARY_MAX_WORDS, so only the nearest sections can fit;
+        # allow twice as many for summaries shorter than the maximum
+        per_line = estimate_tokens(' '.join(['word'] * SUMMARY_MAX_WORDS))
+        first = max(0, len(preceding) - (2 * remaining // per_line + 1))
+        semaphore = asyncio.Semaphore(settings.REFINE_MAX_CONCURRENCY)
+
+        async def summarize(previous: dict) -> str:
+            async with semaphore:
+                return await ContextService.get_summary(previous)
+
+        summaries = await asyncio.gather(*(summarize(s) for s in preceding[first:]))
+
+        lines: List[Tuple[int, str]] = []
+        for index in range(len(preceding) - 1, first - 1, -1):
+            previous = preceding[index]
+            summary = summaries[index - first]
+            line = f"- {previous['title']}: {summary}"
+            cost = estimate_tokens(line)
+            if cost > remaining:
+                break
+            lines.append((index, line))
+            remaining -= cost
+
+        parts = []
+        if lines:
+            lines.sort()
+            parts.append("Earlier sections of this document (stay consistent, do not repeat them):\n"
+                         + "\n".join(line for _, line in lines))
+        if user_context:
+            parts.append(user_context)
+
+        logger.info(f"Built context for {section['title']}: {len(lines)} summaries, "
+                    f"~{budget - remaining} tokens")
+        return "\n\n".join(parts)
@@ -1,16 +1,241 @@
 from docx import Document
+from docx.oxml import parse_xml as parse_docx_xml
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from lxml import etree
 from pptx import Presentation
+from pptx.oxml import parse_xml as parse_pptx_xml
 from pptx.util import Inches as PptxInches, Pt as PptxPt
 from pptx.enum.text import PP_ALIGN
 import io
+import asyncio
+import hashlib
+import json
+from fastapi import HTTPException
+from app.core.config import settings
+from app.storage import get_storage
+from app.services.job_service import job_handler, JobContext
+from app.services.event_hub import (
+    event_hub, CONTENT_UPDATED, VERSION_ADDED, REVERTED, SECTION_ADDED, PROJECT_UPDATED, PROJECT_DELETED
+)
+from app.utils.cache import LRUCache
 from app.utils.logger import get_logger
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
 logger = get_logger(__name__)
 
+EXPORT_FORMATS = {
+    'docx': {
+        'media_type': "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        'wrong_type': "Project is not a Word document"
+    },
+    'pptx': {
+        'media_type': "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        'wrong_type': "Project is not a PowerPoint presentation"
+    }
+}
+
+# Bump when the per-section formatting in DocumentService changes, to invalidate cached fragments
+FRAGMENT_STYLE_VERSION = 1
+
+# Serialized OOXML for rendered sections, keyed by (doc_type, style version, title, content hash)
+_fragment_cache = LRUCache(max_entries=settings.EXPORT_FRAGMENT_CACHE_ENTRIES)
+
+
+def _fragment_key(doc_type: str, section: dict) -> tuple:
+    digest = hashlib.sha1(section.get('content', '').encode('utf-8')).hexdigest()
+    return (doc_type, FRAGMENT_STYLE_VERSION, section['title'], digest)
+
+
+# Content slides show at most this many bullet points, for readability
+SLIDE_BULLET_LIMIT = 6
+
+
+def word_blocks(content: str) -> List[Tuple[str, bool]]:
+    """Paragraphs of a Word section as (text, is_bullet); bullet markers are stripped"""
+    blocks = []
+    for para_text in content.split('\n\n'):
+        text = para_text.strip()
+        if text:
+            if text.startswith(('•', '-', '*')):
+                blocks.append((text.lstrip('•-* '), True))
+            else:
+                blocks.append((text, False))
+    return blocks
+
+
+def slide_bullets(content: str) -> List[str]:
+    """Bullet points of a content slide: one per non-empty line, markers stripped"""
+    bullets = []
+    for line in content.split('\n'):
+        line = line.strip().lstrip('•-* ')
+        if line:
+            bullets.append(line)
+    return bullets[:SLIDE_BULLET_LIMIT]
+
+
+# Events after which the exported file would look different
+RERENDER_EVENTS = {CONTENT_UPDATED, VERSION_ADDED, REVERTED, SECTION_ADDED, PROJECT_UPDATED}
+
+
+def export_fingerprint(project_data: dict) -> str:
+    """Hash of everything that ends up in the exported file"""
+    sections = sorted(project_data['sections'], key=lambda s: s.get('order', 0))
+    material = json.dumps([
+        project_data['doc_type'],
+        project_data['title'],
+        project_data.get('topic'),
+        str(project_data.get('created_at')),
+        [(s['id'], s.get('order', 0), s['title'], s.get('content', '')) for s in sections]
+    ], default=str)
+    return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+
+class ExportCache:
+    """
+    Rendered exports keyed by project and content fingerprint
+    Content changes schedule a debounced background render, so a download
+    right after editing is usually served from a finished file. A newer
+    change cancels the pending render instead of queueing another one.
+    """
+
+    def __init__(self, max_entries: int, delay_seconds: float):
+        self.delay_seconds = delay_seconds
+        self._files = LRUCache(max_entries)
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    def get(self, project_data: dict) -> Optional[Tuple[bytes, str, str]]:
+        entry = self._files.get(project_data['id'])
+        if entry is None or entry['fingerprint'] != export_fingerprint(project_data):
+            return None
+        return entry['content'], entry['filename'], entry['media_type']
+
+    def put(self, project_data: dict, rendered: Tuple[bytes, str, str], fingerprint: Optional[str] = None) -> None:
+        content, filename, media_type = rendered
+        self._files.set(project_data['id'], {
+            'fingerprint': fingerprint or export_fingerprint(project_data),
+            'content': content,
+            'filename': filename,
+            'media_type': media_type
+        })
+
+    def on_event(self, project_id: str, event: dict) -> None:
+        """Event hub listener"""
+        if event['type'] == PROJECT_DELETED:
+            self._cancel(project_id)
+            self._files.pop(project_id)
+        elif event['type'] in RERENDER_EVENTS:
+            self.schedule(project_id)
+
+    def schedule(self, project_id: str) -> None:
+        """(Re)start the debounce timer for a project"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._cancel(project_id)
+        self._pending[project_id] = loop.create_task(self._render_later(project_id))
+
+    async def stop(self) -> None:
+        tasks = list(self._pending.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._pending.clear()
+
+    def _cancel(self, project_id: str) -> None:
+        task = self._pending.pop(project_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def _render_later(self, project_id: str) -> None:
+        try:
+            await asyncio.sleep(self.delay_seconds)
+
+            project_data = get_storage().get_project(project_id)
+            if project_data is None:
+                return
+            fingerprint = export_fingerprint(project_data)
+            cached = self._files.get(project_id)
+            if cached is not None and cached['fingerprint'] == fingerprint:
+                return
+
+            project_data['created_date'] = project_data['created_at'].strftime('%B %d, %Y')
+            rendered = await asyncio.to_thread(
+                DocumentService.render_export, project_data, project_data['doc_type']
+            )
+            # A newer edit rescheduled while rendering (the thread itself cannot be interrupted)
+            if self._pending.get(project_id) is not asyncio.current_task():
+                return
+            self.put(project_data, rendered, fingerprint)
+            logger.info(f"Pre-rendered export for project: {project_id}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Export pre-render failed for {project_id}: {str(e)}")
+        finally:
+            if self._pending.get(project_id) is asyncio.current_task():
+                del self._pending[project_id]
+
+
+export_cache = ExportCache(
+    max_entries=settings.EXPORT_CACHE_MAX_ENTRIES,
+    delay_seconds=settings.EXPORT_PRERENDER_DELAY_SECONDS
+)
+if settings.EXPORT_PRERENDER:
+    event_hub.add_listener(export_cache.on_event)
+
+
 class DocumentService:
+    @staticmethod
+    def load_for_export(project_id: str, doc_type: str, user_id: str) -> dict:
+        """
+        Fetch a project for export
+        Verifies ownership and that the project matches the requested format
+        """
+        project_data = get_storage().get_project(project_id)
+        
+        if project_data is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        # Verify ownership
+        if project_data['user_id'] != user_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        # Verify document type
+        if project_data['doc_type'] != doc_type:
+            raise HTTPException(
+                status_code=400,
+                detail=EXPORT_FORMATS[doc_type]['wrong_type']
+            )
+        
+        # Add formatted date for document
+        project_data['created_date'] = project_data['created_at'].strftime('%B %d, %Y')
+        return project_data
+    
+    @staticmethod
+    def render_export(project_data: dict, doc_type: str) -> Tuple[bytes, str, str]:
+        """Render a project and return (file bytes, filename, media type)"""
+        if doc_type == 'docx':
+            content = DocumentService.create_word_document(project_data)
+        else:
+            content = DocumentService.create_powerpoint(project_data)
+        
+        filename = f"{project_data['title'].replace(' ', '_')}.{doc_type}"
+        return content, filename, EXPORT_FORMATS[doc_type]['media_type']
+    
+    @staticmethod
+    def get_export(project_data: dict, doc_type: str) -> Tuple[bytes, str, str]:
+        """Serve a pre-rendered export when it matches the current content, else render and cache it"""
+        rendered = export_cache.get(project_data)
+        if rendered is not None:
+            logger.info(f"Export served from cache: {project_data['id']}")
+            return rendered
+        
+        rendered = DocumentService.render_export(project_data, doc_type)
+        export_cache.put(project_data, rendered)
+        return rendered
+    
     @staticmethod
     def create_word_document(project_data: dict) -> bytes:
         """
@@ -50,34 +275,7 @@ class DocumentService:
             
             # ===== Content Sections =====
             for section in sorted(project_data['sections'], key=lambda x: x.get('order', 0)):
-                # Section heading
-                heading = doc.add_heading(section['title'], level=1)
-                
-                # Section content (use latest refined content)
-                content = section.get('content', '')
-                
-                # Split into paragraphs
-                paragraphs = content.split('\n\n')
-                
-                for para_text in paragraphs:
-                    if para_text.strip():
-                        # Check if it's a bullet point
-                        if para_text.strip().startswith(('•', '-', '*')):
-                            para = doc.add_paragraph(para_text.strip().lstrip('•-* '), style='List Bullet')
-                        else:
-                            para = doc.add_paragraph(para_text.strip())
-                        
-                        # Format paragraph
-                        para.paragraph_format.line_spacing = 1.5
-                        para.paragraph_format.space_after = Pt(12)
-                        
-                        # Format text
-                        for run in para.runs:
-                            run.font.name = 'Calibri'
-                            run.font.size = Pt(11)
-                
-                # Add spacing after section
-                doc.add_paragraph()
+                DocumentService._add_word_section(doc, section)
             
             # Save to bytes
             buffer = io.BytesIO()
@@ -91,6 +289,57 @@ class DocumentService:
             logger.error(f"Word document creation error: {str(e)}")
             raise
     
+    @staticmethod
+    def _add_word_section(doc, section: dict) -> None:
+        """
+        Append one section to the document body
+        Reuses the cached OOXML fragment when the section is unchanged since the last export
+        """
+        body = doc.element.body
+        key = _fragment_key('docx', section)
+        fragment = _fragment_cache.get(key)
+        
+        if fragment is not None:
+            for xml in fragment:
+                element = parse_docx_xml(xml)
+                # Body content always goes before the trailing section properties
+                if body.sectPr is not None:
+                    body.sectPr.addprevious(element)
+                else:
+                    body.append(element)
+            return
+        
+        tail = 1 if body.sectPr is not None else 0
+        start = len(body) - tail
+        DocumentService._render_word_section(doc, section)
+        added = list(body)[start:len(body) - tail]
+        _fragment_cache.set(key, [etree.tostring(element) for element in added])
+    
+    @staticmethod
+    def _render_word_section(doc, section: dict) -> None:
+        """Render one section's heading and paragraphs into the document"""
+        # Section heading
+        heading = doc.add_heading(section['title'], level=1)
+        
+        # Section content (use latest refined content), split into paragraphs
+        for text, is_bullet in word_blocks(section.get('content', '')):
+            if is_bullet:
+                para = doc.add_paragraph(text, style='List Bullet')
+            else:
+                para = doc.add_paragraph(text)
+            
+            # Format paragraph
+            para.paragraph_format.line_spacing = 1.5
+            para.paragraph_format.space_after = Pt(12)
+            
+            # Format text
+            for run in para.runs:
+                run.font.name = 'Calibri'
+                run.font.size = Pt(11)
+        
+        # Add spacing after section
+        doc.add_paragraph()
+    
     @staticmethod
     def create_powerpoint(project_data: dict) -> bytes:
         """
@@ -117,42 +366,7 @@ class DocumentService:
             
             # ===== Content Slides =====
             for section in sorted(project_data['sections'], key=lambda x: x.get('order', 0)):
-                # Use bullet slide layout
-                bullet_slide_layout = prs.slide_layouts[1]
-                slide = prs.slides.add_slide(bullet_slide_layout)
-                
-                # Slide title
-                title_shape = slide.shapes.title
-                title_shape.text = section['title']
-                
-                # Slide content
-                content_box = slide.placeholders[1]
-                text_frame = content_box.text_frame
-                text_frame.clear()
-                text_frame.word_wrap = True
-                
-                # Get latest content
-                content = section.get('content', '')
-                
-                # Parse content into bullet points
-                lines = content.split('\n')
-                bullet_points = []
-                
-                for line in lines:
-                    line = line.strip()
-                    if line:
-                        # Remove existing bullet markers
-                        line = line.lstrip('•-* ')
-                        if line:
-                            bullet_points.append(line)
-                
-                # Add bullet points (limit to 6 per slide for readability)
-                for point in bullet_points[:6]:
-                    p = text_frame.add_paragraph()
-                    p.text = point
-                    p.level = 0
-                    p.font.size = PptxPt(18)
-                    p.space_after = PptxPt(12)
+                DocumentService._add_slide(prs, section)
             
             # Save to bytes
             buffer = io.BytesIO()
@@ -165,3 +379,58 @@ class DocumentService:
         except Exception as e:
             logger.error(f"PowerPoint creation error: {str(e)}")
             raise
+    
+    @staticmethod
+    def _add_slide(prs, section: dict) -> None:
+        """
+        Append one content slide
+        Reuses the cached shape tree when the slide is unchanged since the last export
+        """
+        # Use bullet slide layout
+        bullet_slide_layout = prs.slide_layouts[1]
+        slide = prs.slides.add_slide(bullet_slide_layout)
+        
+        key = _fragment_key('pptx', section)
+        fragment = _fragment_cache.get(key)
+        sp_tree = slide.shapes._spTree
+        
+        if fragment is not None:
+            sp_tree.getparent().replace(sp_tree, parse_pptx_xml(fragment[0]))
+            return
+        
+        DocumentService._render_slide(slide, section)
+        _fragment_cache.set(key, [etree.tostring(sp_tree)])
+    
+    @staticmethod
+    def _render_slide(slide, section: dict) -> None:
+        """Fill a bullet-layout slide with the section title and bullet points"""
+        # Slide title
+        title_shape = slide.shapes.title
+        title_shape.text = section['title']
+        
+        # Slide content
+        content_box = slide.placeholders[1]
+        text_frame = content_box.text_frame
+        text_frame.clear()
+        text_frame.word_wrap = True
+        
+        # Add bullet points from the latest content (limited per slide for readability)
+        for point in slide_bullets(section.get('content', '')):
+            p = text_frame.add_paragraph()
+            p.text = point
+            p.level = 0
+            p.font.size = PptxPt(18)
+            p.space_after = PptxPt(12)
+
+
+@job_handler("export")
+async def run_export_job(context: JobContext, params: dict) -> dict:
+    """Background export: renders off the event loop and attaches the file to the job"""
+    project_data = DocumentService.load_for_export(params['project_id'], params['doc_type'], context.user_id)
+    context.report_progress(0, 1, "Rendering")
+    content, filename, media_type = await asyncio.to_thread(
+        DocumentService.get_export, project_data, params['doc_type']
+    )
+    await context.set_artifact(content, filename, media_type)
+    context.report_progress(1, 1, "Done")
+    return {'filename': filename, 'size': len(content)}
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Event types pushed to project subscribers
+CONTENT_UPDATED = "content_updated"
+VERSION_ADDED = "version_added"
+FEEDBACK_CHANGED = "feedback_changed"
+REVERTED = "reverted"
+SECTION_ADDED = "section_added"
+PROJECT_CREATED = "project_created"
+PROJECT_UPDATED = "project_updated"
+PROJECT_DELETED = "project_deleted"
+RESYNC = "resync"
+
+EventListener = Callable[[str, dict], None]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class Subscription:
+    """One connected client: a bounded queue of pre-serialized events"""
+
+    def __init__(self, project_id: str, max_pending: int):
+        self.project_id = project_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+
+class ProjectEventHub:
+    """
+    Fan-out hub for per-project change events
+    Each event is serialized once and handed to every subscriber's queue,
+    so idle connections cost only a parked coroutine and an empty queue.
+    Subscribers that fall too far behind are told to resync instead of buffering forever.
+    """
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._listeners: List[EventListener] = []
+
+    def subscribe(self, project_id: str) -> Subscription:
+        subscription = Subscription(project_id, self.max_pending)
+        self._subscribers[project_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.project_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.project_id]
+
+    def add_listener(self, listener: EventListener) -> None:
+        """Register an in-process consumer called with (project_id, event) for every event"""
+        self._listeners.append(listener)
+
+    def subscriber_count(self, project_id: Optional[str] = None) -> int:
+        if project_id is not None:
+            return len(self._subscribers.get(project_id, ()))
+        return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, project_id: str, event_type: str, section_id: Optional[str] = None, **payload) -> dict:
+        """Push an event to every subscriber of a project; never blocks the caller"""
+        event = {
+            'type': event_type,
+            'project_id': project_id,
+            'section_id': section_id,
+            'timestamp': datetime.utcnow(),
+            **payload
+        }
+
+        for listener in self._listeners:
+            try:
+                listener(project_id, event)
+            except Exception as e:
+                logger.error(f"Event listener failed: {str(e)}")
+
+        subscribers = self._subscribers.get(project_id)
+        if not subscribers:
+            return event
+
+        message = json.dumps(event, default=_json_default)
+        for subscription in list(subscribers):
+            if subscription.overflowed:
+                continue
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Drop the backlog and ask the client to re-fetch once
+                subscription.overflowed = True
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(json.dumps({'type': RESYNC, 'project_id': project_id}))
+        return event
+
+
+event_hub = ProjectEventHub()
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.storage import get_storage
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# (section_id, version) -> fields to set on that version
+VersionUpdates = Dict[Tuple[str, int], dict]
+
+# Longest wait between retries of a failed timed flush
+RETRY_DELAY_CAP_SECONDS = 60.0
+
+
+class FeedbackBuffer:
+    """
+    Write-behind buffer for feedback and comments on versions
+    Updates are coalesced per project (the latest value per version wins) and
+    written as one field-targeted storage call after FEEDBACK_FLUSH_DELAY_SECONDS.
+    Readers overlay pending and in-flight updates so users always see their own
+    writes, and writers that rewrite whole sections flush first so nothing is
+    overwritten. Flushes of one project are serialized; updates stay visible
+    until the storage write has returned.
+    """
+
+    def __init__(self, delay_seconds: float, max_retries: int):
+        self.delay_seconds = delay_seconds
+        self.max_retries = max_retries
+        self._pending: Dict[str, VersionUpdates] = {}
+        self._inflight: Dict[str, VersionUpdates] = {}
+        self._flush_locks: Dict[str, threading.Lock] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def record(self, project_id: str, section_id: str, version: int, fields: dict) -> None:
+        with self._lock:
+            updates = self._pending.setdefault(project_id, {})
+            updates[(section_id, version)] = {**updates.get((section_id, version), {}), **fields}
+
+        if self.delay_seconds <= 0:
+            self.flush_project(project_id)
+        elif project_id not in self._timers:
+            self._timers[project_id] = asyncio.create_task(self._flush_later(project_id))
+
+    def has_pending(self, project_id: str) -> bool:
+        return project_id in self._pending or project_id in self._inflight
+
+    def _unwritten(self, project_id: str) -> VersionUpdates:
+        """In-flight updates with newer pending ones on top (call with self._lock held)"""
+        updates = dict(self._inflight.get(project_id, {}))
+        for key, fields in self._pending.get(project_id, {}).items():
+            updates[key] = {**updates.get(key, {}), **fields}
+        return updates
+
+    def unwritten_versions(self, project_id: str) -> Set[Tuple[str, int]]:
+        """(section_id, version) of versions with updates not yet in storage"""
+        with self._lock:
+            return set(self._unwritten(project_id))
+
+    def overlay(self, project_data: Optional[dict]) -> Optional[dict]:
+        """Apply unwritten updates to a project read from storage (in place)"""
+        if project_data is None:
+            return None
+        with self._lock:
+            updates = self._unwritten(project_data['id'])
+        if updates:
+            for section in project_data.get('sections', []):
+                for version in section.get('versions') or []:
+                    fields = updates.get((section['id'], version['version']))
+                    if fields:
+                        version.update(fields)
+        return project_data
+
+    def overlay_versions(self, project_id: str, section_id: str, versions: List[dict]) -> List[dict]:
+        """Apply unwritten updates to versions of one section (in place)"""
+        with self._lock:
+            updates = self._unwritten(project_id)
+        for version in versions:
+            fields = updates.get((section_id, version['version']))
+            if fields:
+                version.update(fields)
+        return versions
+
+    def flush_project(self, project_id: str) -> int:
+        """
+        Write a project's pending updates now; returns how many versions were written
+        Waits for a flush of the same project that is already running, so when this
+        returns everything recorded before the call is in storage.
+        """
+        with self._lock:
+            flush_lock = self._flush_locks.setdefault(project_id, threading.Lock())
+
+        with flush_lock:
+            with self._lock:
+                updates = self._pending.pop(project_id, None)
+                if not updates:
+                    return 0
+                self._inflight[project_id] = updates
+
+            try:
+                get_storage().update_version_fields(project_id, updates)
+            except Exception:
+                # Keep the updates for the next flush, under anything recorded meanwhile
+                with self._lock:
+                    newer = self._pending.setdefault(project_id, {})
+                    for key, fields in updates.items():
+                        newer[key] = {**fields, **newer.get(key, {})}
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(project_id, None)
+        return len(updates)
+
+    async def flush(self, project_id: str) -> None:
+        """Flush before a read-modify-write of the project's sections"""
+        if self.has_pending(project_id):
+            await asyncio.to_thread(self.flush_project, project_id)
+
+    async def stop(self) -> None:
+        """Cancel the timers and write everything still pending (on shutdown)"""
+        for task in self._timers.values():
+            task.cancel()
+        await asyncio.gather(*self._timers.values(), return_exceptions=True)
+        self._timers.clear()
+
+        for project_id in list(self._pending):
+            try:
+                self.flush_project(project_id)
+            except Exception as e:
+                logger.error(f"Feedback flush failed for {project_id}: {str(e)}")
+
+    async def _flush_later(self, project_id: str, attempt: int = 0) -> None:
+        # Retries back off exponentially, up to RETRY_DELAY_CAP_SECONDS
+        delay = self.delay_seconds if attempt == 0 else min(
+            max(self.delay_seconds, 1.0) * 2 ** attempt, RETRY_DELAY_CAP_SECONDS
+        )
+        await asyncio.sleep(delay)
+        # Updates recorded during the write below schedule a new timer
+        self._timers.pop(project_id, None)
+        try:
+            written = await asyncio.to_thread(self.flush_project, project_id)
+            logger.info(f"Flushed feedback for {written} versions in project: {project_id}")
+        except Exception as e:
+            logger.error(f"Feedback flush failed for {project_id} (attempt {attempt + 1}): {str(e)}")
+            if project_id in self._timers:
+                return
+            if attempt + 1 >= self.max_retries:
+                # The updates stay pending; the next record or flush tries again
+                logger.error(f"Giving up on timed feedback flushes for {project_id} after {attempt + 1} attempts")
+                return
+            self._timers[project_id] = asyncio.create_task(self._flush_later(project_id, attempt + 1))
+
+
+feedback_buffer = FeedbackBuffer(
+    delay_seconds=settings.FEEDBACK_FLUSH_DELAY_SECONDS,
+    max_retries=settings.FEEDBACK_FLUSH_MAX_RETRIES
+)
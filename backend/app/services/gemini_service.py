@@ -1,18 +1,221 @@
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from app.core.config import settings
+from app.services.model_router import model_router, Route
+from app.services.prompt_registry import prompt_registry, Prompt, TONE_GUIDELINES
+from app.models.schemas import AIOutlineResponse, OutlineSection
+from app.utils.json_repair import repair_json
+from app.utils.tokens import estimate_tokens, trim_to_tokens
+from pydantic import ValidationError
+import asyncio
 import json
 import re
+import time
+from difflib import SequenceMatcher
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from app.utils.logger import get_logger
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
 
 
 logger = get_logger(__name__)
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
+# Failures a larger model may not hit; auth, quota (429) and bad-request errors are raised as they are
+RETRYABLE_ERRORS = (google_exceptions.ServerError, ConnectionError, asyncio.TimeoutError)
+
+
+def _is_truncated(response) -> bool:
+    """True when the model stopped because it ran out of output tokens"""
+    candidates = getattr(response, 'candidates', None) or []
+    return bool(candidates) and getattr(candidates[0].finish_reason, 'name', None) == 'MAX_TOKENS'
+
+
+def _response_text(response) -> Optional[str]:
+    """The response text, or None when there is none (e.g. the budget went on thinking)"""
+    try:
+        return response.text
+    except ValueError:
+        return None
+
+
+def _outline_schema(doc_type: str) -> dict:
+    """Response schema for outline requests (Gemini structured output)"""
+    section = {
+        'type': 'OBJECT',
+        'properties': {
+            'title': {'type': 'STRING'},
+            'description': {'type': 'STRING'}
+        },
+        'required': ['title', 'description']
+    }
+    if doc_type == "docx":
+        section['properties']['key_points'] = {'type': 'ARRAY', 'items': {'type': 'STRING'}}
+        section['required'].append('key_points')
+    return {
+        'type': 'OBJECT',
+        'properties': {
+            'title': {'type': 'STRING'},
+            'sections': {'type': 'ARRAY', 'items': section}
+        },
+        'required': ['sections']
+    }
+
+
+def _parse_outline(text: str) -> Tuple[Optional[str], List[OutlineSection]]:
+    """
+    Parse (and locally repair) an outline response
+    Returns the suggested title and every section that validates; invalid entries are dropped
+    """
+    data = repair_json(text)
+    if isinstance(data, list):
+        data = {'sections': data}
+    if not isinstance(data, dict):
+        return None, []
+
+    # The model sometimes returns 'slides' for presentations
+    entries = data.get('sections') or data.get('slides') or []
+    sections = []
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or not str(entry.get('title', '')).strip():
+            continue
+        try:
+            sections.append(OutlineSection(**{**entry, 'title': str(entry['title']).strip()}))
+        except ValidationError:
+            continue
+
+    title = data.get('title')
+    return (title.strip() if isinstance(title, str) and title.strip() else None), sections
+
+
+def _parses_as_outline(text: str) -> bool:
+    return bool(_parse_outline(text)[1])
+
+
+def _parses_as_json(text: str) -> bool:
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _valid_section(text: str, doc_type: str) -> bool:
+    lines = [line for line in text.split('\n') if line.strip()]
+    if doc_type == "pptx":
+        return len(lines) >= 2
+    return len(text.split()) >= 40
+
+
+def _split_chunks(content: str, chunk_tokens: int) -> List[List[str]]:
+    """
+    Group a section's paragraphs into chunks of about `chunk_tokens` tokens
+    Paragraphs are never split; one longer than the target is a chunk of its own.
+    """
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for paragraph in (p.strip() for p in content.split('\n\n')):
+        if not paragraph:
+            continue
+        cost = estimate_tokens(paragraph)
+        if current and size + cost > chunk_tokens:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(paragraph)
+        size += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _echoes(paragraph: str, context: str) -> bool:
+    """True when a refined paragraph is a copy (or light rewrite) of a context paragraph"""
+    return bool(context) and SequenceMatcher(None, paragraph.split(), context.split()).ratio() >= 0.8
+
+
+def _join_chunks(refined: List[str], chunks: List[List[str]], contexts: List[Tuple[str, str]]) -> str:
+    """
+    Reassemble refined chunks, smoothing the seams between them
+    A chunk that comes back with extra paragraphs usually echoed its neighbouring
+    context; an extra paragraph at either end that matches that context, or the
+    end of the previous chunk, is dropped.
+    """
+    paragraphs: List[str] = []
+    for text, original, (before, after) in zip(refined, chunks, contexts):
+        parts = [p.strip() for p in text.split('\n\n') if p.strip()]
+        if len(parts) > len(original) and (
+            _echoes(parts[0], before) or (paragraphs and _echoes(parts[0], paragraphs[-1]))
+        ):
+            parts = parts[1:]
+        if len(parts) > len(original) and _echoes(parts[-1], after):
+            parts = parts[:-1]
+        paragraphs.extend(parts)
+    return '\n\n'.join(paragraphs)
+
+
+# Rough output size of one generated section, used to size packed batches
+ESTIMATED_OUTPUT_TOKENS = {
+    "pptx": 220,
+    "docx": 480
+}
+
+
+class PriorityGate:
+    """
+    Holds background Gemini calls while any interactive call is in flight
+    Background calls are also limited to `background_limit` at a time.
+    Calls already running are never preempted.
+    """
+
+    def __init__(self, background_limit: int):
+        self.background_limit = background_limit
+        self._interactive = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._background: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self, background: bool):
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            self._idle.set()
+            self._background = asyncio.Semaphore(self.background_limit)
+
+        if not background:
+            self._interactive += 1
+            self._idle.clear()
+            try:
+                yield
+            finally:
+                self._interactive -= 1
+                if self._interactive == 0:
+                    self._idle.set()
+            return
+
+        async with self._background:
+            while self._interactive:
+                await self._idle.wait()
+            yield
+
+
+_gate = PriorityGate(settings.PREGENERATE_CONCURRENCY)
+_background = ContextVar('gemini_background', default=False)
+
+
+@contextmanager
+def background_priority():
+    """Run Gemini calls made inside this block (and tasks it spawns) at background priority"""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
 
 class GeminiService:
     def __init__(self):
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+        # One client per (model, system instruction); templates have few instruction variants
+        self._models: Dict[Tuple[str, str], genai.GenerativeModel] = {}
         self.generation_config = {
             'temperature': 0.7,
             'top_p': 0.95,
@@ -20,6 +223,81 @@ class GeminiService:
             'max_output_tokens': 2048,
         }
     
+    def _model_for(self, route: Route, system: str):
+        key = (route.model, system)
+        if key not in self._models:
+            self._models[key] = genai.GenerativeModel(route.model, system_instruction=system or None)
+        return self._models[key]
+    
+    async def _generate(
+        self,
+        task: str,
+        prompt: Prompt,
+        doc_type: Optional[str] = None,
+        validate: Optional[Callable[[str], bool]] = None,
+        accept_truncated: bool = False,
+        **config
+    ) -> str:
+        """
+        Run a rendered prompt on the model chosen by the router for this task
+        The template's stable instructions go in the system instruction, the rest in the user turn.
+        Calls made under background_priority() wait for interactive calls to drain.
+        Truncated output, responses rejected by `validate` and retryable server errors
+        are retried once per tier on the next larger model with a bigger output budget.
+        Callers that can repair truncated output themselves pass accept_truncated.
+        """
+        async with _gate.slot(_background.get()):
+            return await self._generate_routed(task, prompt, doc_type, validate, accept_truncated, config)
+    
+    async def _generate_routed(
+        self,
+        task: str,
+        prompt: Prompt,
+        doc_type: Optional[str],
+        validate: Optional[Callable[[str], bool]],
+        accept_truncated: bool,
+        config: dict
+    ) -> str:
+        route = model_router.route(task, doc_type)
+        while True:
+            generation_config = {**self.generation_config, **config, 'max_output_tokens': route.max_output_tokens}
+            started = time.perf_counter()
+            text = None
+            try:
+                response = await self._model_for(route, prompt.system).generate_content_async(
+                    prompt.user,
+                    generation_config=generation_config
+                )
+            except RETRYABLE_ERRORS as e:
+                error = e
+            else:
+                truncated = _is_truncated(response)
+                text = _response_text(response)
+                if text is None and not truncated:
+                    # Blocked or empty: a larger model would not answer differently
+                    raise ValueError(f"{task} response has no text")
+                if truncated and (text is None or not accept_truncated):
+                    error = "truncated response"
+                elif validate is not None and not validate(text):
+                    error = "invalid response"
+                else:
+                    error = None
+            model_router.record(route, (time.perf_counter() - started) * 1000, error is None)
+            
+            if error is None:
+                return text
+            
+            next_route = model_router.escalate(route)
+            if next_route is None:
+                if text is not None:
+                    # Best effort: let the caller's own handling deal with it
+                    return text
+                if isinstance(error, Exception):
+                    raise error
+                raise ValueError(f"{task} response was {error}")
+            logger.warning(f"{task} on {route.model} failed ({error}); retrying on {next_route.model}")
+            route = next_route
+    
     def _clean_markdown(self, content: str) -> str:
         """Remove markdown formatting artifacts from generated content"""
         # Remove bold markers
@@ -59,73 +337,68 @@ class GeminiService:
         Generate outline/structure suggestions based on topic
         """
         try:
-            if doc_type == "docx":
-                prompt = f"""You are a professional document consultant. Generate a detailed outline for a Word document about: "{topic}"
-
-Create exactly {num_sections} sections with:
-- Section title (clear and professional)
-- Brief description (2-3 sentences explaining what the section should cover)
-- 3 key points to include in that section
-
-Return ONLY valid JSON in this exact format:
-{{
-  "title": "Suggested Document Title",
-  "sections": [
-    {{
-      "title": "Section Title",
-      "description": "What this section covers",
-      "key_points": ["Point 1", "Point 2", "Point 3"]
-    }}
-  ]
-}}"""
-            else:  # pptx
-                prompt = f"""You are a presentation design expert. Generate a PowerPoint presentation outline for: "{topic}"
-
-Create exactly {num_sections} slides with:
-- Slide title (engaging and clear)
-- 2-3 full-sentence ideas describing what content should go on this slide (NOT 'Point 1, Point 2, Point 3')
-
-Return ONLY valid JSON in this exact format:
-{{
-  "title": "Presentation Title",
-  "sections": [
-    {{
-      "title": "Slide Title",
-      "description": "2-3 sentences describing the key ideas and content for this slide"
-    }}
-  ]
-}}"""
+            prompt = prompt_registry.render('outline', doc_type, topic=topic, num_sections=num_sections)
             
-            response = self.model.generate_content(
-                prompt,
-                generation_config=self.generation_config
+            text = await self._generate(
+                'outline', prompt, doc_type,
+                validate=_parses_as_outline,
+                accept_truncated=True,
+                response_mime_type='application/json',
+                response_schema=_outline_schema(doc_type)
             )
+            title, sections = _parse_outline(text)
             
-            # Parse JSON from response
-            text = response.text.strip()
+            # Ask only for what is missing instead of regenerating the whole outline
+            missing = num_sections - len(sections)
+            if missing > 0 and sections:
+                logger.info(f"Outline returned {len(sections)} of {num_sections} sections; requesting {missing} more")
+                sections += await self._complete_outline(topic, doc_type, sections, missing)
             
-            # Remove markdown code blocks if present
-            if text.startswith('```json'):
-                text = text[7:-3].strip()
-            elif text.startswith('```'):
-                text = text[3:-3].strip()
+            if not sections:
+                return self._get_fallback_outline(topic, doc_type, num_sections)
             
-            structure = json.loads(text)
-
-            # If model still returned 'slides', normalize to 'sections'
-            if doc_type == "pptx" and "slides" in structure and "sections" not in structure:
-                structure["sections"] = structure.pop("slides")
+            # Pad with placeholders only if the follow-up request also came back short
+            fallback = self._get_fallback_outline(topic, doc_type, num_sections)['sections']
+            sections = sections[:num_sections] + [
+                OutlineSection(**entry) for entry in fallback[len(sections):]
+            ]
             
             logger.info(f"Generated {doc_type} outline for topic: {topic}")
-            return structure
+            return AIOutlineResponse(title=title or topic, sections=sections).dict(exclude_none=True)
             
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {str(e)}")
-            return self._get_fallback_outline(topic, doc_type, num_sections)
         except Exception as e:
             logger.error(f"Outline generation error: {str(e)}")
             return self._get_fallback_outline(topic, doc_type, num_sections)
     
+    async def _complete_outline(
+        self,
+        topic: str,
+        doc_type: str,
+        existing: List[OutlineSection],
+        missing: int
+    ) -> List[OutlineSection]:
+        """Request the sections missing from a partial outline"""
+        listing = "\n".join(f"{i}. {section.title}" for i, section in enumerate(existing, 1))
+        prompt = prompt_registry.render(
+            'outline_completion', doc_type, topic=topic, listing=listing, missing=missing
+        )
+        
+        try:
+            text = await self._generate(
+                'outline', prompt, doc_type,
+                validate=_parses_as_outline,
+                accept_truncated=True,
+                response_mime_type='application/json',
+                response_schema=_outline_schema(doc_type)
+            )
+        except Exception as e:
+            logger.error(f"Outline completion error: {str(e)}")
+            return []
+        
+        known = {section.title.lower() for section in existing}
+        added = [section for section in _parse_outline(text)[1] if section.title.lower() not in known]
+        return added[:missing]
+    
     def _get_fallback_outline(self, topic: str, doc_type: str, num_sections: int) -> dict:
         """Fallback outline if AI generation fails"""
         if doc_type == "docx":
@@ -165,86 +438,20 @@ Return ONLY valid JSON in this exact format:
         Context-aware generation based on project topic, section, and document type
         """
         try:
-            tone_guidelines = {
-                "professional": "Use formal, business-appropriate language. Be clear and concise.",
-                "casual": "Use conversational, friendly language. Be approachable.",
-                "academic": "Use scholarly language with references to research. Be precise and analytical."
-            }
-            
-            # Different prompts for different document types
-            if doc_type == "pptx":
-                prompt = f"""You are creating content for a PowerPoint slide about: "{project_topic}"
-
-Slide Title: {section_title}
-Tone: {tone}
-Tone Guidelines: {tone_guidelines.get(tone, tone_guidelines['professional'])}
-
-{f"Additional Context: {context}" if context else ""}
-
-Generate concise, impactful content for a presentation slide:
-- Create 4-6 bullet points
-- Each point: 15-25 words maximum  
-- Be clear, actionable, and memorable
-- Perfect for visual presentation
-- Focus on key insights
-
-IMPORTANT: Start directly with the bullet points. Do NOT include any introductory text like "Here is the content for your slides" or similar phrases.
-
-Format as bullet points (one per line, start each with -)"""
-            else:  # docx
-                prompt = f"""You are writing content for a document about: "{project_topic}"
-
-Section Title: {section_title}
-Tone: {tone}
-Tone Guidelines: {tone_guidelines.get(tone, tone_guidelines['professional'])}
-
-{f"Additional Context: {context}" if context else ""}
-
-Generate well-structured content for this section:
-- Length: 250-350 words
-- Include relevant details and examples
-- Use proper paragraphs (separate with double newlines)
-- Make it engaging and informative
-- Ensure it flows naturally
-
-IMPORTANT: Start directly with the content. Do NOT include any introductory text or the section title.
-
-Write ONLY the content, no headers or titles:"""
+            prompt = prompt_registry.render(
+                'section', doc_type,
+                topic=project_topic,
+                section_title=section_title,
+                context=f"Additional Context: {context}" if context else "",
+                tone=tone,
+                tone_guidelines=TONE_GUIDELINES.get(tone, TONE_GUIDELINES['professional'])
+            )
 
-            response = self.model.generate_content(
-                prompt,
-                generation_config=self.generation_config
+            text = await self._generate(
+                'section', prompt, doc_type,
+                validate=lambda t: _valid_section(self._clean_generated_content(t), doc_type)
             )
-            
-            content = response.text.strip()
-            
-            # Remove common unwanted introductory phrases
-            unwanted_phrases = [
-                "here is the content for your slides:",
-                "here is the content for your slide:",
-                "here are the points for your slide:",
-                "here are the bullet points:",
-                "here is the generated content:",
-                "here's the content:",
-                "content for your slide:",
-                "here is the content:",
-                "here are the points:",
-                "slide content:",
-            ]
-            
-            # Check and remove unwanted phrases (case-insensitive)
-            content_lower = content.lower()
-            for phrase in unwanted_phrases:
-                if content_lower.startswith(phrase):
-                    # Remove the phrase
-                    content = content[len(phrase):].strip()
-                    # Remove leading colon, dash, or newline if present
-                    while content and content[0] in [':', '-', '\n', ' ']:
-                        content = content[1:].strip()
-                    break
-            
-            # Clean markdown formatting
-            content = self._clean_markdown(content)
+            content = self._clean_generated_content(text)
             
             logger.info(f"Generated {doc_type} content for section: {section_title}")
             return content
@@ -253,58 +460,305 @@ Write ONLY the content, no headers or titles:"""
             logger.error(f"Content generation error: {str(e)}")
             raise
     
-    async def refine_content(self, original_content: str, refinement_prompt: str, section_title: str) -> str:
+    def _clean_generated_content(self, content: str) -> str:
+        """Strip conversational preambles and markdown from generated section content"""
+        content = content.strip()
+        
+        # Remove common unwanted introductory phrases
+        unwanted_phrases = [
+            "here is the content for your slides:",
+            "here is the content for your slide:",
+            "here are the points for your slide:",
+            "here are the bullet points:",
+            "here is the generated content:",
+            "here's the content:",
+            "content for your slide:",
+            "here is the content:",
+            "here are the points:",
+            "slide content:",
+        ]
+        
+        # Check and remove unwanted phrases (case-insensitive)
+        content_lower = content.lower()
+        for phrase in unwanted_phrases:
+            if content_lower.startswith(phrase):
+                # Remove the phrase
+                content = content[len(phrase):].strip()
+                # Remove leading colon, dash, or newline if present
+                while content and content[0] in [':', '-', '\n', ' ']:
+                    content = content[1:].strip()
+                break
+        
+        # Clean markdown formatting
+        return self._clean_markdown(content)
+    
+    def packed_batch_size(self, doc_type: str) -> int:
+        """Configured number of sections per packed request (1 disables packing)"""
+        if doc_type == "pptx":
+            return max(1, settings.PACKED_BATCH_SIZE_PPTX)
+        return max(1, settings.PACKED_BATCH_SIZE_DOCX)
+    
+    def _split_packed_batches(self, section_titles: List[str], doc_type: str) -> List[List[int]]:
+        """
+        Split section indexes into batches that fit the configured size
+        and the model's output token limit
+        """
+        per_section = ESTIMATED_OUTPUT_TOKENS.get(doc_type, ESTIMATED_OUTPUT_TOKENS['docx'])
+        # Leave headroom for JSON structure and length variance
+        capacity = max(1, int(model_router.policy('packed', doc_type).output_tokens * 0.8) // per_section)
+        size = min(self.packed_batch_size(doc_type), capacity)
+        indexes = list(range(len(section_titles)))
+        return [indexes[i:i + size] for i in range(0, len(indexes), size)]
+    
+    async def generate_sections_packed(
+        self,
+        section_titles: List[str],
+        project_topic: str,
+        context: str = "",
+        tone: str = "professional",
+        doc_type: str = "pptx"
+    ) -> List[str]:
+        """
+        Generate several sections/slides with one structured-JSON request per batch
+        Shares the topic, tone and instructions across the batch instead of repeating them per call.
+        Oversized batches are split automatically; entries that come back missing or
+        malformed are regenerated individually with generate_section_content.
+        """
+        results: List[Optional[str]] = [None] * len(section_titles)
+        
+        async def run_batch(batch: List[int]) -> None:
+            if len(batch) == 1:
+                return
+            try:
+                packed = await self._request_packed(
+                    [section_titles[i] for i in batch], project_topic, context, tone, doc_type
+                )
+            except Exception as e:
+                logger.error(f"Packed generation error: {str(e)}")
+                return
+            for position, index in enumerate(batch):
+                results[index] = packed.get(position + 1)
+        
+        await asyncio.gather(*(run_batch(batch) for batch in self._split_packed_batches(section_titles, doc_type)))
+        
+        missing = [i for i, content in enumerate(results) if content is None]
+        if missing:
+            logger.info(f"Packed generation fallback for {len(missing)} of {len(section_titles)} sections")
+            fallbacks = await asyncio.gather(*(
+                self.generate_section_content(
+                    section_title=section_titles[i],
+                    project_topic=project_topic,
+                    context=context,
+                    tone=tone,
+                    doc_type=doc_type
+                )
+                for i in missing
+            ))
+            for i, content in zip(missing, fallbacks):
+                results[i] = content
+        
+        return results
+    
+    async def _request_packed(
+        self,
+        section_titles: List[str],
+        project_topic: str,
+        context: str,
+        tone: str,
+        doc_type: str
+    ) -> Dict[int, str]:
+        """Issue one packed request and return {entry id: cleaned content} for valid entries"""
+        unit = "slide" if doc_type == "pptx" else "section"
+        prompt = prompt_registry.render(
+            'packed', doc_type,
+            topic=project_topic,
+            context=f"Additional Context: {context}" if context else "",
+            numbered="\n".join(f"{i}. {title}" for i, title in enumerate(section_titles, 1)),
+            tone=tone,
+            tone_guidelines=TONE_GUIDELINES.get(tone, TONE_GUIDELINES['professional'])
+        )
+        
+        text = await self._generate(
+            'packed', prompt, doc_type,
+            validate=_parses_as_json,
+            response_mime_type='application/json'
+        )
+        
+        data = json.loads(text)
+        entries = data.get('sections', []) if isinstance(data, dict) else []
+        
+        packed = {}
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            entry_id = entry.get('id')
+            content = entry.get('content')
+            if not isinstance(entry_id, int) or not 1 <= entry_id <= len(section_titles):
+                continue
+            if not isinstance(content, str) or not content.strip():
+                continue
+            content = self._clean_generated_content(content)
+            if doc_type == "pptx" and sum(1 for line in content.split('\n') if line.strip()) < 2:
+                continue
+            packed[entry_id] = content
+        
+        logger.info(f"Packed generation: {len(packed)} of {len(section_titles)} {unit}s returned")
+        return packed
+    
+    async def refine_content(
+        self,
+        original_content: str,
+        refinement_prompt: str,
+        section_title: str,
+        doc_type: str = "docx"
+    ) -> str:
         """
         Refine existing content based on user feedback
         Maintains context and structure while applying changes
         """
         try:
-            prompt = f"""You are editing content for a section titled: "{section_title}"
-
-ORIGINAL CONTENT:
-{original_content}
-
-USER REQUEST: {refinement_prompt}
-
-Apply the requested changes while:
-- Maintaining the overall structure and flow
-- Keeping relevant information
-- Ensuring clarity and coherence
-- Preserving the same approximate length unless specifically asked to change it
-
-IMPORTANT: Return ONLY the refined content. Do NOT include any introductory phrases or explanations.
-
-Return the refined content:"""
-
-            response = self.model.generate_content(
-                prompt,
-                generation_config=self.generation_config
+            chunks = _split_chunks(original_content, settings.REFINE_CHUNK_TOKENS)
+            if len(chunks) > 1:
+                refined_content = await self._refine_chunked(chunks, refinement_prompt, section_title, doc_type)
+                logger.info(f"Refined content for section: {section_title} ({len(chunks)} chunks)")
+                return refined_content
+            
+            prompt = prompt_registry.render(
+                'refine', doc_type,
+                section_title=section_title,
+                original_content=original_content,
+                refinement_prompt=refinement_prompt
             )
+
+            text = await self._generate('refine', prompt, doc_type, validate=lambda t: bool(t.strip()))
+            refined_content = self._clean_refined(text)
             
-            refined_content = response.text.strip()
+            logger.info(f"Refined content for section: {section_title}")
+            return refined_content
             
-            # Remove unwanted phrases from refined content too
-            unwanted_phrases = [
-                "here is the refined content:",
-                "here's the refined version:",
-                "refined content:",
-                "updated content:",
-            ]
+        except Exception as e:
+            logger.error(f"Refinement error: {str(e)}")
+            raise
+    
+    async def _refine_chunked(
+        self,
+        chunks: List[List[str]],
+        refinement_prompt: str,
+        section_title: str,
+        doc_type: str
+    ) -> str:
+        """
+        Long-content mode: refine paragraph chunks concurrently
+        Each chunk sees the end of the previous chunk and the start of the next as
+        read-only context, so every request stays well inside the output budget.
+        Chunks are bounded by REFINE_MAX_CONCURRENCY; any chunk failing fails the refinement.
+        """
+        overlap = settings.REFINE_OVERLAP_TOKENS
+        contexts = [
+            (
+                trim_to_tokens(chunks[i - 1][-1], overlap, keep_tail=True) if i > 0 else "",
+                trim_to_tokens(chunks[i + 1][0], overlap) if i + 1 < len(chunks) else ""
+            )
+            for i in range(len(chunks))
+        ]
+        semaphore = asyncio.Semaphore(settings.REFINE_MAX_CONCURRENCY)
+        
+        async def refine_chunk(index: int) -> str:
+            before, after = contexts[index]
+            prompt = prompt_registry.render(
+                'refine_chunk', doc_type,
+                section_title=section_title,
+                refinement_prompt=refinement_prompt,
+                part=index + 1,
+                parts=len(chunks),
+                before=f"CONTEXT BEFORE (do not return):\n{before}" if before else "",
+                chunk='\n\n'.join(chunks[index]),
+                after=f"CONTEXT AFTER (do not return):\n{after}" if after else ""
+            )
+            async with semaphore:
+                text = await self._generate('refine', prompt, doc_type, validate=lambda t: bool(t.strip()))
+            return self._clean_refined(text)
+        
+        refined = await asyncio.gather(*(refine_chunk(i) for i in range(len(chunks))))
+        return _join_chunks(refined, chunks, contexts)
+    
+    def _clean_refined(self, text: str) -> str:
+        """Strip conversational preambles and markdown from refined content"""
+        refined_content = text.strip()
+        
+        # Remove unwanted phrases from refined content too
+        unwanted_phrases = [
+            "here is the refined content:",
+            "here is the refined part:",
+            "here's the refined version:",
+            "refined content:",
+            "refined part:",
+            "updated content:",
+        ]
+        
+        refined_lower = refined_content.lower()
+        for phrase in unwanted_phrases:
+            if refined_lower.startswith(phrase):
+                refined_content = refined_content[len(phrase):].strip()
+                while refined_content and refined_content[0] in [':', '-', '\n', ' ']:
+                    refined_content = refined_content[1:].strip()
+                break
+        
+        # Clean markdown formatting
+        return self._clean_markdown(refined_content)
+    
+    async def refine_span(
+        self,
+        passage: str,
+        before: str,
+        after: str,
+        refinement_prompt: str,
+        section_title: str,
+        doc_type: str = "docx"
+    ) -> str:
+        """
+        Refine one selected passage of a section
+        Only the passage and a window of surrounding text are sent; returns the replacement passage.
+        """
+        try:
+            prompt = prompt_registry.render(
+                'refine_span', doc_type,
+                section_title=section_title,
+                refinement_prompt=refinement_prompt,
+                before=f"TEXT BEFORE (context, do not return):\n{before}" if before.strip() else "",
+                passage=passage,
+                after=f"TEXT AFTER (context, do not return):\n{after}" if after.strip() else ""
+            )
+
+            text = await self._generate('refine_span', prompt, doc_type, validate=lambda t: bool(t.strip()))
+            replacement = self._clean_refined(text)
             
-            refined_lower = refined_content.lower()
-            for phrase in unwanted_phrases:
-                if refined_lower.startswith(phrase):
-                    refined_content = refined_content[len(phrase):].strip()
-                    while refined_content and refined_content[0] in [':', '-', '\n', ' ']:
-                        refined_content = refined_content[1:].strip()
-                    break
+            # Cleanup normalizes bullets to "- "; keep the marker if the passage started with one
+            if passage.lstrip().startswith(('- ', '• ', '* ')) and not replacement.startswith('- '):
+                replacement = '- ' + replacement
             
-            # Clean markdown formatting
-            refined_content = self._clean_markdown(refined_content)
+            logger.info(f"Refined passage in section: {section_title}")
+            return replacement
             
-            logger.info(f"Refined content for section: {section_title}")
-            return refined_content
+        except Exception as e:
+            logger.error(f"Passage refinement error: {str(e)}")
+            raise
+    
+    async def summarize_content(self, section_title: str, content: str, max_words: int = 50) -> str:
+        """
+        Compress a section into a short summary
+        Used as cross-section context when generating later sections
+        """
+        try:
+            prompt = prompt_registry.render(
+                'summary', section_title=section_title, content=content, max_words=max_words
+            )
+
+            text = await self._generate('summary', prompt, validate=lambda t: bool(t.strip()), temperature=0.2)
+            summary = self._clean_markdown(text.strip())
+            logger.info(f"Summarized section: {section_title}")
+            return summary
             
         except Exception as e:
-            logger.error(f"Refinement error: {str(e)}")
+            logger.error(f"Summarization error: {str(e)}")
             raise
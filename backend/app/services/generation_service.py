@@ -0,0 +1,332 @@
+from app.storage import get_storage
+from app.services.gemini_service import GeminiService, background_priority
+from app.services.context_service import ContextService
+from app.services.job_service import job_handler, JobContext
+from app.services.event_hub import event_hub, VERSION_ADDED
+from app.services.feedback_buffer import feedback_buffer
+from app.utils.logger import get_logger
+from fastapi import HTTPException
+from datetime import datetime
+from typing import Callable, List, Optional
+
+logger = get_logger(__name__)
+gemini_service = GeminiService()
+
+class GenerationService:
+    @staticmethod
+    async def _get_owned_project(project_id: str, user_id: str) -> dict:
+        """Load a project and verify ownership"""
+        storage = get_storage()
+        project_data = storage.get_project(project_id)
+
+        if project_data is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        if project_data['user_id'] != user_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+
+        # Sections are rewritten afterwards, so buffered feedback must land first
+        if feedback_buffer.has_pending(project_id):
+            await feedback_buffer.flush(project_id)
+            project_data = storage.get_project(project_id) or project_data
+
+        return project_data
+
+    @staticmethod
+    async def _generate_into(
+        project_data: dict,
+        section: dict,
+        context: str,
+        tone: str,
+        label: str = "Initial generation"
+    ) -> dict:
+        """
+        Generate content for one section and reset its history to a fresh version 1
+        Context combines cached summaries of the preceding sections with the user's notes
+        """
+        context = await ContextService.build_context(project_data, section, context)
+        content = await gemini_service.generate_section_content(
+            section_title=section['title'],
+            project_topic=project_data['topic'],
+            context=context,
+            tone=tone,
+            doc_type=project_data.get('doc_type', 'docx')
+        )
+        return GenerationService._apply_generated(section, content, tone, label)
+
+    @staticmethod
+    async def _generate_batch_into(
+        project_data: dict,
+        batch: List[dict],
+        context: str,
+        tone: str,
+        label: str = "Initial generation"
+    ) -> List[dict]:
+        """
+        Generate consecutive sections with packed requests
+        The batch shares the context built for its first section; sections inside
+        the batch are written together, so they stay consistent with each other.
+        """
+        context = await ContextService.build_context(project_data, batch[0], context)
+        contents = await gemini_service.generate_sections_packed(
+            section_titles=[section['title'] for section in batch],
+            project_topic=project_data['topic'],
+            context=context,
+            tone=tone,
+            doc_type=project_data.get('doc_type', 'docx')
+        )
+        return [
+            GenerationService._apply_generated(section, content, tone, label)
+            for section, content in zip(batch, contents)
+        ]
+
+    @staticmethod
+    def _apply_generated(section: dict, content: str, tone: str, label: str) -> dict:
+        # Create initial version
+        version = {
+            'version': 1,
+            'content': content,
+            'prompt': f"{label} with {tone} tone",
+            'timestamp': datetime.utcnow(),
+            'feedback': None,
+            'comment': ''
+        }
+
+        section['content'] = content
+        section['versions'] = [version]
+        # The archived history belonged to the previous content
+        section.pop('archive', None)
+        return {
+            'section_id': section['id'],
+            'content': content,
+            'version': 1
+        }
+
+    @staticmethod
+    async def _merge_generated(project_id: str, project_data: dict, generated: List[dict]) -> Optional[dict]:
+        """
+        Write generated sections into the latest copy of the project
+        Edits made while the model was running are kept; only the generated sections
+        are replaced. Returns the stored project, or None if it was deleted meanwhile.
+        """
+        storage = get_storage()
+        await feedback_buffer.flush(project_id)
+        latest = storage.get_project(project_id)
+        if latest is None:
+            return None
+
+        by_id = {s['id']: s for s in generated}
+        snapshot = {s['id']: s for s in project_data['sections']}
+        for section in latest['sections']:
+            source = by_id.get(section['id'])
+            if source is not None:
+                section['content'] = source['content']
+                section['versions'] = source['versions']
+                section.pop('archive', None)
+                section.pop('summary', None)
+                continue
+            # Keep summaries built for context while the content is unchanged
+            previous = snapshot.get(section['id'])
+            if previous and previous.get('summary') and previous.get('content') == section.get('content'):
+                section['summary'] = previous['summary']
+
+        latest['updated_at'] = datetime.utcnow()
+        storage.update_project(project_id, {
+            'sections': latest['sections'],
+            'updated_at': latest['updated_at']
+        })
+        for section in latest['sections']:
+            if section['id'] in by_id:
+                GenerationService._publish_generated(project_id, section)
+        return latest
+
+    @staticmethod
+    def _publish_generated(project_id: str, section: dict) -> None:
+        """Notify subscribers that a section was regenerated with a fresh history"""
+        event_hub.publish(
+            project_id, VERSION_ADDED, section['id'],
+            content=section['content'],
+            version=section['versions'][-1],
+            replaces_history=True
+        )
+
+    @staticmethod
+    async def generate_section(
+        project_id: str,
+        section_id: str,
+        user_id: str,
+        context: str = "",
+        tone: str = "professional"
+    ) -> dict:
+        """
+        Generate content for a single section/slide
+        Stores generated content with version tracking
+        """
+        try:
+            project_data = await GenerationService._get_owned_project(project_id, user_id)
+
+            section = next((s for s in project_data['sections'] if s['id'] == section_id), None)
+            if section is None:
+                raise HTTPException(status_code=404, detail="Section not found")
+
+            result = await GenerationService._generate_into(project_data, section, context, tone)
+
+            latest = await GenerationService._merge_generated(project_id, project_data, [section])
+            if latest is None or not any(s['id'] == section_id for s in latest['sections']):
+                raise HTTPException(status_code=404, detail="Section was deleted during generation")
+
+            logger.info(f"Section generated: {section_id}")
+            return result
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Content generation error: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Content generation failed: {str(e)}")
+
+    @staticmethod
+    async def generate_sections(
+        project_id: str,
+        user_id: str,
+        section_ids: Optional[List[str]] = None,
+        context: str = "",
+        tone: str = "professional",
+        progress: Optional[Callable[[int, int, str], None]] = None
+    ) -> List[dict]:
+        """
+        Generate content for several sections in document order
+        Slides are packed several per request (see PACKED_BATCH_SIZE_*); each batch is
+        merged into the latest copy of the project as soon as it is ready, so partial
+        progress survives failures and edits made meanwhile are kept
+        """
+        project_data = await GenerationService._get_owned_project(project_id, user_id)
+
+        sections = sorted(project_data['sections'], key=lambda s: s.get('order', 0))
+        if section_ids is not None:
+            wanted = set(section_ids)
+            sections = [s for s in sections if s['id'] in wanted]
+            if len(sections) != len(wanted):
+                raise HTTPException(status_code=404, detail="Section not found")
+
+        # Slides are short, so several fit in one request; long sections default to one per call
+        batch_size = gemini_service.packed_batch_size(project_data.get('doc_type', 'docx'))
+        batches = [
+            [s['id'] for s in sections[i:i + batch_size]]
+            for i in range(0, len(sections), batch_size)
+        ]
+
+        results = []
+        done = 0
+        for batch_ids in batches:
+            # Sections deleted since the previous batch are skipped
+            current = {s['id']: s for s in project_data['sections']}
+            batch = [current[section_id] for section_id in batch_ids if section_id in current]
+            if not batch:
+                continue
+            if progress:
+                progress(done, len(sections), f"Generating {batch[0]['title']}")
+
+            if len(batch) > 1:
+                generated = await GenerationService._generate_batch_into(project_data, batch, context, tone)
+            else:
+                generated = [await GenerationService._generate_into(project_data, batch[0], context, tone)]
+            done += len(batch_ids)
+
+            latest = await GenerationService._merge_generated(project_id, project_data, batch)
+            if latest is None:
+                logger.info(f"Project deleted during generation: {project_id}")
+                break
+            kept = {s['id'] for s in latest['sections']}
+            results.extend(r for r in generated if r['section_id'] in kept)
+            project_data = latest
+
+        if progress:
+            progress(len(sections), len(sections), "Done")
+
+        logger.info(f"Generated {len(results)} sections for project: {project_id}")
+        return results
+
+    @staticmethod
+    async def pregenerate_drafts(project_id: str, user_id: str, tone: str = "professional") -> List[dict]:
+        """
+        Speculatively draft every empty section of a new project, at background priority
+        Drafts only land in sections that are still empty when they are ready,
+        so anything the user generated or typed in the meantime wins.
+        """
+        project_data = await GenerationService._get_owned_project(project_id, user_id)
+        batch_size = gemini_service.packed_batch_size(project_data.get('doc_type', 'docx'))
+        storage = get_storage()
+
+        def is_empty(section: dict) -> bool:
+            return not section.get('content', '').strip() and not section.get('versions')
+
+        attempted = set()
+        results = []
+        while True:
+            pending = [
+                s for s in sorted(project_data['sections'], key=lambda s: s.get('order', 0))
+                if is_empty(s) and s['id'] not in attempted
+            ]
+            if not pending:
+                break
+            batch = pending[:batch_size]
+            attempted.update(s['id'] for s in batch)
+
+            with background_priority():
+                if len(batch) > 1:
+                    drafts = await GenerationService._generate_batch_into(project_data, batch, "", tone, "Background draft")
+                else:
+                    drafts = [await GenerationService._generate_into(project_data, batch[0], "", tone, "Background draft")]
+
+            # Merge into the latest copy so concurrent edits are not overwritten
+            await feedback_buffer.flush(project_id)
+            latest = storage.get_project(project_id)
+            if latest is None:
+                logger.info(f"Project deleted during pre-generation: {project_id}")
+                break
+            latest_sections = {s['id']: s for s in latest['sections']}
+            applied = []
+            for section in batch:
+                target = latest_sections.get(section['id'])
+                if target is not None and is_empty(target):
+                    target['content'] = section['content']
+                    target['versions'] = section['versions']
+                    applied.append(target)
+
+            if applied:
+                latest['updated_at'] = datetime.utcnow()
+                storage.update_project(project_id, {
+                    'sections': latest['sections'],
+                    'updated_at': latest['updated_at']
+                })
+                for section in applied:
+                    GenerationService._publish_generated(project_id, section)
+                applied_ids = {s['id'] for s in applied}
+                results.extend(d for d in drafts if d['section_id'] in applied_ids)
+            project_data = latest
+
+        logger.info(f"Pre-generated {len(results)} drafts for project: {project_id}")
+        return results
+
+
+@job_handler("pregenerate_drafts")
+async def run_pregenerate_drafts_job(context: JobContext, params: dict) -> dict:
+    results = await GenerationService.pregenerate_drafts(
+        project_id=params['project_id'],
+        user_id=context.user_id,
+        tone=params.get('tone', "professional")
+    )
+    return {'sections': results}
+
+
+@job_handler("generate_sections")
+async def run_generate_sections_job(context: JobContext, params: dict) -> dict:
+    results = await GenerationService.generate_sections(
+        project_id=params['project_id'],
+        user_id=context.user_id,
+        section_ids=params.get('section_ids'),
+        context=params.get('context', ""),
+        tone=params.get('tone', "professional"),
+        progress=context.report_progress
+    )
+    return {'sections': results}
@@ -0,0 +1,364 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import HTTPException
+from app.core.config import settings
+from app.storage import get_storage, get_archive_store
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# How often finished jobs past JOB_RETENTION_HOURS are deleted
+JOB_SWEEP_INTERVAL_SECONDS = 3600
+
+JobHandler = Callable[["JobContext", dict], Awaitable[Any]]
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    """
+    Register a coroutine as the handler for a job kind
+    Handlers receive (JobContext, params) and return a JSON-serializable result
+    """
+    def decorator(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+class JobContext:
+    """Handle passed to running jobs for progress reporting and binary results"""
+
+    def __init__(self, backend: "JobBackend", job: dict):
+        self._backend = backend
+        self._job = job
+
+    @property
+    def job_id(self) -> str:
+        return self._job['id']
+
+    @property
+    def user_id(self) -> str:
+        return self._job['user_id']
+
+    def report_progress(self, done: int, total: int, message: str = "") -> None:
+        self._job['progress'] = {'done': done, 'total': total, 'message': message}
+        self._backend._persist_soon(self._job)
+
+    async def set_artifact(self, content: bytes, filename: str, media_type: str) -> None:
+        """
+        Attach a downloadable file to the job result
+        The file goes to the archive store; the job record only keeps its key.
+        """
+        key = artifact_key(self.job_id)
+        await asyncio.to_thread(get_archive_store().put, key, content)
+        self._job['artifact_key'] = key
+        self._job['artifact_filename'] = filename
+        self._job['artifact_media_type'] = media_type
+
+
+class JobBackend(ABC):
+    """Interface for job execution backends"""
+
+    def __init__(self):
+        self._persist_locks: Dict[str, asyncio.Lock] = {}
+        self._pending_writes = set()
+
+    @abstractmethod
+    async def start(self) -> None:
+        """Start processing queued jobs"""
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Stop workers and cancel running jobs"""
+
+    @abstractmethod
+    async def submit(self, kind: str, user_id: str, params: dict, background: bool = False) -> dict:
+        """
+        Queue a job and return its record
+        Background jobs are speculative work that must never delay user-initiated jobs
+        """
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return a job record, or None"""
+
+    @abstractmethod
+    async def cancel(self, job_id: str) -> dict:
+        """Cancel a queued or running job and return its record"""
+
+    async def _persist(self, job: dict) -> None:
+        """
+        Write a job record through to storage off the event loop
+        Writes for one job are serialized and snapshot the record when they start, so
+        the last write always carries the latest state. Failures are logged, not raised.
+        """
+        job['updated_at'] = datetime.utcnow()
+        async with self._persist_locks.setdefault(job['id'], asyncio.Lock()):
+            snapshot = {**job, 'progress': dict(job.get('progress') or {})}
+            try:
+                await asyncio.to_thread(get_storage().save_job, job['id'], snapshot)
+            except Exception as e:
+                logger.error(f"Could not save job {job['id']}: {str(e)}")
+
+    def _persist_soon(self, job: dict) -> None:
+        """Persist without waiting (progress updates from synchronous callers)"""
+        task = asyncio.get_running_loop().create_task(self._persist(job))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+
+class InProcessJobBackend(JobBackend):
+    """
+    Runs jobs on a pool of asyncio workers inside the API process
+    Background jobs get their own smaller pool, so they never occupy a worker
+    that a user-initiated job is waiting for.
+    Job state is written through to the storage backend on every transition.
+    The process owns every job: on start, jobs a previous process left queued or
+    running are failed as interrupted, and finished jobs (with their files) are
+    deleted JOB_RETENTION_HOURS after they last changed.
+    """
+
+    def __init__(self, concurrency: int, background_concurrency: int = 1):
+        super().__init__()
+        self.concurrency = concurrency
+        self.background_concurrency = background_concurrency
+        self._queue: Optional[asyncio.Queue] = None
+        self._background_queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._jobs: Dict[str, dict] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self._fail_interrupted()
+        if settings.JOB_RETENTION_HOURS > 0:
+            self._sweeper = asyncio.create_task(self._sweep())
+        self._queue = asyncio.Queue()
+        self._background_queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(self._queue)) for _ in range(self.concurrency)
+        ] + [
+            asyncio.create_task(self._worker(self._background_queue)) for _ in range(self.background_concurrency)
+        ]
+        logger.info(f"Job workers started: {self.concurrency} (+{self.background_concurrency} background)")
+
+    async def stop(self) -> None:
+        for task in self._running.values():
+            task.cancel()
+        background = self._workers + ([self._sweeper] if self._sweeper else [])
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        self._workers = []
+        self._sweeper = None
+
+    async def _fail_interrupted(self) -> None:
+        """Jobs a previous process left queued or running can never finish; fail them"""
+        try:
+            stale = await asyncio.to_thread(get_storage().list_jobs, [QUEUED, RUNNING])
+        except Exception as e:
+            logger.error(f"Could not check for interrupted jobs: {str(e)}")
+            return
+        for job in stale:
+            if job['id'] in self._jobs:
+                continue
+            job['status'] = FAILED
+            job['error'] = "Interrupted by a server restart"
+            await self._persist(job)
+        if stale:
+            logger.info(f"Marked {len(stale)} interrupted jobs as failed")
+
+    async def expire_finished(self) -> int:
+        """Delete finished jobs older than JOB_RETENTION_HOURS and their files; returns how many"""
+        storage = get_storage()
+        cutoff = datetime.utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+        expired = await asyncio.to_thread(storage.list_jobs, [SUCCEEDED, FAILED, CANCELLED], cutoff)
+        removed = 0
+        for job in expired:
+            try:
+                if job.get('artifact_key'):
+                    await asyncio.to_thread(get_archive_store().delete, job['artifact_key'])
+                await asyncio.to_thread(storage.delete_job, job['id'])
+                removed += 1
+            except Exception as e:
+                logger.error(f"Could not delete expired job {job['id']}: {str(e)}")
+        return removed
+
+    async def _sweep(self) -> None:
+        while True:
+            try:
+                removed = await self.expire_finished()
+                if removed:
+                    logger.info(f"Deleted {removed} expired jobs")
+            except Exception as e:
+                logger.error(f"Job expiry failed: {str(e)}")
+            await asyncio.sleep(JOB_SWEEP_INTERVAL_SECONDS)
+
+    async def submit(self, kind: str, user_id: str, params: dict, background: bool = False) -> dict:
+        if kind not in _handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._queue is None:
+            raise RuntimeError("Job workers are not running")
+
+        now = datetime.utcnow()
+        job = {
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'kind': kind,
+            'status': QUEUED,
+            'background': background,
+            'params': params,
+            'progress': {'done': 0, 'total': 0, 'message': ''},
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        self._jobs[job['id']] = job
+        await self._persist(job)
+        await (self._background_queue if background else self._queue).put(job['id'])
+        logger.info(f"Job queued: {job['id']} ({kind})")
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            job = get_storage().get_job(job_id)
+        return job
+
+    async def cancel(self, job_id: str) -> dict:
+        job = self.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        if job['status'] == QUEUED:
+            job['status'] = CANCELLED
+            await self._persist(job)
+        elif job['status'] == RUNNING and job_id in self._running:
+            self._running[job_id].cancel()
+        return job
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            job_id = await queue.get()
+            try:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] != QUEUED:
+                    self._jobs.pop(job_id, None)
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep the worker alive whatever happens to a single job
+                logger.error(f"Job worker error on {job_id}: {str(e)}")
+                self._jobs.pop(job_id, None)
+            finally:
+                queue.task_done()
+
+    async def _run(self, job: dict) -> None:
+        job['status'] = RUNNING
+        await self._persist(job)
+
+        context = JobContext(self, job)
+        task = asyncio.create_task(_handlers[job['kind']](context, job['params']))
+        self._running[job['id']] = task
+        try:
+            job['result'] = await task
+            job['status'] = SUCCEEDED
+        except asyncio.CancelledError:
+            job['status'] = CANCELLED
+            if not task.cancelled():
+                # The worker itself is shutting down
+                task.cancel()
+                raise
+        except HTTPException as e:
+            job['status'] = FAILED
+            job['error'] = e.detail
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {str(e)}")
+            job['status'] = FAILED
+            job['error'] = str(e)
+        finally:
+            self._running.pop(job['id'], None)
+            try:
+                await self._persist(job)
+            finally:
+                # Finished jobs are served from storage from now on
+                self._jobs.pop(job['id'], None)
+                self._persist_locks.pop(job['id'], None)
+            logger.info(f"Job {job['id']} finished: {job['status']}")
+
+
+class JobQueue:
+    """Facade used by routers; owns the configured backend"""
+
+    def __init__(self, backend: JobBackend):
+        self.backend = backend
+
+    async def start(self) -> None:
+        await self.backend.start()
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    async def submit(self, kind: str, user_id: str, params: dict, background: bool = False) -> dict:
+        return await self.backend.submit(kind, user_id, params, background)
+
+    def get_for_user(self, job_id: str, user_id: str) -> dict:
+        job = self.backend.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job['user_id'] != user_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+        return job
+
+    async def cancel_for_user(self, job_id: str, user_id: str) -> dict:
+        self.get_for_user(job_id, user_id)
+        return await self.backend.cancel(job_id)
+
+
+def artifact_key(job_id: str) -> str:
+    """Archive store key of a job's downloadable file"""
+    return f"jobs/{job_id}/artifact"
+
+
+def load_artifact(job: dict) -> Optional[bytes]:
+    """
+    Read a job's file from the archive store
+    Jobs saved before artifacts moved out of the job record still carry the bytes inline
+    """
+    if job.get('artifact_key'):
+        return get_archive_store().get(job['artifact_key'])
+    return job.get('artifact')
+
+
+def public_job(job: dict) -> dict:
+    """Job record as returned by the API (binary artifacts are downloaded separately)"""
+    return {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': job.get('progress'),
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'has_artifact': job.get('artifact_key') is not None or job.get('artifact') is not None,
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }
+
+
+job_queue = JobQueue(InProcessJobBackend(
+    concurrency=settings.JOB_WORKERS,
+    background_concurrency=settings.PREGENERATE_CONCURRENCY
+))
@@ -0,0 +1,48 @@
+import asyncio
+import json
+from typing import Optional
+from app.core.config import settings
+from app.services.auth_service import AuthService
+from app.services.model_router import model_router
+from app.services.prompt_registry import prompt_registry
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def collect_metrics() -> dict:
+    """Cache hit rates, model routing health and prompt sizes for this process"""
+    return {
+        'auth_cache': AuthService.cache_stats(),
+        'models': model_router.stats(),
+        'prompts': prompt_registry.stats()
+    }
+
+
+class MetricsReporter:
+    """Periodically writes collect_metrics() to the log as one JSON line"""
+
+    def __init__(self, interval_minutes: float):
+        self.interval_minutes = interval_minutes
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval_minutes > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_minutes * 60)
+            try:
+                logger.info(f"Metrics: {json.dumps(collect_metrics(), default=str)}")
+            except Exception as e:
+                logger.error(f"Could not collect metrics: {str(e)}")
+
+
+metrics_reporter = MetricsReporter(settings.METRICS_LOG_INTERVAL_MINUTES)
@@ -0,0 +1,162 @@
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Model tiers, cheapest first
+FAST = "fast"
+DEFAULT = "default"
+LARGE = "large"
+TIERS = [FAST, DEFAULT, LARGE]
+
+# (task, doc_type) -> (tier, expected answer tokens); doc_type None matches any type
+ROUTING_POLICY = {
+    ('outline', None): (DEFAULT, 2048),
+    ('section', 'pptx'): (FAST, 512),
+    ('section', 'docx'): (DEFAULT, 1024),
+    ('packed', None): (DEFAULT, 2048),
+    ('refine', 'pptx'): (FAST, 512),
+    ('refine', 'docx'): (DEFAULT, 1536),
+    ('refine_span', 'pptx'): (FAST, 256),
+    ('refine_span', 'docx'): (DEFAULT, 512),
+    ('summary', None): (FAST, 256),
+}
+
+# 2.5 models count thinking tokens toward max_output_tokens, so each tier gets
+# this much room on top of the answer (Pro cannot turn thinking off)
+THINKING_TOKENS = {FAST: 2048, DEFAULT: 8192, LARGE: 16384}
+
+MAX_OUTPUT_TOKENS = 65536
+
+# Weight of the newest sample in the moving averages
+EWMA_ALPHA = 0.2
+# Samples needed before a model's averages are trusted
+MIN_SAMPLES = 5
+# Every Nth request for a skipped tier is still sent to it so its averages can recover
+PROBE_EVERY = 20
+
+
+class Route(NamedTuple):
+    task: str
+    tier: str
+    model: str
+    output_tokens: int          # expected answer size
+    max_output_tokens: int      # answer plus thinking headroom, sent to the model
+
+
+class ModelStats:
+    """Exponentially weighted latency and error rate for one model (or one model and task)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.latency_ms = 0.0
+        self.error_rate = 0.0
+        self.skipped = 0
+
+    def record(self, latency_ms: float, ok: bool) -> None:
+        if self.calls == 0:
+            self.latency_ms = latency_ms
+            self.error_rate = 0.0 if ok else 1.0
+        else:
+            self.latency_ms += EWMA_ALPHA * (latency_ms - self.latency_ms)
+            self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        self.calls += 1
+
+
+class ModelRouter:
+    """
+    Picks a Gemini model and output budget per task and document type
+    Starts from ROUTING_POLICY and moves a request up a tier when the chosen
+    model is failing too often, or is no faster than the tier above it.
+    Error rates are tracked per model; latencies are compared per task, since
+    tiers serve tasks of very different sizes.
+    """
+
+    def __init__(self):
+        self.models = {
+            FAST: settings.GEMINI_MODEL_FAST,
+            DEFAULT: settings.GEMINI_MODEL_DEFAULT,
+            LARGE: settings.GEMINI_MODEL_LARGE
+        }
+        self._stats: Dict[str, ModelStats] = {}
+        self._task_stats: Dict[Tuple[str, str], ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def _route(self, task: str, tier: str, output_tokens: int) -> Route:
+        max_tokens = min(output_tokens + THINKING_TOKENS[tier], MAX_OUTPUT_TOKENS)
+        return Route(task, tier, self.models[tier], output_tokens, max_tokens)
+
+    def policy(self, task: str, doc_type: Optional[str] = None) -> Route:
+        """Static route for a task, ignoring observed health"""
+        tier, output_tokens = ROUTING_POLICY.get((task, doc_type)) or ROUTING_POLICY.get((task, None), (DEFAULT, 2048))
+        return self._route(task, tier, output_tokens)
+
+    def route(self, task: str, doc_type: Optional[str] = None) -> Route:
+        """Route for the next request, skipping tiers that are currently unhealthy"""
+        route = self.policy(task, doc_type)
+        with self._lock:
+            while route.tier != LARGE and self._should_skip(route.tier, task):
+                next_tier = TIERS[TIERS.index(route.tier) + 1]
+                route = self._route(task, next_tier, route.output_tokens)
+        return route
+
+    def escalate(self, route: Route) -> Optional[Route]:
+        """Larger model and budget to retry with after a truncated, invalid or server-failed response, or None at the top tier"""
+        if route.tier == LARGE:
+            return None
+        next_tier = TIERS[TIERS.index(route.tier) + 1]
+        return self._route(route.task, next_tier, route.output_tokens * 2)
+
+    def record(self, route: Route, latency_ms: float, ok: bool) -> None:
+        with self._lock:
+            self._stats.setdefault(route.model, ModelStats()).record(latency_ms, ok)
+            self._task_stats.setdefault((route.model, route.task), ModelStats()).record(latency_ms, ok)
+
+    def _should_skip(self, tier: str, task: str) -> bool:
+        model = self.models[tier]
+        above_model = self.models[TIERS[TIERS.index(tier) + 1]]
+        stats = self._stats.get(model)
+        if stats is None or stats.calls < MIN_SAMPLES:
+            return False
+
+        unhealthy = stats.error_rate > settings.MODEL_MAX_ERROR_RATE
+        if not unhealthy:
+            # A cheaper tier that is no faster than the next one at this task buys nothing
+            own = self._task_stats.get((model, task))
+            above = self._task_stats.get((above_model, task))
+            above_health = self._stats.get(above_model)
+            unhealthy = (
+                own is not None and own.calls >= MIN_SAMPLES
+                and above is not None and above.calls >= MIN_SAMPLES
+                and above_health.error_rate <= settings.MODEL_MAX_ERROR_RATE
+                and own.latency_ms > above.latency_ms
+            )
+        if not unhealthy:
+            return False
+
+        # Probes are counted per task, so each task's latencies keep recovering
+        probes = self._task_stats.setdefault((model, task), ModelStats())
+        probes.skipped += 1
+        return probes.skipped % PROBE_EVERY != 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                tier: {
+                    'model': model,
+                    'calls': self._stats[model].calls if model in self._stats else 0,
+                    'latency_ms': round(self._stats[model].latency_ms, 1) if model in self._stats else None,
+                    'error_rate': round(self._stats[model].error_rate, 3) if model in self._stats else None,
+                    'task_latency_ms': {
+                        task: round(stats.latency_ms, 1)
+                        for (task_model, task), stats in self._task_stats.items()
+                        if task_model == model and stats.calls
+                    }
+                }
+                for tier, model in self.models.items()
+            }
+
+
+model_router = ModelRouter()
@@ -0,0 +1,155 @@
+import html
+from typing import Iterator, List, Optional
+from fastapi import HTTPException
+from app.core.config import settings
+from app.storage import get_storage
+from app.storage.blobs import content_hash
+from app.services.document_service import word_blocks, slide_bullets, export_fingerprint
+from app.utils.cache import LRUCache
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bump when the preview markup or stylesheet changes, to invalidate cached HTML and client ETags
+PREVIEW_STYLE_VERSION = 1
+
+# Rendered section HTML, keyed by (doc_type, style version, section id, title, content hash)
+_section_cache = LRUCache(max_entries=settings.PREVIEW_FRAGMENT_CACHE_ENTRIES)
+
+# Whole previews, keyed by (project_id, revision tag)
+_document_cache = LRUCache(max_entries=settings.PREVIEW_CACHE_MAX_ENTRIES)
+
+_STYLE = """
+body { margin: 0; background: #eee; font-family: Calibri, Arial, sans-serif; color: #222; }
+.page, .slide { box-sizing: border-box; background: #fff; margin: 24px auto; box-shadow: 0 1px 4px rgba(0,0,0,.2); }
+.page { width: 8.5in; min-height: 11in; padding: 1in; }
+.page p, .page li { font-size: 11pt; line-height: 1.5; margin: 0 0 12pt; }
+.title-page { text-align: center; }
+.title-page .topic { font-size: 14pt; font-style: italic; }
+.title-page .generated { font-size: 10pt; color: #808080; }
+.slide { width: 10in; height: 7.5in; padding: .5in; overflow: hidden; }
+.slide li { font-size: 18pt; margin-bottom: 12pt; }
+.title-slide { display: flex; flex-direction: column; justify-content: center; text-align: center; }
+"""
+
+
+def _escape(text) -> str:
+    return html.escape(str(text)).replace('\n', '<br>')
+
+
+def _section_key(doc_type: str, section: dict) -> tuple:
+    # The fragment carries the section's anchor, so the id is part of the key
+    digest = content_hash(section.get('content', ''))
+    return (doc_type, PREVIEW_STYLE_VERSION, section['id'], section['title'], digest)
+
+
+def _word_section_html(section: dict) -> str:
+    """A section as the Word export lays it out: heading, paragraphs, consecutive bullets as one list"""
+    parts = [f"<h2>{_escape(section['title'])}</h2>"]
+    in_list = False
+    for text, is_bullet in word_blocks(section.get('content', '')):
+        if is_bullet and not in_list:
+            parts.append("<ul>")
+        elif not is_bullet and in_list:
+            parts.append("</ul>")
+        in_list = is_bullet
+        parts.append(f"<li>{_escape(text)}</li>" if is_bullet else f"<p>{_escape(text)}</p>")
+    if in_list:
+        parts.append("</ul>")
+    return f'<section class="section" id="section-{_escape(section["id"])}">{"".join(parts)}</section>'
+
+
+def _slide_html(section: dict) -> str:
+    """A content slide: title and at most SLIDE_BULLET_LIMIT bullet points"""
+    bullets = ''.join(f"<li>{_escape(point)}</li>" for point in slide_bullets(section.get('content', '')))
+    return (
+        f'<section class="slide" id="section-{_escape(section["id"])}">'
+        f"<h2>{_escape(section['title'])}</h2><ul>{bullets}</ul></section>"
+    )
+
+
+class PreviewService:
+    @staticmethod
+    def load_for_preview(project_id: str, user_id: str) -> dict:
+        """Fetch a project (without version history) for preview, verifying ownership"""
+        project_data = get_storage().get_project(project_id, with_versions=False)
+
+        if project_data is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        if project_data['user_id'] != user_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+
+        return project_data
+
+    @staticmethod
+    def etag(project_data: dict) -> str:
+        """
+        Validator for a project's preview
+        Based on the storage revision; projects stored before revisions existed use the content fingerprint.
+        """
+        tag = project_data.get('revision') or export_fingerprint(project_data)
+        return f'"{project_data["id"]}-{tag}-{PREVIEW_STYLE_VERSION}"'
+
+    @staticmethod
+    def get_cached(project_data: dict) -> Optional[str]:
+        return _document_cache.get((project_data['id'], PreviewService.etag(project_data)))
+
+    @staticmethod
+    def render(project_data: dict) -> Iterator[str]:
+        """
+        Render a preview as HTML chunks, one per section after the title page (and TOC)
+        Sections are reused from the fragment cache; the finished document is cached per revision.
+        """
+        key = (project_data['id'], PreviewService.etag(project_data))
+        chunks: List[str] = []
+        for chunk in PreviewService._render_parts(project_data):
+            chunks.append(chunk)
+            yield chunk
+        _document_cache.set(key, ''.join(chunks))
+        logger.info(f"Preview rendered: {project_data['id']}")
+
+    @staticmethod
+    def _render_parts(project_data: dict) -> Iterator[str]:
+        doc_type = project_data['doc_type']
+        yield (
+            f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+            f"<title>{_escape(project_data['title'])}</title><style>{_STYLE}</style></head>"
+            f'<body class="{doc_type}">'
+        )
+
+        if doc_type == 'docx':
+            yield PreviewService._word_front_matter(project_data)
+            yield '<div class="page content">'
+        else:
+            subtitle = project_data.get('topic', '')
+            if project_data.get('created_at'):
+                subtitle += f"\n{project_data['created_at']}"
+            yield (
+                f'<section class="slide title-slide"><h1>{_escape(project_data["title"])}</h1>'
+                f"<p>{_escape(subtitle)}</p></section>"
+            )
+
+        render_section = _word_section_html if doc_type == 'docx' else _slide_html
+        for section in sorted(project_data['sections'], key=lambda x: x.get('order', 0)):
+            key = _section_key(doc_type, section)
+            fragment = _section_cache.get(key)
+            if fragment is None:
+                fragment = render_section(section)
+                _section_cache.set(key, fragment)
+            yield fragment
+
+        yield ('</div>' if doc_type == 'docx' else '') + '</body></html>'
+
+    @staticmethod
+    def _word_front_matter(project_data: dict) -> str:
+        """Title page and table of contents (listed in stored order, like the Word export)"""
+        parts = [f'<section class="page title-page"><h1>{_escape(project_data["title"])}</h1>']
+        if project_data.get('topic'):
+            parts.append(f'<p class="topic">{_escape(project_data["topic"])}</p>')
+        parts.append(f'<p class="generated">Generated: {_escape(project_data.get("created_at", "N/A"))}</p></section>')
+
+        parts.append('<section class="page toc"><h2>Table of Contents</h2><ol>')
+        parts.extend(f"<li>{_escape(section['title'])}</li>" for section in project_data['sections'])
+        parts.append('</ol></section>')
+        return ''.join(parts)
@@ -0,0 +1,401 @@
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.utils.tokens import estimate_tokens, trim_to_tokens
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TONE_GUIDELINES = {
+    "professional": "Use formal, business-appropriate language. Be clear and concise.",
+    "casual": "Use conversational, friendly language. Be approachable.",
+    "academic": "Use scholarly language with references to research. Be precise and analytical."
+}
+
+# {name} placeholders; other braces (JSON examples) are literal text
+_FIELD = re.compile(r'\{(\w+)\}')
+
+
+class Prompt(NamedTuple):
+    key: str
+    system: str
+    user: str
+    tokens: int
+
+
+def _compile(text: str) -> List[str]:
+    """Split a template once into alternating literal text and field names"""
+    return _FIELD.split(text.strip())
+
+
+def _fill(parts: List[str], values: Dict[str, str]) -> str:
+    text = ''.join(part if i % 2 == 0 else values[part] for i, part in enumerate(parts))
+    # Empty optional fields leave blank lines behind
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+class PromptTemplate:
+    """
+    A versioned prompt: stable system instructions plus a per-request user turn
+    The system part only uses values with a handful of variants (tone), so the
+    model sees the same instruction prefix across requests. Fields listed in
+    `optional` are trimmed, in order, when the prompt exceeds its token budget.
+    Fields also listed in `tail` (text that leads into the part being edited) keep
+    their heading line and the end of their text instead of the start.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        version: int,
+        system: str,
+        user: str,
+        optional: Sequence[str] = (),
+        tail: Sequence[str] = (),
+        budget: Optional[int] = None
+    ):
+        self.name = name
+        self.version = version
+        self._system = _compile(system)
+        self._user = _compile(user)
+        self.fields = set(self._system[1::2]) | set(self._user[1::2])
+        unknown = set(optional) - set(self._user[1::2])
+        if unknown:
+            raise ValueError(f"Optional fields must be user-turn fields: {', '.join(sorted(unknown))}")
+        if set(tail) - set(optional):
+            raise ValueError(f"Tail fields must be optional: {', '.join(sorted(set(tail) - set(optional)))}")
+        self.optional = tuple(optional)
+        self.tail = frozenset(tail)
+        self.budget = budget
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+    def render(self, **values) -> Prompt:
+        missing = self.fields - set(values)
+        if missing:
+            raise KeyError(f"Prompt {self.key} is missing fields: {', '.join(sorted(missing))}")
+        values = {name: str(value) for name, value in values.items()}
+
+        system = _fill(self._system, values)
+        user = _fill(self._user, values)
+        tokens = estimate_tokens(system) + estimate_tokens(user)
+        budget = self.budget or settings.PROMPT_TOKEN_BUDGET
+
+        for name in self.optional:
+            if tokens <= budget:
+                break
+            over = tokens - budget
+            if name in self.tail:
+                heading, _, text = values[name].partition('\n')
+                text = trim_to_tokens(text, estimate_tokens(text) - over, keep_tail=True)
+                values[name] = f"{heading}\n{text}" if text else ""
+            else:
+                values[name] = trim_to_tokens(values[name], estimate_tokens(values[name]) - over)
+            user = _fill(self._user, values)
+            tokens = estimate_tokens(system) + estimate_tokens(user)
+
+        if tokens > budget:
+            logger.warning(f"Prompt {self.key} is ~{tokens} tokens, over its budget of {budget}")
+        return Prompt(self.key, system, user, tokens)
+
+
+class PromptRegistry:
+    """Prompt templates by task and document type (doc_type None matches any type)"""
+
+    def __init__(self):
+        self._templates: Dict[Tuple[str, Optional[str]], PromptTemplate] = {}
+        self._usage: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, template: PromptTemplate, doc_type: Optional[str] = None) -> None:
+        self._templates[(template.name, doc_type)] = template
+
+    def get(self, name: str, doc_type: Optional[str] = None) -> PromptTemplate:
+        template = self._templates.get((name, doc_type)) or self._templates.get((name, None))
+        if template is None:
+            raise KeyError(f"No prompt template for {name} ({doc_type})")
+        return template
+
+    def render(self, name: str, doc_type: Optional[str] = None, **values) -> Prompt:
+        prompt = self.get(name, doc_type).render(**values)
+        with self._lock:
+            usage = self._usage.setdefault(prompt.key, {'renders': 0, 'tokens': 0})
+            usage['renders'] += 1
+            usage['tokens'] += prompt.tokens
+        return prompt
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                key: {
+                    'renders': usage['renders'],
+                    'avg_tokens': round(usage['tokens'] / usage['renders'], 1)
+                }
+                for key, usage in self._usage.items()
+            }
+
+
+prompt_registry = PromptRegistry()
+
+
+# ===== Outlines =====
+
+prompt_registry.register(PromptTemplate('outline', 1, system="""
+You are a professional document consultant who designs outlines for Word documents.
+
+Give every section:
+- Section title (clear and professional)
+- Brief description (2-3 sentences explaining what the section should cover)
+- 3 key points to include in that section
+
+Return ONLY valid JSON in this exact format:
+{
+  "title": "Suggested Document Title",
+  "sections": [
+    {
+      "title": "Section Title",
+      "description": "What this section covers",
+      "key_points": ["Point 1", "Point 2", "Point 3"]
+    }
+  ]
+}
+""", user="""
+Generate a detailed outline for a Word document about: "{topic}"
+
+Create exactly {num_sections} sections.
+"""), 'docx')
+
+prompt_registry.register(PromptTemplate('outline', 1, system="""
+You are a presentation design expert who designs PowerPoint presentation outlines.
+
+Give every slide:
+- Slide title (engaging and clear)
+- 2-3 full-sentence ideas describing what content should go on this slide (NOT 'Point 1, Point 2, Point 3')
+
+Return ONLY valid JSON in this exact format:
+{
+  "title": "Presentation Title",
+  "sections": [
+    {
+      "title": "Slide Title",
+      "description": "2-3 sentences describing the key ideas and content for this slide"
+    }
+  ]
+}
+""", user="""
+Generate a PowerPoint presentation outline for: "{topic}"
+
+Create exactly {num_sections} slides.
+"""), 'pptx')
+
+prompt_registry.register(PromptTemplate('outline_completion', 1, system="""
+You complete partial outlines for Word documents.
+New sections follow on from the existing ones without repeating them.
+Each needs a clear title and a 2-3 sentence description of what it should cover plus 3 key points.
+
+Return valid JSON with only the new sections in the "sections" array.
+""", user="""
+The outline for a Word document about "{topic}" already has these sections:
+{listing}
+
+Create exactly {missing} more sections.
+"""), 'docx')
+
+prompt_registry.register(PromptTemplate('outline_completion', 1, system="""
+You complete partial outlines for PowerPoint presentations.
+New slides follow on from the existing ones without repeating them.
+Each needs a clear title and a 2-3 sentence description of what it should cover.
+
+Return valid JSON with only the new slides in the "sections" array.
+""", user="""
+The outline for a PowerPoint presentation about "{topic}" already has these slides:
+{listing}
+
+Create exactly {missing} more slides.
+"""), 'pptx')
+
+
+# ===== Section content =====
+
+prompt_registry.register(PromptTemplate('section', 1, system="""
+You are creating content for PowerPoint slides.
+
+Tone: {tone}
+Tone Guidelines: {tone_guidelines}
+
+Generate concise, impactful content for a presentation slide:
+- Create 4-6 bullet points
+- Each point: 15-25 words maximum
+- Be clear, actionable, and memorable
+- Perfect for visual presentation
+- Focus on key insights
+
+IMPORTANT: Start directly with the bullet points. Do NOT include any introductory text like "Here is the content for your slides" or similar phrases.
+
+Format as bullet points (one per line, start each with -)
+""", user="""
+Presentation topic: "{topic}"
+Slide Title: {section_title}
+
+{context}
+""", optional=('context',)), 'pptx')
+
+prompt_registry.register(PromptTemplate('section', 1, system="""
+You are writing content for documents.
+
+Tone: {tone}
+Tone Guidelines: {tone_guidelines}
+
+Generate well-structured content for the requested section:
+- Length: 250-350 words
+- Include relevant details and examples
+- Use proper paragraphs (separate with double newlines)
+- Make it engaging and informative
+- Ensure it flows naturally
+
+IMPORTANT: Start directly with the content. Do NOT include any introductory text or the section title.
+Write ONLY the content, no headers or titles.
+""", user="""
+Document topic: "{topic}"
+Section Title: {section_title}
+
+{context}
+""", optional=('context',)), 'docx')
+
+prompt_registry.register(PromptTemplate('packed', 1, system="""
+You are writing content for presentations.
+
+Tone: {tone}
+Tone Guidelines: {tone_guidelines}
+
+Write the content for each slide listed in the request. Each slide should cover its own title without repeating the others.
+- 4-6 bullet points per slide, one per line, each starting with "- "
+- Each point: 15-25 words maximum
+- Be clear, actionable, and memorable
+- Do NOT include the title, introductory phrases or markdown formatting in the content
+
+Return JSON in this exact format, with one entry per slide using the listed numbers as ids:
+{"sections": [{"id": 1, "content": "..."}]}
+""", user="""
+Presentation topic: "{topic}"
+
+{context}
+
+SECTIONS TO WRITE:
+{numbered}
+""", optional=('context',)), 'pptx')
+
+prompt_registry.register(PromptTemplate('packed', 1, system="""
+You are writing content for documents.
+
+Tone: {tone}
+Tone Guidelines: {tone_guidelines}
+
+Write the content for each section listed in the request. Each section should cover its own title without repeating the others.
+- 250-350 words per section
+- Use proper paragraphs (separate with double newlines)
+- Include relevant details and examples
+- Do NOT include the title, introductory phrases or markdown formatting in the content
+
+Return JSON in this exact format, with one entry per section using the listed numbers as ids:
+{"sections": [{"id": 1, "content": "..."}]}
+""", user="""
+Document topic: "{topic}"
+
+{context}
+
+SECTIONS TO WRITE:
+{numbered}
+""", optional=('context',)), 'docx')
+
+
+# ===== Refinement and summaries =====
+
+prompt_registry.register(PromptTemplate('refine', 1, system="""
+You are editing content for a document section.
+
+Apply the requested changes while:
+- Maintaining the overall structure and flow
+- Keeping relevant information
+- Ensuring clarity and coherence
+- Preserving the same approximate length unless specifically asked to change it
+
+IMPORTANT: Return ONLY the refined content. Do NOT include any introductory phrases or explanations.
+""", user="""
+Section title: "{section_title}"
+
+ORIGINAL CONTENT:
+{original_content}
+
+USER REQUEST: {refinement_prompt}
+
+Return the refined content:
+"""))
+
+prompt_registry.register(PromptTemplate('refine_chunk', 1, system="""
+You are editing one part of a long document section; the other parts are edited separately.
+
+Apply the requested changes to the part while:
+- Keeping relevant information and the paragraph structure
+- Ensuring clarity and coherence with the surrounding text
+- Preserving the same approximate length unless specifically asked to change it
+- Not adding an introduction or conclusion the part does not already have
+
+Text marked as context comes from the neighbouring parts. Use it for continuity only and never return it.
+
+IMPORTANT: Return ONLY the refined part. Do NOT include any introductory phrases or explanations.
+""", user="""
+Section title: "{section_title}"
+USER REQUEST: {refinement_prompt}
+
+This is part {part} of {parts}.
+
+{before}
+
+PART TO EDIT:
+{chunk}
+
+{after}
+
+Return the refined part:
+""", optional=('before', 'after'), tail=('before',)))
+
+prompt_registry.register(PromptTemplate('refine_span', 1, system="""
+You are editing a passage the user selected in a document section.
+
+Rewrite only the selected passage as requested, so that it still reads naturally between the text before and after it:
+- Keep the passage's role in the surrounding sentences and paragraphs
+- Keep list markers such as "- " at the start of lines
+- Preserve the same approximate length unless specifically asked to change it
+
+Text marked as context is shown for continuity only and must never be returned.
+
+IMPORTANT: Return ONLY the replacement for the selected passage. Do NOT include any introductory phrases or explanations.
+""", user="""
+Section title: "{section_title}"
+USER REQUEST: {refinement_prompt}
+
+{before}
+
+SELECTED PASSAGE:
+{passage}
+
+{after}
+
+Return the replacement passage:
+""", optional=('before', 'after'), tail=('before',)))
+
+prompt_registry.register(PromptTemplate('summary', 1, system="""
+You write short summaries of document sections.
+Capture the key points and any facts later sections should stay consistent with.
+
+IMPORTANT: Return ONLY the summary as plain text, no introductory phrases or formatting.
+""", user="""
+Summarize the following section titled "{section_title}" in at most {max_words} words.
+
+CONTENT:
+{content}
+""", optional=('content',)))
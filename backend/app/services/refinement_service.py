@@ -1,10 +1,16 @@
-from app.utils.firebase_client import db
+from app.core.config import settings
+from app.storage import get_storage
 from app.services.gemini_service import GeminiService
+from app.services.job_service import job_handler, JobContext
+from app.services.event_hub import event_hub, VERSION_ADDED, FEEDBACK_CHANGED, REVERTED
+from app.services.version_archive_service import VersionArchiveService
+from app.services.feedback_buffer import feedback_buffer
 from app.utils.logger import get_logger
 from fastapi import HTTPException
 from datetime import datetime
 from difflib import SequenceMatcher
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
+import asyncio
 
 logger = get_logger(__name__)
 gemini_service = GeminiService()
@@ -15,22 +21,26 @@ class RefinementService:
         project_id: str,
         section_id: str,
         refinement_prompt: str,
-        user_id: str
+        user_id: str,
+        span_start: Optional[int] = None,
+        span_end: Optional[int] = None,
+        paragraph_index: Optional[int] = None
     ) -> dict:
         """
         Refine section content and save as new version
         Stores refinement history for tracking
+        With a character range or paragraph index only that passage (plus a little
+        surrounding context) is sent to the model and spliced back in.
         """
         try:
-            # Get project from Firestore
-            project_ref = db.collection('projects').document(project_id)
-            project_doc = project_ref.get()
+            # Get project from storage
+            storage = get_storage()
+            await feedback_buffer.flush(project_id)
+            project_data = storage.get_project(project_id)
             
-            if not project_doc.exists:
+            if project_data is None:
                 raise HTTPException(status_code=404, detail="Project not found")
             
-            project_data = project_doc.to_dict()
-            
             # Verify ownership
             if project_data['user_id'] != user_id:
                 raise HTTPException(status_code=403, detail="Access denied")
@@ -48,40 +58,68 @@ class RefinementService:
             section = project_data['sections'][section_index]
             current_content = section['content']
             section_title = section['title']
+            doc_type = project_data.get('doc_type', 'docx')
+            span = RefinementService._resolve_span(
+                current_content, doc_type, span_start, span_end, paragraph_index
+            )
+            
+            if span is not None:
+                start, end = span
+                before, passage, after = RefinementService._span_window(current_content, start, end)
+                replacement = await gemini_service.refine_span(
+                    passage=passage.strip(),
+                    before=before,
+                    after=after,
+                    refinement_prompt=refinement_prompt,
+                    section_title=section_title,
+                    doc_type=doc_type
+                )
+                # Keep the whitespace around the passage so the splice is seamless
+                leading = passage[:len(passage) - len(passage.lstrip())]
+                trailing = passage[len(passage.rstrip()):]
+                refined_content = current_content[:start] + leading + replacement + trailing + current_content[end:]
+                new_span = {'start': start + len(leading), 'end': start + len(leading) + len(replacement)}
+                diff = RefinementService._generate_diff(passage, replacement)
+            else:
+                # Generate refined content using AI
+                refined_content = await gemini_service.refine_content(
+                    original_content=current_content,
+                    refinement_prompt=refinement_prompt,
+                    section_title=section_title,
+                    doc_type=doc_type
+                )
+                new_span = None
+                diff = RefinementService._generate_diff(current_content, refined_content)
             
-            # Generate refined content using AI
-            refined_content = await gemini_service.refine_content(
-                original_content=current_content,
-                refinement_prompt=refinement_prompt,
-                section_title=section_title
+            # Merge into the latest copy so writes made while the model ran are kept
+            await feedback_buffer.flush(project_id)
+            latest = storage.get_project(project_id)
+            target = next(
+                (s for s in (latest or {}).get('sections', []) if s['id'] == section_id),
+                None
             )
+            if target is None:
+                raise HTTPException(status_code=404, detail="Section was deleted during refinement")
+            if target.get('content') != current_content:
+                # The splice offsets (or the whole rewrite) refer to the old text
+                raise HTTPException(status_code=409, detail="Section changed during refinement")
             
-            # Create new version
-            new_version = {
-                'version': len(section.get('versions', [])) + 1,
-                'content': refined_content,
-                'prompt': refinement_prompt,
-                'timestamp': datetime.utcnow(),
-                'feedback': None,
-                'comment': ''
-            }
+            # Create new version and update current content
+            new_version = RefinementService._add_version(target, refined_content, refinement_prompt)
             
-            # Update section
-            if 'versions' not in section:
-                section['versions'] = []
-            section['versions'].append(new_version)
-            section['content'] = refined_content  # Update current content
-            
-            # Update Firestore
-            project_data['sections'][section_index] = section
-            project_data['updated_at'] = datetime.utcnow()
-            project_ref.update({
-                'sections': project_data['sections'],
-                'updated_at': project_data['updated_at']
+            # Persist changes
+            latest['updated_at'] = datetime.utcnow()
+            storage.update_project(project_id, {
+                'sections': latest['sections'],
+                'updated_at': latest['updated_at']
             })
             
-            # Generate diff for visualization
-            diff = RefinementService._generate_diff(current_content, refined_content)
+            event_hub.publish(
+                project_id, VERSION_ADDED, section_id,
+                content=refined_content,
+                version=new_version,
+                replaces_history=False
+            )
             
             logger.info(f"Section refined: {section_id}, version: {new_version['version']}")
             
@@ -89,7 +127,8 @@ class RefinementService:
                 'section_id': section_id,
                 'content': refined_content,
                 'version': new_version['version'],
-                'diff': diff
+                'diff': diff,
+                'span': new_span
             }
             
         except HTTPException:
@@ -98,6 +137,188 @@ class RefinementService:
             logger.error(f"Refinement error: {str(e)}")
             raise HTTPException(status_code=500, detail="Refinement failed")
     
+    @staticmethod
+    async def refine_project(
+        project_id: str,
+        refinement_prompt: str,
+        user_id: str,
+        section_ids: Optional[List[str]] = None,
+        progress: Optional[Callable[[int, int, str], None]] = None
+    ) -> dict:
+        """
+        Apply one refinement prompt to all (or selected) sections concurrently
+        - Fan-out is bounded by REFINE_MAX_CONCURRENCY
+        - Every refined section gets one new version, committed in a single write
+        - Sections that fail, or were edited while refining, are reported and left unchanged
+        """
+        storage = get_storage()
+        await feedback_buffer.flush(project_id)
+        project_data = storage.get_project(project_id)
+        
+        if project_data is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        if project_data['user_id'] != user_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        sections = sorted(project_data['sections'], key=lambda s: s.get('order', 0))
+        if section_ids is not None:
+            wanted = set(section_ids)
+            sections = [s for s in sections if s['id'] in wanted]
+            if len(sections) != len(wanted):
+                raise HTTPException(status_code=404, detail="Section not found")
+        
+        # Nothing to refine in sections that have not been generated yet
+        sections = [s for s in sections if s.get('content', '').strip()]
+        
+        semaphore = asyncio.Semaphore(settings.REFINE_MAX_CONCURRENCY)
+        completed = 0
+        
+        async def refine_one(section: dict) -> str:
+            nonlocal completed
+            async with semaphore:
+                refined = await gemini_service.refine_content(
+                    original_content=section['content'],
+                    refinement_prompt=refinement_prompt,
+                    section_title=section['title'],
+                    doc_type=project_data.get('doc_type', 'docx')
+                )
+            completed += 1
+            if progress:
+                progress(completed, len(sections), f"Refined {section['title']}")
+            return refined
+        
+        if progress:
+            progress(0, len(sections), "Refining")
+        outcomes = await asyncio.gather(
+            *(refine_one(section) for section in sections),
+            return_exceptions=True
+        )
+        
+        refined = []
+        failed = []
+        for section, outcome in zip(sections, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Refinement error for section {section['id']}: {str(outcome)}")
+                failed.append({'section_id': section['id'], 'error': str(outcome)})
+            else:
+                refined.append((section, outcome))
+        
+        results = []
+        if refined:
+            # Merge into the latest copy so edits made while the model ran are kept
+            await feedback_buffer.flush(project_id)
+            latest = storage.get_project(project_id)
+            if latest is None:
+                raise HTTPException(status_code=404, detail="Project not found")
+            latest_sections = {s['id']: s for s in latest['sections']}
+            
+            applied = []
+            for section, outcome in refined:
+                target = latest_sections.get(section['id'])
+                if target is None or target.get('content') != section['content']:
+                    # Refining the old text would discard the user's edit
+                    failed.append({'section_id': section['id'], 'error': "Section changed during refinement"})
+                    continue
+                original = target['content']
+                new_version = RefinementService._add_version(target, outcome, refinement_prompt)
+                applied.append(target)
+                results.append({
+                    'section_id': target['id'],
+                    'content': outcome,
+                    'version': new_version['version'],
+                    'diff': RefinementService._generate_diff(original, outcome)
+                })
+            
+            if applied:
+                # One write for every refined section
+                latest['updated_at'] = datetime.utcnow()
+                storage.update_project(project_id, {
+                    'sections': latest['sections'],
+                    'updated_at': latest['updated_at']
+                })
+                for section in applied:
+                    event_hub.publish(
+                        project_id, VERSION_ADDED, section['id'],
+                        content=section['content'],
+                        version=section['versions'][-1],
+                        replaces_history=False
+                    )
+        
+        logger.info(f"Project refined: {project_id}, {len(results)} sections, {len(failed)} failed")
+        return {'sections': results, 'failed': failed}
+    
+    @staticmethod
+    def _add_version(section: dict, content: str, refinement_prompt: str) -> dict:
+        """Append a refinement as a new version and make it the current content"""
+        # Numbers continue past versions that were moved to the archive
+        numbers = [v['version'] for v in section.get('versions') or []]
+        numbers.append((section.get('archive') or {}).get('last_version', 0))
+        new_version = {
+            'version': max(numbers) + 1,
+            'content': content,
+            'prompt': refinement_prompt,
+            'timestamp': datetime.utcnow(),
+            'feedback': None,
+            'comment': ''
+        }
+        
+        if 'versions' not in section:
+            section['versions'] = []
+        section['versions'].append(new_version)
+        section['content'] = content
+        return new_version
+    
+    @staticmethod
+    def _resolve_span(
+        content: str,
+        doc_type: str,
+        span_start: Optional[int],
+        span_end: Optional[int],
+        paragraph_index: Optional[int]
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Character range [start, end) of the passage to refine, or None for the whole section
+        Paragraphs are the blocks the export renders: bullet lines on slides, blank-line separated paragraphs otherwise.
+        """
+        if span_start is None and span_end is None and paragraph_index is None:
+            return None
+        
+        if paragraph_index is not None:
+            if span_start is not None or span_end is not None:
+                raise HTTPException(status_code=400, detail="Give either a character range or a paragraph index, not both")
+            
+            separator = '\n' if doc_type == 'pptx' else '\n\n'
+            blocks = []
+            position = 0
+            for part in content.split(separator):
+                if part.strip():
+                    start = position + len(part) - len(part.lstrip())
+                    blocks.append((start, start + len(part.strip())))
+                position += len(part) + len(separator)
+            
+            if paragraph_index >= len(blocks):
+                raise HTTPException(status_code=400, detail="Paragraph index out of range")
+            return blocks[paragraph_index]
+        
+        if span_start is None or span_end is None or not span_start < span_end <= len(content):
+            raise HTTPException(status_code=400, detail="Invalid character range")
+        if not content[span_start:span_end].strip():
+            raise HTTPException(status_code=400, detail="Selected text is empty")
+        return span_start, span_end
+    
+    @staticmethod
+    def _span_window(content: str, start: int, end: int) -> Tuple[str, str, str]:
+        """(context before, passage, context after), the context cut at word boundaries"""
+        width = settings.REFINE_SPAN_CONTEXT_CHARS
+        before = content[max(0, start - width):start]
+        if start > width and ' ' in before:
+            before = before.split(' ', 1)[1]
+        after = content[end:end + width]
+        if end + width < len(content) and ' ' in after:
+            after = after.rsplit(' ', 1)[0]
+        return before, content[start:end], after
+    
     @staticmethod
     def _generate_diff(original: str, refined: str) -> List[Dict]:
         """
@@ -138,33 +359,30 @@ class RefinementService:
     ) -> dict:
         """
         Add like/dislike feedback and comment to specific version
+        The write is buffered and coalesced with other feedback on the project
         """
         try:
-            project_ref = db.collection('projects').document(project_id)
-            project_doc = project_ref.get()
+            project_data = get_storage().get_project(project_id)
             
-            if not project_doc.exists:
+            if project_data is None:
                 raise HTTPException(status_code=404, detail="Project not found")
             
-            project_data = project_doc.to_dict()
-            
             if project_data['user_id'] != user_id:
                 raise HTTPException(status_code=403, detail="Access denied")
             
-            # Find section and version
-            for section in project_data['sections']:
-                if section['id'] == section_id:
-                    if 'versions' in section and len(section['versions']) >= version:
-                        section['versions'][version - 1]['feedback'] = feedback
-                        section['versions'][version - 1]['comment'] = comment
-                        
-                        # Update Firestore
-                        project_ref.update({'sections': project_data['sections']})
-                        
-                        logger.info(f"Feedback added: {section_id}, version: {version}")
-                        return {"message": "Feedback saved successfully"}
+            # Only inline versions qualify; archived versions are read-only
+            section = next((s for s in project_data['sections'] if s['id'] == section_id), None)
+            if section is None or not any(v['version'] == version for v in section.get('versions') or []):
+                raise HTTPException(status_code=404, detail="Section or version not found")
             
-            raise HTTPException(status_code=404, detail="Section or version not found")
+            feedback_buffer.record(project_id, section_id, version, {'feedback': feedback, 'comment': comment})
+            event_hub.publish(
+                project_id, FEEDBACK_CHANGED, section_id,
+                version=version, feedback=feedback, comment=comment
+            )
+            
+            logger.info(f"Feedback added: {section_id}, version: {version}")
+            return {"message": "Feedback saved successfully"}
             
         except HTTPException:
             raise
@@ -183,32 +401,39 @@ class RefinementService:
         Revert section content to a previous version
         """
         try:
-            project_ref = db.collection('projects').document(project_id)
-            project_doc = project_ref.get()
+            storage = get_storage()
+            await feedback_buffer.flush(project_id)
+            project_data = storage.get_project(project_id)
             
-            if not project_doc.exists:
+            if project_data is None:
                 raise HTTPException(status_code=404, detail="Project not found")
             
-            project_data = project_doc.to_dict()
-            
             if project_data['user_id'] != user_id:
                 raise HTTPException(status_code=403, detail="Access denied")
             
             # Find section
             for section in project_data['sections']:
                 if section['id'] == section_id:
-                    if 'versions' in section and len(section['versions']) >= target_version:
+                    # Older versions may have been compacted into the archive
+                    target = await asyncio.to_thread(
+                        VersionArchiveService.find_version, project_id, section, target_version
+                    )
+                    if target is not None:
                         # Get target version content
-                        target_content = section['versions'][target_version - 1]['content']
+                        target_content = target['content']
                         
                         # Update current content
                         section['content'] = target_content
                         
-                        # Update Firestore
-                        project_ref.update({
+                        # Persist changes
+                        storage.update_project(project_id, {
                             'sections': project_data['sections'],
                             'updated_at': datetime.utcnow()
                         })
+                        event_hub.publish(
+                            project_id, REVERTED, section_id,
+                            target_version=target_version, content=target_content
+                        )
                         
                         logger.info(f"Reverted to version: {target_version}, section: {section_id}")
                         return {
@@ -223,3 +448,14 @@ class RefinementService:
         except Exception as e:
             logger.error(f"Revert error: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to revert version")
+
+
+@job_handler("refine_project")
+async def run_refine_project_job(context: JobContext, params: dict) -> dict:
+    return await RefinementService.refine_project(
+        project_id=params['project_id'],
+        refinement_prompt=params['refinement_prompt'],
+        user_id=context.user_id,
+        section_ids=params.get('section_ids'),
+        progress=context.report_progress
+    )
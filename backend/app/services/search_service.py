@@ -0,0 +1,292 @@
+import heapq
+import html
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.storage import get_storage
+from app.services.event_hub import (
+    event_hub, CONTENT_UPDATED, VERSION_ADDED, REVERTED, SECTION_ADDED,
+    PROJECT_CREATED, PROJECT_UPDATED, PROJECT_DELETED
+)
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from in is it of on or that the this to was were will with'.split()
+)
+
+# Matches in titles count more than matches in body text
+FIELD_WEIGHTS = {
+    'title': 3,
+    'topic': 2,
+    'description': 1,
+    'section_title': 2,
+    'content': 1,
+}
+
+# Fields a snippet is taken from, in order of preference
+_SNIPPET_FIELDS = ('content', 'description', 'topic', 'section_title', 'title')
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+# (project_id, section_id); section_id is None for the project's own fields
+DocKey = Tuple[str, Optional[str]]
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall((text or '').lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def highlight(text: str, terms: Set[str], width: int) -> str:
+    """
+    HTML-escaped window of `text` around the first matching term,
+    with every match wrapped in <mark>
+    """
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(t) for t in sorted(terms)) + r')\b', re.IGNORECASE)
+    first = pattern.search(text)
+    start = 0
+    if first is not None and first.start() > width // 3:
+        start = text.rfind(' ', 0, first.start() - width // 3) + 1
+    end = min(len(text), start + width)
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        end = space if space > start else end
+    window = text[start:end]
+
+    parts = []
+    last = 0
+    for match in pattern.finditer(window):
+        parts.append(html.escape(window[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        last = match.end()
+    parts.append(html.escape(window[last:]))
+
+    return ('…' if start > 0 else '') + ''.join(parts).strip() + ('…' if end < len(text) else '')
+
+
+class UserShard:
+    """Inverted index over one user's projects and sections"""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.fields: Dict[DocKey, Dict[str, str]] = {}
+        self.terms: Dict[DocKey, Counter] = {}
+        self.lengths: Dict[DocKey, int] = {}
+        self.postings: Dict[str, Set[DocKey]] = defaultdict(set)
+        self.project_titles: Dict[str, str] = {}
+        self.total_length = 0
+
+    def put(self, key: DocKey, fields: Dict[str, str]) -> None:
+        """Index (or re-index) one document"""
+        self.remove(key)
+        terms = Counter()
+        for name, text in fields.items():
+            for token in tokenize(text):
+                terms[token] += FIELD_WEIGHTS[name]
+        self.fields[key] = fields
+        self.terms[key] = terms
+        self.lengths[key] = sum(terms.values())
+        self.total_length += self.lengths[key]
+        for token in terms:
+            self.postings[token].add(key)
+
+    def remove(self, key: DocKey) -> None:
+        terms = self.terms.pop(key, None)
+        if terms is None:
+            return
+        del self.fields[key]
+        self.total_length -= self.lengths.pop(key)
+        for token in terms:
+            keys = self.postings[token]
+            keys.discard(key)
+            if not keys:
+                del self.postings[token]
+
+    def put_project(self, project_data: dict) -> None:
+        project_id = project_data['id']
+        self.remove_project(project_id)
+        self.project_titles[project_id] = project_data.get('title') or ''
+        self.put((project_id, None), {
+            'title': project_data.get('title') or '',
+            'topic': project_data.get('topic') or '',
+            'description': project_data.get('description') or '',
+        })
+        for section in project_data.get('sections', []):
+            self.put_section(project_id, section)
+
+    def put_section(self, project_id: str, section: dict) -> None:
+        self.put((project_id, section['id']), {
+            'section_title': section.get('title') or '',
+            'content': section.get('content') or '',
+        })
+
+    def remove_project(self, project_id: str) -> None:
+        for key in [k for k in self.fields if k[0] == project_id]:
+            self.remove(key)
+        self.project_titles.pop(project_id, None)
+
+    def update_project(self, project_id: str, changes: dict) -> None:
+        """Apply changed project fields; a 'sections' change replaces every section"""
+        fields = self.fields.get((project_id, None))
+        if fields is not None:
+            updated = {
+                name: (changes[name] or '') if name in changes else text
+                for name, text in fields.items()
+            }
+            self.put((project_id, None), updated)
+            self.project_titles[project_id] = updated['title']
+        if 'sections' in changes:
+            for key in [k for k in self.fields if k[0] == project_id and k[1] is not None]:
+                self.remove(key)
+            for section in changes['sections'] or []:
+                self.put_section(project_id, section)
+
+    def search(self, query: str, limit: int) -> List[dict]:
+        """BM25-ranked hits with highlighted snippets"""
+        terms = set(tokenize(query))
+        if not terms or not self.fields:
+            return []
+
+        doc_count = len(self.fields)
+        average_length = self.total_length / doc_count or 1
+        scores: Dict[DocKey, float] = defaultdict(float)
+        for term in terms:
+            keys = self.postings.get(term)
+            if not keys:
+                continue
+            idf = math.log(1 + (doc_count - len(keys) + 0.5) / (len(keys) + 0.5))
+            for key in keys:
+                tf = self.terms[key][term]
+                norm = _K1 * (1 - _B + _B * self.lengths[key] / average_length)
+                scores[key] += idf * tf * (_K1 + 1) / (tf + norm)
+
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [self._hit(key, score, terms) for key, score in ranked]
+
+    def _hit(self, key: DocKey, score: float, terms: Set[str]) -> dict:
+        project_id, section_id = key
+        fields = self.fields[key]
+        snippet_field = next(
+            (name for name in _SNIPPET_FIELDS if terms & set(tokenize(fields.get(name, '')))),
+            None
+        )
+        return {
+            'project_id': project_id,
+            'project_title': self.project_titles.get(project_id, ''),
+            'section_id': section_id,
+            'section_title': fields.get('section_title'),
+            'score': round(score, 4),
+            'field': snippet_field,
+            'snippet': highlight(fields[snippet_field], terms, settings.SEARCH_SNIPPET_CHARS) if snippet_field else ''
+        }
+
+
+class SearchIndex:
+    """
+    Per-user search shards kept in memory
+    A shard is built from storage on the user's first search, then kept current
+    from project events, so queries never scan storage. Events never read storage
+    themselves: updates without their changed fields mark the project stale and
+    it is re-read on the owner's next search. Least recently used shards are
+    dropped beyond SEARCH_MAX_SHARDS and rebuilt on demand.
+    """
+
+    def __init__(self, max_shards: int):
+        self.max_shards = max_shards
+        self._shards: "OrderedDict[str, UserShard]" = OrderedDict()
+        self._owners: Dict[str, str] = {}
+        # Stale project id -> times marked, so a refresh racing a newer update keeps it stale
+        self._stale: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def search(self, user_id: str, query: str, limit: int = 20) -> List[dict]:
+        with self._lock:
+            shard = self._shard(user_id)
+            stale = {
+                project_id: marks for project_id, marks in self._stale.items()
+                if self._owners.get(project_id) == user_id
+            }
+        if stale:
+            self._refresh(shard, stale)
+        with self._lock:
+            return shard.search(query, limit)
+
+    def _refresh(self, shard: UserShard, stale: Dict[str, int]) -> None:
+        """Re-index stale projects; storage is read outside the index lock"""
+        projects = {p['id']: p for p in get_storage().get_projects(list(stale), with_versions=False)}
+        with self._lock:
+            for project_id, marks in stale.items():
+                if project_id not in self._stale:
+                    # Deleted meanwhile
+                    continue
+                if self._stale[project_id] == marks:
+                    del self._stale[project_id]
+                if project_id in projects:
+                    shard.put_project(projects[project_id])
+                else:
+                    shard.remove_project(project_id)
+                    self._owners.pop(project_id, None)
+
+    def _shard(self, user_id: str) -> UserShard:
+        shard = self._shards.get(user_id)
+        if shard is not None:
+            self._shards.move_to_end(user_id)
+            return shard
+
+        shard = UserShard(user_id)
+        for project_data in get_storage().list_projects(user_id, with_versions=False):
+            shard.put_project(project_data)
+            self._owners[project_data['id']] = user_id
+        self._shards[user_id] = shard
+        logger.info(f"Built search shard for user {user_id}: {len(shard.fields)} documents")
+
+        while len(self._shards) > self.max_shards:
+            _, evicted = self._shards.popitem(last=False)
+            for project_id in evicted.project_titles:
+                self._owners.pop(project_id, None)
+                self._stale.pop(project_id, None)
+        return shard
+
+    def on_event(self, project_id: str, event: dict) -> None:
+        """Apply a project event to the owner's shard (projects of unloaded shards are skipped)"""
+        with self._lock:
+            if event['type'] == PROJECT_CREATED:
+                shard = self._shards.get(event['project']['user_id'])
+                if shard is not None:
+                    shard.put_project(event['project'])
+                    self._owners[project_id] = shard.user_id
+                return
+
+            user_id = self._owners.get(project_id)
+            shard = self._shards.get(user_id) if user_id else None
+            if shard is None:
+                return
+
+            if event['type'] == PROJECT_DELETED:
+                shard.remove_project(project_id)
+                del self._owners[project_id]
+                self._stale.pop(project_id, None)
+            elif event['type'] == PROJECT_UPDATED:
+                if 'changes' in event and project_id not in self._stale:
+                    shard.update_project(project_id, event['changes'])
+                else:
+                    self._stale[project_id] = self._stale.get(project_id, 0) + 1
+            elif event['type'] == SECTION_ADDED:
+                shard.put_section(project_id, event['section'])
+            elif event['type'] in (CONTENT_UPDATED, VERSION_ADDED, REVERTED) and 'content' in event:
+                key = (project_id, event['section_id'])
+                fields = shard.fields.get(key)
+                if fields is not None:
+                    shard.put(key, {**fields, 'content': event['content'] or ''})
+
+
+search_index = SearchIndex(max_shards=settings.SEARCH_MAX_SHARDS)
+event_hub.add_listener(search_index.on_event)
@@ -0,0 +1,192 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.storage import get_storage, get_archive_store
+from app.storage.base import version_metadata
+from app.services.job_service import job_handler, job_queue, JobContext
+from app.services.feedback_buffer import feedback_buffer
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _archive_key(project_id: str, section_id: str) -> str:
+    return f"versions/{project_id}/{section_id}.json.gz"
+
+
+def _encode(versions: List[dict]) -> bytes:
+    def default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return gzip.compress(json.dumps(versions, default=default).encode('utf-8'))
+
+
+def _decode(data: bytes) -> List[dict]:
+    versions = json.loads(gzip.decompress(data).decode('utf-8'))
+    for version in versions:
+        if isinstance(version.get('timestamp'), str):
+            version['timestamp'] = datetime.fromisoformat(version['timestamp'])
+    return versions
+
+
+def select_archivable(versions: List[dict]) -> List[dict]:
+    """
+    Versions the retention policy moves to the archive
+    Kept inline: the last VERSION_RETAIN_LAST, liked versions and the first draft
+    """
+    ordered = sorted(versions, key=lambda v: v['version'])
+    keep = {v['version'] for v in ordered[-settings.VERSION_RETAIN_LAST:]} if settings.VERSION_RETAIN_LAST > 0 else set()
+    if settings.VERSION_RETAIN_FIRST and ordered:
+        keep.add(ordered[0]['version'])
+    if settings.VERSION_RETAIN_LIKED:
+        keep.update(v['version'] for v in ordered if v.get('feedback') == 'like')
+    return [v for v in ordered if v['version'] not in keep]
+
+
+class VersionArchiveService:
+    @staticmethod
+    def load_archived(project_id: str, section: dict) -> List[dict]:
+        """All archived versions of a section (oldest first); empty when nothing is archived"""
+        if not section.get('archive'):
+            return []
+        data = get_archive_store().get(_archive_key(project_id, section['id']))
+        return _decode(data) if data else []
+
+    @staticmethod
+    def find_version(project_id: str, section: dict, version: int) -> Optional[dict]:
+        """Look a version up inline first, then in the archive"""
+        for candidate in section.get('versions') or []:
+            if candidate['version'] == version:
+                return candidate
+        return next(
+            (v for v in VersionArchiveService.load_archived(project_id, section) if v['version'] == version),
+            None
+        )
+
+    @staticmethod
+    def list_archived_metadata(project_id: str, section: dict, before: Optional[int], limit: int) -> List[dict]:
+        """Archived version metadata, newest first, numbered below `before`"""
+        archived = [
+            v for v in reversed(VersionArchiveService.load_archived(project_id, section))
+            if before is None or v['version'] < before
+        ]
+        return [version_metadata(v) for v in archived[:limit]]
+
+    @staticmethod
+    def compact_project(project_id: str) -> int:
+        """
+        Apply the retention policy to every section of a project
+        Returns the number of versions moved to the archive.
+        """
+        storage = get_storage()
+        archive = get_archive_store()
+        # Feedback decides what is retained
+        feedback_buffer.flush_project(project_id)
+        project_data = storage.get_project(project_id)
+        if project_data is None:
+            return 0
+
+        # (version, timestamp) identifies a version even if the history is regenerated meanwhile
+        archived: Dict[str, set] = {}
+        for section in project_data['sections']:
+            moving = select_archivable(section.get('versions') or [])
+            if not moving:
+                continue
+            # A section without an archive stub has a fresh history; start a new blob
+            existing = VersionArchiveService.load_archived(project_id, section)
+            known = {v['version'] for v in existing}
+            merged = existing + [v for v in moving if v['version'] not in known]
+            archive.put(_archive_key(project_id, section['id']), _encode(merged))
+            archived[section['id']] = {(v['version'], str(v.get('timestamp'))) for v in moving}
+
+        # Blobs of sections that no longer exist
+        section_ids = {section['id'] for section in project_data['sections']}
+        for key in archive.list(f"versions/{project_id}/"):
+            if key.rsplit('/', 1)[-1].split('.', 1)[0] not in section_ids:
+                archive.delete(key)
+
+        if not archived:
+            return 0
+
+        # Prune the latest copy so versions added meanwhile are kept
+        latest = storage.get_project(project_id)
+        if latest is None:
+            return 0
+        moved = 0
+        for section in latest['sections']:
+            numbers = archived.get(section['id'])
+            if not numbers:
+                continue
+            versions = section.get('versions') or []
+            pruned = [v for v in versions if (v['version'], str(v.get('timestamp'))) in numbers]
+            if pruned:
+                section['versions'] = [v for v in versions if v not in pruned]
+                previous = section.get('archive') or {'count': 0, 'last_version': 0}
+                section['archive'] = {
+                    'count': previous['count'] + len(pruned),
+                    'last_version': max([previous['last_version']] + [v['version'] for v in pruned])
+                }
+                moved += len(pruned)
+
+        if moved:
+            storage.update_project(project_id, {'sections': latest['sections']})
+            logger.info(f"Archived {moved} versions for project: {project_id}")
+        return moved
+
+    @staticmethod
+    def delete_project(project_id: str) -> None:
+        archive = get_archive_store()
+        for key in archive.list(f"versions/{project_id}/"):
+            archive.delete(key)
+
+
+class VersionCompactor:
+    """Periodically queues the compaction job as background work"""
+
+    def __init__(self, interval_hours: float):
+        self.interval_hours = interval_hours
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval_hours > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_hours * 3600)
+            try:
+                await job_queue.submit("compact_versions", "system", {}, background=True)
+            except Exception as e:
+                logger.error(f"Could not queue version compaction: {str(e)}")
+
+
+version_compactor = VersionCompactor(settings.VERSION_COMPACTION_INTERVAL_HOURS)
+
+
+@job_handler("compact_versions")
+async def run_compact_versions_job(context: JobContext, params: dict) -> dict:
+    """Compact one project (params['project_id']) or all of them"""
+    project_ids = [params['project_id']] if params.get('project_id') else get_storage().list_project_ids()
+    moved = 0
+    for done, project_id in enumerate(project_ids):
+        context.report_progress(done, len(project_ids), f"Compacting {project_id}")
+        try:
+            moved += await asyncio.to_thread(VersionArchiveService.compact_project, project_id)
+        except Exception as e:
+            logger.error(f"Compaction failed for {project_id}: {str(e)}")
+    result = {'projects': len(project_ids), 'archived_versions': moved}
+    if not params.get('project_id'):
+        # Periodic full runs also drop section text that nothing references any more
+        result['removed_blobs'] = await asyncio.to_thread(get_storage().collect_garbage)
+    context.report_progress(len(project_ids), len(project_ids), "Done")
+    return result
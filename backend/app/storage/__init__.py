@@ -0,0 +1,41 @@
+from typing import Optional
+from app.core.config import settings
+from app.storage.base import (
+    StorageBackend, StorageError, EmailAlreadyExistsError, UserNotFoundError
+)
+from app.storage.archive import ArchiveStore, get_archive_store, set_archive_store
+
+_storage: Optional[StorageBackend] = None
+
+
+def _create_storage() -> StorageBackend:
+    """Build the backend selected by STORAGE_BACKEND"""
+    backend = settings.STORAGE_BACKEND.lower()
+    if backend == "firestore":
+        from app.storage.firestore_storage import FirestoreStorage
+        return FirestoreStorage()
+    if backend == "sqlite":
+        from app.storage.sqlite_storage import SQLiteStorage
+        return SQLiteStorage(settings.SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+
+
+def get_storage() -> StorageBackend:
+    """Return the process-wide storage backend, creating it on first use"""
+    global _storage
+    if _storage is None:
+        _storage = _create_storage()
+    return _storage
+
+
+def set_storage(storage: StorageBackend) -> None:
+    """Override the storage backend (used by benchmarks and local tooling)"""
+    global _storage
+    _storage = storage
+
+
+__all__ = [
+    "StorageBackend", "StorageError", "EmailAlreadyExistsError", "UserNotFoundError",
+    "get_storage", "set_storage",
+    "ArchiveStore", "get_archive_store", "set_archive_store"
+]
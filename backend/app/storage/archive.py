@@ -0,0 +1,119 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from app.core.config import settings
+
+
+class ArchiveStore(ABC):
+    """Blob store for cold data (compacted version history)"""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Create or replace a blob"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Return a blob, or None if it does not exist"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete a blob if it exists"""
+
+    @abstractmethod
+    def list(self, prefix: str) -> List[str]:
+        """Return the keys starting with `prefix`"""
+
+
+class LocalArchiveStore(ArchiveStore):
+    """Blobs as files under a local directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Invalid archive key: {key}")
+        return path
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial blob
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix: str) -> List[str]:
+        keys = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, '/')
+                if key.startswith(prefix) and not key.endswith('.tmp'):
+                    keys.append(key)
+        return keys
+
+
+class GCSArchiveStore(ArchiveStore):
+    """Blobs in a Google Cloud Storage bucket (uses the Firebase service account)"""
+
+    def __init__(self, bucket_name: str):
+        from google.cloud import storage as gcs
+        self.bucket = gcs.Client().bucket(bucket_name)
+
+    def put(self, key: str, data: bytes) -> None:
+        self.bucket.blob(key).upload_from_string(data, content_type='application/gzip')
+
+    def get(self, key: str) -> Optional[bytes]:
+        from google.api_core.exceptions import NotFound
+        try:
+            return self.bucket.blob(key).download_as_bytes()
+        except NotFound:
+            return None
+
+    def delete(self, key: str) -> None:
+        from google.api_core.exceptions import NotFound
+        try:
+            self.bucket.blob(key).delete()
+        except NotFound:
+            pass
+
+    def list(self, prefix: str) -> List[str]:
+        return [blob.name for blob in self.bucket.list_blobs(prefix=prefix)]
+
+
+_archive: Optional[ArchiveStore] = None
+
+
+def get_archive_store() -> ArchiveStore:
+    """Return the process-wide archive store selected by ARCHIVE_BACKEND"""
+    global _archive
+    if _archive is None:
+        backend = settings.ARCHIVE_BACKEND.lower()
+        if backend == "local":
+            _archive = LocalArchiveStore(settings.ARCHIVE_PATH)
+        elif backend == "gcs":
+            _archive = GCSArchiveStore(settings.ARCHIVE_BUCKET)
+        else:
+            raise ValueError(f"Unknown ARCHIVE_BACKEND: {settings.ARCHIVE_BACKEND}")
+    return _archive
+
+
+def set_archive_store(store: ArchiveStore) -> None:
+    """Override the archive store (used by benchmarks and local tooling)"""
+    global _archive
+    _archive = store
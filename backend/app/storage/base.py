@@ -0,0 +1,236 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+# Fields returned by version history listings (everything except the content)
+VERSION_METADATA_FIELDS = ('version', 'prompt', 'timestamp', 'feedback', 'comment', 'revision')
+
+
+def version_metadata(version: dict) -> dict:
+    return {field: version.get(field) for field in VERSION_METADATA_FIELDS if field in version}
+
+
+def drop_versions(project: dict) -> dict:
+    """Replace each section's versions with a 'version_count'"""
+    for section in project.get('sections', []):
+        section['version_count'] = len(section.pop('versions', None) or [])
+    return project
+
+
+# Delta-sync bookkeeping that a copied project starts over
+PROJECT_SYNC_FIELDS = ('revision', 'meta_revision', 'removed_sections', 'tombstone_horizon')
+
+
+def clone_data(source: dict, with_versions: bool = True) -> dict:
+    """
+    A project's stored fields without id and sync bookkeeping, ready to store as a new project
+    Archived history stays with the source.
+    """
+    data = {k: v for k, v in source.items() if k not in PROJECT_SYNC_FIELDS and k != 'id'}
+    data['sections'] = [
+        {
+            **{k: v for k, v in section.items() if k not in ('revision', 'archive', 'version_count')},
+            'versions': [
+                {k: v for k, v in version.items() if k != 'revision'}
+                for version in section.get('versions') or []
+            ] if with_versions else []
+        }
+        for section in source.get('sections', [])
+    ]
+    return data
+
+
+class StorageError(Exception):
+    """Base class for storage backend errors"""
+
+
+class EmailAlreadyExistsError(StorageError):
+    """Raised when registering an email that already has an account"""
+
+
+class UserNotFoundError(StorageError):
+    """Raised when no account exists for the given email"""
+
+
+class StorageBackend(ABC):
+    """
+    Persistence interface for users, projects, sections and versions
+    Projects are exchanged as plain dicts shaped like the Firestore documents:
+    sections (with their versions) are nested inside the project dict.
+    """
+
+    # ===== Identity =====
+    @abstractmethod
+    def create_auth_user(self, email: str, password: str, display_name: str) -> str:
+        """Create a login identity and return its user id"""
+
+    @abstractmethod
+    def get_auth_user_by_email(self, email: str) -> dict:
+        """
+        Return {'uid', 'email', 'display_name'} for an identity
+        Backends that store credentials themselves also return 'password_hash'
+        """
+
+    # ===== Users =====
+    @abstractmethod
+    def create_user(self, user_id: str, data: dict) -> None:
+        """Store a user profile"""
+
+    @abstractmethod
+    def get_user(self, user_id: str) -> Optional[dict]:
+        """Return a user profile or None"""
+
+    @abstractmethod
+    def increment_user_counter(self, user_id: str, field: str, amount: int) -> None:
+        """Atomically add `amount` to a numeric profile field"""
+
+    # ===== Projects =====
+    @abstractmethod
+    def list_projects(self, user_id: str, with_versions: bool = True) -> List[Dict]:
+        """
+        Return all projects owned by a user, each including its 'id'
+        Without versions, each section carries a 'version_count' instead
+        """
+
+    @abstractmethod
+    def get_project(self, project_id: str, with_versions: bool = True) -> Optional[dict]:
+        """
+        Return a project including its 'id', or None
+        Without versions, each section carries a 'version_count' instead
+        """
+
+    @abstractmethod
+    def list_project_ids(self) -> List[str]:
+        """Return the ids of all projects (for maintenance jobs)"""
+
+    @abstractmethod
+    def create_project(self, project_id: str, data: dict) -> None:
+        """Store a new project with its sections, stamped as revision 1 (see storage/revisions.py)"""
+
+    @abstractmethod
+    def update_project(self, project_id: str, fields: dict) -> None:
+        """
+        Update top-level project fields; 'sections' replaces the section list
+        Bumps the project revision and stamps changed sections and versions with it
+        """
+
+    @abstractmethod
+    def delete_project(self, project_id: str) -> None:
+        """Delete a project with its sections and versions"""
+
+    def create_projects(self, user_id: str, projects: Dict[str, dict]) -> None:
+        """
+        Store several new projects of one user (keyed by id) and add them to 'total_projects'
+        Backends should override this to write projects and counter in one batch.
+        """
+        for project_id, data in projects.items():
+            self.create_project(project_id, data)
+        self.increment_user_counter(user_id, 'total_projects', len(projects))
+
+    def get_projects(self, project_ids: List[str], with_versions: bool = True) -> List[dict]:
+        """Return the existing projects among `project_ids`, in that order"""
+        projects = (self.get_project(project_id, with_versions) for project_id in project_ids)
+        return [project for project in projects if project is not None]
+
+    def delete_projects(self, user_id: str, project_ids: List[str]) -> List[str]:
+        """
+        Delete the projects among `project_ids` owned by the user and subtract them from 'total_projects'
+        Returns the ids that were deleted. Backends should override this to delete in one batch.
+        """
+        owned = [
+            project['id'] for project in self.get_projects(project_ids, with_versions=False)
+            if project['user_id'] == user_id
+        ]
+        for project_id in owned:
+            self.delete_project(project_id)
+        if owned:
+            self.increment_user_counter(user_id, 'total_projects', -len(owned))
+        return owned
+
+    def clone_project(self, project_id: str, new_id: str, fields: dict, with_versions: bool = True) -> bool:
+        """
+        Copy a project under `new_id` for the same user, overriding top-level `fields`
+        Counts towards the user's 'total_projects'. Returns False if the source does not exist.
+        Backends should override this to copy references instead of content.
+        """
+        source = self.get_project(project_id, with_versions)
+        if source is None:
+            return False
+        data = {**clone_data(source, with_versions), **fields}
+        self.create_projects(source['user_id'], {new_id: data})
+        return True
+
+    def collect_garbage(self) -> int:
+        """Remove stored content no project references any more; returns how many blobs were removed"""
+        return 0
+
+    def list_versions(
+        self,
+        project_id: str,
+        section_id: str,
+        before: Optional[int] = None,
+        limit: int = 20
+    ) -> Optional[List[dict]]:
+        """
+        Version metadata (no content) for a section, newest first
+        Returns up to `limit` versions numbered below `before`, or None if the section does not exist.
+        Backends that store versions separately should override this to avoid loading the project.
+        """
+        section = self._find_section(project_id, section_id)
+        if section is None:
+            return None
+        versions = [
+            v for v in reversed(section.get('versions') or [])
+            if before is None or v['version'] < before
+        ]
+        return [version_metadata(v) for v in versions[:limit]]
+
+    def get_version(self, project_id: str, section_id: str, version: int) -> Optional[dict]:
+        """Return one version including its content, or None"""
+        section = self._find_section(project_id, section_id)
+        if section is None:
+            return None
+        return next((v for v in section.get('versions') or [] if v['version'] == version), None)
+
+    def update_version_fields(self, project_id: str, updates: Dict[Tuple[str, int], dict]) -> None:
+        """
+        Set fields (e.g. feedback, comment) on existing versions, keyed by (section_id, version)
+        Missing projects and versions are skipped. Bumps the project revision like update_project.
+        Backends that store versions separately should override this to avoid rewriting the sections.
+        """
+        project = self.get_project(project_id)
+        if project is None:
+            return
+        changed = False
+        for section in project['sections']:
+            for version in section.get('versions') or []:
+                fields = updates.get((section['id'], version['version']))
+                if fields:
+                    version.update(fields)
+                    changed = True
+        if changed:
+            self.update_project(project_id, {'sections': project['sections']})
+
+    def _find_section(self, project_id: str, section_id: str) -> Optional[dict]:
+        project = self.get_project(project_id)
+        if project is None:
+            return None
+        return next((s for s in project['sections'] if s['id'] == section_id), None)
+
+    # ===== Jobs =====
+    @abstractmethod
+    def save_job(self, job_id: str, data: dict) -> None:
+        """Create or replace a background job record (files a job produces live in the archive store under 'artifact_key')"""
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Return a background job record, or None"""
+
+    @abstractmethod
+    def list_jobs(self, statuses: List[str], updated_before: Optional[datetime] = None) -> List[dict]:
+        """Job records in any of `statuses`, optionally only those last updated before a time"""
+
+    @abstractmethod
+    def delete_job(self, job_id: str) -> None:
+        """Delete a background job record (its archived file is the caller's concern)"""
@@ -0,0 +1,66 @@
+"""
+Content-addressed text storage shared by the storage backends
+
+Section and version text is stored once per distinct value, keyed by its
+SHA-256, and referenced from sections and versions by 'content_ref'. Empty
+content stays inline. Blobs are immutable, so copies of a project share them
+until one side is edited (copy-on-write).
+"""
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _externalize_entry(entry: dict, blobs: Dict[str, str]) -> dict:
+    content = entry.get('content')
+    if not content:
+        return entry
+    ref = content_hash(content)
+    blobs[ref] = content
+    stored = {k: v for k, v in entry.items() if k != 'content'}
+    stored['content_ref'] = ref
+    return stored
+
+
+def externalize_sections(sections: List[dict], blobs: Dict[str, str]) -> List[dict]:
+    """
+    Copies of `sections` with content replaced by 'content_ref'
+    The referenced text is added to `blobs` (hash -> text).
+    """
+    stored = []
+    for section in sections:
+        entry = _externalize_entry(section, blobs)
+        if section.get('versions'):
+            entry = {**entry, 'versions': [_externalize_entry(v, blobs) for v in section['versions']]}
+        stored.append(entry)
+    return stored
+
+
+def section_refs(sections: Iterable[dict]) -> Set[str]:
+    """Blob hashes referenced by stored sections and their versions"""
+    refs = set()
+    for section in sections:
+        for entry in [section] + list(section.get('versions') or []):
+            if entry.get('content_ref'):
+                refs.add(entry['content_ref'])
+    return refs
+
+
+def internalize_sections(sections: List[dict], blobs: Dict[str, Optional[str]]) -> None:
+    """Resolve 'content_ref' back into 'content' in place"""
+    for section in sections:
+        for entry in [section] + list(section.get('versions') or []):
+            ref = entry.pop('content_ref', None)
+            if ref is not None:
+                entry['content'] = blobs.get(ref) or ''
+
+
+def comparable(entry: dict, ignored) -> dict:
+    """An entry without `ignored` keys, with content in stored (referenced) form"""
+    data = {k: v for k, v in entry.items() if k not in ignored}
+    if data.get('content'):
+        data['content_ref'] = content_hash(data.pop('content'))
+    return data
@@ -0,0 +1,301 @@
+import copy
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from firebase_admin import auth as firebase_auth
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud import firestore
+from app.core.config import settings
+from app.storage.base import StorageBackend, EmailAlreadyExistsError, UserNotFoundError, drop_versions, clone_data
+from app.storage.blobs import externalize_sections, internalize_sections, section_refs
+from app.storage.revisions import stamp_revisions
+from typing import Dict, List, Optional, Tuple
+
+# Firestore rejects batches with more writes than this
+BATCH_LIMIT = 500
+
+# Blobs written this recently are not rewritten (must stay well below BLOB_GC_GRACE_HOURS)
+BLOB_RECENT_SECONDS = 3600
+MAX_RECENT_BLOBS = 100000
+
+
+class FirestoreStorage(StorageBackend):
+    """
+    Firestore-backed storage
+    Projects are single documents with sections and versions nested inline;
+    their text lives in the shared 'blobs' collection, referenced by hash
+    """
+
+    def __init__(self, db=None):
+        if db is None:
+            # Imported lazily so other backends never initialize Firebase
+            from app.utils.firebase_client import db
+        self.db = db
+        self._recent_blobs: "OrderedDict[str, float]" = OrderedDict()
+
+    # ===== Identity =====
+    def create_auth_user(self, email: str, password: str, display_name: str) -> str:
+        try:
+            user = firebase_auth.create_user(
+                email=email,
+                password=password,
+                display_name=display_name
+            )
+        except firebase_auth.EmailAlreadyExistsError:
+            raise EmailAlreadyExistsError(email)
+        return user.uid
+
+    def get_auth_user_by_email(self, email: str) -> dict:
+        try:
+            user = firebase_auth.get_user_by_email(email)
+        except firebase_auth.UserNotFoundError:
+            raise UserNotFoundError(email)
+        return {
+            'uid': user.uid,
+            'email': user.email,
+            'display_name': user.display_name
+        }
+
+    # ===== Users =====
+    def create_user(self, user_id: str, data: dict) -> None:
+        self.db.collection('users').document(user_id).set(data)
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        user_doc = self.db.collection('users').document(user_id).get()
+        if not user_doc.exists:
+            return None
+        return user_doc.to_dict()
+
+    def increment_user_counter(self, user_id: str, field: str, amount: int) -> None:
+        self.db.collection('users').document(user_id).update({field: firestore.Increment(amount)})
+
+    # ===== Projects =====
+    def _resolve(self, projects: List[dict], with_versions: bool) -> List[dict]:
+        """Drop versions if not wanted, then load referenced text in one batched read"""
+        if not with_versions:
+            for project_data in projects:
+                drop_versions(project_data)
+        refs = section_refs(s for project_data in projects for s in project_data.get('sections', []))
+        blobs = {}
+        if refs:
+            blob_refs = [self.db.collection('blobs').document(ref) for ref in refs]
+            for snapshot in self.db.get_all(blob_refs):
+                if snapshot.exists:
+                    blobs[snapshot.id] = snapshot.to_dict()['data']
+        for project_data in projects:
+            internalize_sections(project_data.get('sections', []), blobs)
+        return projects
+
+    def _externalize(self, data: dict, blobs: Dict[str, str]) -> dict:
+        if 'sections' not in data:
+            return data
+        return {**data, 'sections': externalize_sections(data['sections'], blobs)}
+
+    def _write_blobs(self, blobs: Dict[str, str]) -> None:
+        """
+        Store blobs before anything references them
+        Blobs this process wrote within BLOB_RECENT_SECONDS are skipped; they are
+        younger than the garbage-collection grace period, so they cannot be removed yet.
+        """
+        now = time.monotonic()
+        pending = [
+            (ref, text) for ref, text in blobs.items()
+            if now - self._recent_blobs.get(ref, float('-inf')) > BLOB_RECENT_SECONDS
+        ]
+        for start in range(0, len(pending), BATCH_LIMIT):
+            batch = self.db.batch()
+            for ref, text in pending[start:start + BATCH_LIMIT]:
+                batch.set(self.db.collection('blobs').document(ref), {'data': text})
+            batch.commit()
+        for ref, _ in pending:
+            self._recent_blobs[ref] = now
+            self._recent_blobs.move_to_end(ref)
+        while len(self._recent_blobs) > MAX_RECENT_BLOBS:
+            self._recent_blobs.popitem(last=False)
+
+    def list_projects(self, user_id: str, with_versions: bool = True) -> List[Dict]:
+        projects = self.db.collection('projects').where('user_id', '==', user_id).stream()
+        result = []
+        for project in projects:
+            project_data = project.to_dict()
+            project_data['id'] = project.id
+            result.append(project_data)
+        return self._resolve(result, with_versions)
+
+    def get_project(self, project_id: str, with_versions: bool = True) -> Optional[dict]:
+        # Versions live inside the project document, so they are always read
+        project = self.db.collection('projects').document(project_id).get()
+        if not project.exists:
+            return None
+        project_data = project.to_dict()
+        project_data['id'] = project_id
+        return self._resolve([project_data], with_versions)[0]
+
+    def list_project_ids(self) -> List[str]:
+        return [project.id for project in self.db.collection('projects').stream()]
+
+    def create_project(self, project_id: str, data: dict) -> None:
+        stamp_revisions(None, data)
+        blobs = {}
+        stored = self._externalize(data, blobs)
+        self._write_blobs(blobs)
+        self.db.collection('projects').document(project_id).set(stored)
+
+    def update_project(self, project_id: str, fields: dict) -> None:
+        """
+        Stamp and write in one transaction, so concurrent writers get distinct revisions
+        Blobs are content-addressed and written up front; a retried transaction reuses them.
+        """
+        project_ref = self.db.collection('projects').document(project_id)
+        blobs = {}
+        self._externalize(fields, blobs)
+        self._write_blobs(blobs)
+
+        @firestore.transactional
+        def apply(transaction):
+            current = project_ref.get(transaction=transaction)
+            stamp_revisions(current.to_dict() if current.exists else None, fields)
+            transaction.update(project_ref, self._externalize(fields, {}))
+
+        apply(self.db.transaction())
+
+    def update_version_fields(self, project_id: str, updates: Dict[Tuple[str, int], dict]) -> None:
+        """
+        One transactional read and update of the project document
+        Versions are nested in the sections array, so the stored (referenced) sections
+        are rewritten as they are; no text is re-hashed and no blobs are written.
+        """
+        project_ref = self.db.collection('projects').document(project_id)
+
+        @firestore.transactional
+        def apply(transaction):
+            current = project_ref.get(transaction=transaction)
+            if not current.exists:
+                return
+            stored = current.to_dict()
+            sections = copy.deepcopy(stored.get('sections', []))
+            changed = False
+            for section in sections:
+                for version in section.get('versions') or []:
+                    fields = updates.get((section['id'], version['version']))
+                    if fields:
+                        version.update(fields)
+                        changed = True
+            if not changed:
+                return
+            fields = {'sections': sections}
+            stamp_revisions(stored, fields)
+            transaction.update(project_ref, fields)
+
+        apply(self.db.transaction())
+
+    def delete_project(self, project_id: str) -> None:
+        self.db.collection('projects').document(project_id).delete()
+
+    def create_projects(self, user_id: str, projects: Dict[str, dict]) -> None:
+        blobs = {}
+        stored = {}
+        for project_id, data in projects.items():
+            stamp_revisions(None, data)
+            stored[project_id] = self._externalize(data, blobs)
+        self._write_blobs(blobs)
+
+        # Each batch carries its own counter increment, so the count matches what was committed
+        items = list(stored.items())
+        user_ref = self.db.collection('users').document(user_id)
+        for start in range(0, len(items), BATCH_LIMIT - 1):
+            chunk = items[start:start + BATCH_LIMIT - 1]
+            batch = self.db.batch()
+            for project_id, data in chunk:
+                batch.set(self.db.collection('projects').document(project_id), data)
+            batch.update(user_ref, {'total_projects': firestore.Increment(len(chunk))})
+            batch.commit()
+
+    def get_projects(self, project_ids: List[str], with_versions: bool = True) -> List[dict]:
+        refs = [self.db.collection('projects').document(project_id) for project_id in project_ids]
+        found = {}
+        for snapshot in self.db.get_all(refs):
+            if snapshot.exists:
+                project_data = snapshot.to_dict()
+                project_data['id'] = snapshot.id
+                found[snapshot.id] = project_data
+        self._resolve(list(found.values()), with_versions)
+        return [found[project_id] for project_id in project_ids if project_id in found]
+
+    def clone_project(self, project_id: str, new_id: str, fields: dict, with_versions: bool = True) -> bool:
+        """Copies the document with its blob references; no text is read or written"""
+        source = self.db.collection('projects').document(project_id).get()
+        if not source.exists:
+            return False
+        data = {**clone_data(source.to_dict(), with_versions), **fields}
+        stamp_revisions(None, data)
+        batch = self.db.batch()
+        batch.set(self.db.collection('projects').document(new_id), data)
+        batch.update(
+            self.db.collection('users').document(data['user_id']),
+            {'total_projects': firestore.Increment(1)}
+        )
+        batch.commit()
+        return True
+
+    def collect_garbage(self) -> int:
+        """
+        Delete blobs that no project references and that are older than BLOB_GC_GRACE_HOURS
+        Each delete is conditional on the blob being unchanged since it was listed, so a
+        blob rewritten by a concurrent save survives.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.BLOB_GC_GRACE_HOURS)
+        referenced = set()
+        for project in self.db.collection('projects').stream():
+            referenced |= section_refs((project.to_dict() or {}).get('sections', []))
+
+        removed = 0
+        for blob in self.db.collection('blobs').select([]).stream():
+            if blob.id in referenced or blob.update_time is None or blob.update_time > cutoff:
+                continue
+            try:
+                blob.reference.delete(option=self.db.write_option(last_update_time=blob.update_time))
+                removed += 1
+            except FailedPrecondition:
+                pass
+        return removed
+
+    def delete_projects(self, user_id: str, project_ids: List[str]) -> List[str]:
+        refs = [self.db.collection('projects').document(project_id) for project_id in project_ids]
+        # Only the owner field is needed to check ownership
+        owned = [
+            snapshot.id for snapshot in self.db.get_all(refs, field_paths=['user_id'])
+            if snapshot.exists and snapshot.to_dict().get('user_id') == user_id
+        ]
+        user_ref = self.db.collection('users').document(user_id)
+        for start in range(0, len(owned), BATCH_LIMIT - 1):
+            chunk = owned[start:start + BATCH_LIMIT - 1]
+            batch = self.db.batch()
+            for project_id in chunk:
+                batch.delete(self.db.collection('projects').document(project_id))
+            batch.update(user_ref, {'total_projects': firestore.Increment(-len(chunk))})
+            batch.commit()
+        return owned
+
+    # ===== Jobs =====
+    def save_job(self, job_id: str, data: dict) -> None:
+        self.db.collection('jobs').document(job_id).set(data)
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        job_doc = self.db.collection('jobs').document(job_id).get()
+        if not job_doc.exists:
+            return None
+        return job_doc.to_dict()
+
+    def list_jobs(self, statuses: List[str], updated_before: Optional[datetime] = None) -> List[dict]:
+        # One equality query per status; with updated_before this needs a (status, updated_at) index
+        jobs = []
+        for status in statuses:
+            query = self.db.collection('jobs').where('status', '==', status)
+            if updated_before is not None:
+                query = query.where('updated_at', '<', updated_before)
+            jobs.extend(job_doc.to_dict() for job_doc in query.stream())
+        return jobs
+
+    def delete_job(self, job_id: str) -> None:
+        self.db.collection('jobs').document(job_id).delete()
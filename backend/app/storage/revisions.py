@@ -0,0 +1,77 @@
+"""
+Revision stamping shared by the storage backends
+
+Every project write bumps the project's `revision`. Sections and versions
+that differ from the stored copy are stamped with the new revision, so
+clients can ask for everything that changed after a revision they have seen.
+"""
+from typing import Optional
+from app.storage.blobs import comparable
+
+# Removed-section tombstones kept per project for delta sync
+MAX_TOMBSTONES = 200
+
+# Bookkeeping fields that never count as a change
+_SECTION_IGNORED = ('revision', 'summary', 'versions')
+_PROJECT_IGNORED = ('id', 'sections', 'updated_at', 'revision', 'meta_revision',
+                    'removed_sections', 'tombstone_horizon')
+
+
+def _without(data: dict, keys) -> dict:
+    return {k: v for k, v in data.items() if k not in keys}
+
+
+def stamp_revisions(current: Optional[dict], fields: dict) -> int:
+    """
+    Stamp `fields` (a new project, or an update to `current`) with the next revision
+    Mutates fields in place and returns the new revision.
+    """
+    revision = (current or {}).get('revision', 0) + 1
+    fields['revision'] = revision
+
+    if current is None:
+        fields['meta_revision'] = revision
+        for section in fields.get('sections', []):
+            section['revision'] = revision
+            for version in section.get('versions') or []:
+                version['revision'] = revision
+        return revision
+
+    if any(current.get(k) != v for k, v in _without(fields, _PROJECT_IGNORED).items()):
+        fields['meta_revision'] = revision
+
+    if 'sections' not in fields:
+        return revision
+
+    stored = {section['id']: section for section in current.get('sections', [])}
+    for section in fields['sections']:
+        previous = stored.pop(section['id'], None)
+        previous_versions = {
+            v['version']: v for v in (previous or {}).get('versions') or []
+        }
+
+        # Content may be inline or referenced by hash; compare in referenced form
+        changed = previous is None or comparable(previous, _SECTION_IGNORED) != comparable(section, _SECTION_IGNORED)
+        for version in section.get('versions') or []:
+            old = previous_versions.pop(version['version'], None)
+            if old is None or comparable(old, ('revision',)) != comparable(version, ('revision',)):
+                version['revision'] = revision
+                changed = True
+            else:
+                version['revision'] = old.get('revision', 0)
+        # Versions were dropped (history replaced)
+        changed = changed or bool(previous_versions)
+
+        section['revision'] = revision if changed else previous.get('revision', 0)
+
+    if stored:
+        tombstones = current.get('removed_sections', []) + [
+            {'id': section_id, 'revision': revision} for section_id in stored
+        ]
+        if len(tombstones) > MAX_TOMBSTONES:
+            # Clients older than the oldest dropped tombstone must resync fully
+            fields['tombstone_horizon'] = tombstones[-MAX_TOMBSTONES - 1]['revision']
+            tombstones = tombstones[-MAX_TOMBSTONES:]
+        fields['removed_sections'] = tombstones
+
+    return revision
@@ -0,0 +1,648 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.core.security import get_password_hash
+from app.storage.base import (
+    StorageBackend, EmailAlreadyExistsError, UserNotFoundError, version_metadata, clone_data
+)
+from app.storage.blobs import content_hash
+from app.storage.revisions import stamp_revisions
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT UNIQUE,
+    display_name TEXT,
+    password_hash TEXT,
+    total_projects INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    doc_type TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    description TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_projects_user ON projects (user_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS sections (
+    project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL DEFAULT '',
+    "order" INTEGER NOT NULL DEFAULT 0,
+    extra TEXT NOT NULL DEFAULT '{}',
+    content_hash TEXT,
+    PRIMARY KEY (project_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_sections_position ON sections (project_id, position);
+
+CREATE TABLE IF NOT EXISTS versions (
+    project_id TEXT NOT NULL,
+    section_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    prompt TEXT,
+    timestamp TEXT,
+    feedback TEXT,
+    comment TEXT,
+    extra TEXT NOT NULL DEFAULT '{}',
+    content_hash TEXT,
+    PRIMARY KEY (project_id, section_id, version),
+    FOREIGN KEY (project_id, section_id) REFERENCES sections (project_id, id) ON DELETE CASCADE
+);
+
+-- Section and version text, stored once per distinct value (see storage/blobs.py)
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL,
+    artifact BLOB,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, updated_at);
+"""
+
+USER_COLUMNS = ('email', 'display_name', 'total_projects', 'created_at')
+PROJECT_COLUMNS = ('user_id', 'title', 'doc_type', 'topic', 'description', 'created_at', 'updated_at')
+SECTION_COLUMNS = ('title', 'content', 'order')
+VERSION_COLUMNS = ('content', 'prompt', 'timestamp', 'feedback', 'comment')
+DATETIME_COLUMNS = {'created_at', 'updated_at', 'timestamp'}
+
+
+def _encode_value(value):
+    """Encode a value for a typed column; datetimes become ISO strings"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column: str, value):
+    if column in DATETIME_COLUMNS and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_hook(obj: dict):
+    if len(obj) == 1 and '$datetime' in obj:
+        return datetime.fromisoformat(obj['$datetime'])
+    return obj
+
+
+def _dump_extra(data: dict, columns) -> str:
+    """Serialize the fields that have no dedicated column"""
+    extra = {k: v for k, v in data.items() if k not in columns}
+    return json.dumps(extra, default=_json_default)
+
+
+def _load_extra(raw: str) -> dict:
+    return json.loads(raw, object_hook=_json_hook) if raw else {}
+
+
+def _row_content(row: sqlite3.Row) -> str:
+    """Text of a section/version row joined with blobs (rows written before blobs keep it inline)"""
+    if row['content_hash'] is None:
+        return row['content']
+    return row['blob'] or ''
+
+
+def _store_content(text: Optional[str], blobs: Dict[str, str]) -> Tuple[str, Optional[str]]:
+    """(inline content, content_hash) for a row; non-empty text goes to `blobs`"""
+    if not text:
+        return '', None
+    digest = content_hash(text)
+    blobs[digest] = text
+    return '', digest
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Embedded SQLite storage in WAL mode
+    Sections and versions live in their own indexed tables and are
+    reassembled into the nested project shape on read.
+    """
+
+    def __init__(self, path: str):
+        if path != ':memory:':
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Add columns introduced after a database was created"""
+        for table in ('sections', 'versions'):
+            columns = {row['name'] for row in self._conn.execute(f'PRAGMA table_info({table})')}
+            if 'content_hash' not in columns:
+                self._conn.execute(f'ALTER TABLE {table} ADD COLUMN content_hash TEXT')
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    # ===== Identity =====
+    def create_auth_user(self, email: str, password: str, display_name: str) -> str:
+        user_id = uuid.uuid4().hex
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    'INSERT INTO users (id, email, display_name, password_hash) VALUES (?, ?, ?, ?)',
+                    (user_id, email, display_name, get_password_hash(password))
+                )
+        except sqlite3.IntegrityError:
+            raise EmailAlreadyExistsError(email)
+        return user_id
+
+    def get_auth_user_by_email(self, email: str) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, email, display_name, password_hash FROM users WHERE email = ?', (email,)
+            ).fetchone()
+        if row is None:
+            raise UserNotFoundError(email)
+        return {
+            'uid': row['id'],
+            'email': row['email'],
+            'display_name': row['display_name'],
+            'password_hash': row['password_hash']
+        }
+
+    # ===== Users =====
+    def create_user(self, user_id: str, data: dict) -> None:
+        values = [_encode_value(data.get(column)) for column in USER_COLUMNS]
+        values[USER_COLUMNS.index('total_projects')] = data.get('total_projects', 0)
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT INTO users (id, email, display_name, total_projects, created_at, extra) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET email = excluded.email, '
+                'display_name = excluded.display_name, total_projects = excluded.total_projects, '
+                'created_at = excluded.created_at, extra = excluded.extra',
+                (user_id, *values, _dump_extra(data, USER_COLUMNS))
+            )
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+        if row is None:
+            return None
+        user = _load_extra(row['extra'])
+        for column in USER_COLUMNS:
+            user[column] = _decode_value(column, row[column])
+        return user
+
+    def increment_user_counter(self, user_id: str, field: str, amount: int) -> None:
+        if field != 'total_projects':
+            raise ValueError(f"Unsupported counter: {field}")
+        with self._transaction() as conn:
+            conn.execute(
+                'UPDATE users SET total_projects = total_projects + ? WHERE id = ?',
+                (amount, user_id)
+            )
+
+    # ===== Projects =====
+    def _row_to_project(self, row: sqlite3.Row) -> dict:
+        project = _load_extra(row['extra'])
+        for column in PROJECT_COLUMNS:
+            project[column] = _decode_value(column, row[column])
+        project['id'] = row['id']
+        project['sections'] = []
+        return project
+
+    def _attach_sections(self, projects: List[dict], with_versions: bool = True) -> None:
+        """Load sections and versions (or just version counts) for several projects in two queries"""
+        if not projects:
+            return
+        by_id = {project['id']: project for project in projects}
+        placeholders = ','.join('?' * len(by_id))
+        ids = list(by_id)
+
+        sections = {}
+        rows = self._conn.execute(
+            f'SELECT s.*, b.data AS blob FROM sections s LEFT JOIN blobs b ON b.hash = s.content_hash '
+            f'WHERE s.project_id IN ({placeholders}) ORDER BY s.project_id, s.position',
+            ids
+        ).fetchall()
+        for row in rows:
+            section = _load_extra(row['extra'])
+            section.update({
+                'id': row['id'],
+                'title': row['title'],
+                'content': _row_content(row),
+                'order': row['order'],
+                'versions': []
+            })
+            sections[(row['project_id'], row['id'])] = section
+            by_id[row['project_id']]['sections'].append(section)
+
+        if not with_versions:
+            for section in sections.values():
+                del section['versions']
+                section['version_count'] = 0
+            rows = self._conn.execute(
+                f'SELECT project_id, section_id, COUNT(*) AS count FROM versions '
+                f'WHERE project_id IN ({placeholders}) GROUP BY project_id, section_id',
+                ids
+            ).fetchall()
+            for row in rows:
+                section = sections.get((row['project_id'], row['section_id']))
+                if section is not None:
+                    section['version_count'] = row['count']
+            return
+
+        rows = self._conn.execute(
+            f'SELECT v.*, b.data AS blob FROM versions v LEFT JOIN blobs b ON b.hash = v.content_hash '
+            f'WHERE v.project_id IN ({placeholders}) ORDER BY v.project_id, v.section_id, v.version',
+            ids
+        ).fetchall()
+        for row in rows:
+            version = _load_extra(row['extra'])
+            version['version'] = row['version']
+            for column in VERSION_COLUMNS:
+                version[column] = _decode_value(column, row[column])
+            version['content'] = _row_content(row)
+            section = sections.get((row['project_id'], row['section_id']))
+            if section is not None:
+                section['versions'].append(version)
+
+    def list_projects(self, user_id: str, with_versions: bool = True) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM projects WHERE user_id = ?', (user_id,)).fetchall()
+            projects = [self._row_to_project(row) for row in rows]
+            self._attach_sections(projects, with_versions)
+        return projects
+
+    def get_project(self, project_id: str, with_versions: bool = True) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM projects WHERE id = ?', (project_id,)).fetchone()
+            if row is None:
+                return None
+            project = self._row_to_project(row)
+            self._attach_sections([project], with_versions)
+        return project
+
+    def list_versions(
+        self,
+        project_id: str,
+        section_id: str,
+        before: Optional[int] = None,
+        limit: int = 20
+    ) -> Optional[List[dict]]:
+        with self._lock:
+            exists = self._conn.execute(
+                'SELECT 1 FROM sections WHERE project_id = ? AND id = ?', (project_id, section_id)
+            ).fetchone()
+            if exists is None:
+                return None
+            # Content is never read for listings
+            rows = self._conn.execute(
+                'SELECT version, prompt, timestamp, feedback, comment, extra FROM versions '
+                'WHERE project_id = ? AND section_id = ? AND version < ? ORDER BY version DESC LIMIT ?',
+                (project_id, section_id, before if before is not None else 2 ** 62, limit)
+            ).fetchall()
+        versions = []
+        for row in rows:
+            version = _load_extra(row['extra'])
+            version['version'] = row['version']
+            for column in ('prompt', 'timestamp', 'feedback', 'comment'):
+                version[column] = _decode_value(column, row[column])
+            versions.append(version_metadata(version))
+        return versions
+
+    def get_version(self, project_id: str, section_id: str, version: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT v.*, b.data AS blob FROM versions v LEFT JOIN blobs b ON b.hash = v.content_hash '
+                'WHERE v.project_id = ? AND v.section_id = ? AND v.version = ?',
+                (project_id, section_id, version)
+            ).fetchone()
+        if row is None:
+            return None
+        data = _load_extra(row['extra'])
+        data['version'] = row['version']
+        for column in VERSION_COLUMNS:
+            data[column] = _decode_value(column, row[column])
+        data['content'] = _row_content(row)
+        return data
+
+    def list_project_ids(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute('SELECT id FROM projects').fetchall()
+        return [row['id'] for row in rows]
+
+    def _write_sections(self, conn: sqlite3.Connection, project_id: str, sections: List[dict]) -> None:
+        """Upsert the given sections and versions, removing any that are no longer present"""
+        section_ids = [section['id'] for section in sections]
+        placeholders = ','.join('?' * len(section_ids))
+        conn.execute(
+            f'DELETE FROM sections WHERE project_id = ? AND id NOT IN ({placeholders})',
+            (project_id, *section_ids)
+        )
+
+        blobs: Dict[str, str] = {}
+        for position, section in enumerate(sections):
+            conn.execute(
+                'INSERT INTO sections (project_id, id, position, title, content, content_hash, "order", extra) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (project_id, id) DO UPDATE SET position = excluded.position, '
+                'title = excluded.title, content = excluded.content, content_hash = excluded.content_hash, '
+                '"order" = excluded."order", extra = excluded.extra',
+                (
+                    project_id, section['id'], position, section.get('title', ''),
+                    *_store_content(section.get('content'), blobs), section.get('order', 0),
+                    _dump_extra(section, ('id', 'versions') + SECTION_COLUMNS)
+                )
+            )
+
+            versions = section.get('versions') or []
+            numbers = [version['version'] for version in versions]
+            version_placeholders = ','.join('?' * len(numbers))
+            conn.execute(
+                f'DELETE FROM versions WHERE project_id = ? AND section_id = ? AND version NOT IN ({version_placeholders})',
+                (project_id, section['id'], *numbers)
+            )
+            conn.executemany(
+                'INSERT INTO versions (project_id, section_id, version, content, content_hash, prompt, timestamp, '
+                'feedback, comment, extra) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (project_id, section_id, version) DO UPDATE SET content = excluded.content, '
+                'content_hash = excluded.content_hash, prompt = excluded.prompt, timestamp = excluded.timestamp, '
+                'feedback = excluded.feedback, comment = excluded.comment, extra = excluded.extra',
+                [
+                    (
+                        project_id, section['id'], version['version'],
+                        *_store_content(version.get('content'), blobs),
+                        *[_encode_value(version.get(column)) for column in VERSION_COLUMNS if column != 'content'],
+                        _dump_extra(version, ('version',) + VERSION_COLUMNS)
+                    )
+                    for version in versions
+                ]
+            )
+
+        # Text already stored by any project is shared, not written again
+        conn.executemany(
+            'INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)', list(blobs.items())
+        )
+
+    def _insert_project(self, conn: sqlite3.Connection, project_id: str, data: dict) -> None:
+        stamp_revisions(None, data)
+        conn.execute(
+            'INSERT INTO projects (id, user_id, title, doc_type, topic, description, created_at, updated_at, extra) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                project_id,
+                *[_encode_value(data.get(column)) for column in PROJECT_COLUMNS],
+                _dump_extra(data, ('id', 'sections') + PROJECT_COLUMNS)
+            )
+        )
+        self._write_sections(conn, project_id, data.get('sections', []))
+
+    def create_project(self, project_id: str, data: dict) -> None:
+        with self._transaction() as conn:
+            self._insert_project(conn, project_id, data)
+
+    def create_projects(self, user_id: str, projects: Dict[str, dict]) -> None:
+        with self._transaction() as conn:
+            for project_id, data in projects.items():
+                self._insert_project(conn, project_id, data)
+            conn.execute(
+                'UPDATE users SET total_projects = total_projects + ? WHERE id = ?',
+                (len(projects), user_id)
+            )
+
+    def get_projects(self, project_ids: List[str], with_versions: bool = True) -> List[dict]:
+        if not project_ids:
+            return []
+        placeholders = ','.join('?' * len(project_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT * FROM projects WHERE id IN ({placeholders})', project_ids
+            ).fetchall()
+            by_id = {row['id']: self._row_to_project(row) for row in rows}
+            self._attach_sections(list(by_id.values()), with_versions)
+        return [by_id[project_id] for project_id in project_ids if project_id in by_id]
+
+    def update_project(self, project_id: str, fields: dict) -> None:
+        with self._transaction() as conn:
+            # Read and stamp inside the write transaction so revisions are strictly ordered
+            current = self.get_project(project_id)
+            if current is None:
+                raise KeyError(f"Project not found: {project_id}")
+            stamp_revisions(current, fields)
+            row = conn.execute('SELECT extra FROM projects WHERE id = ?', (project_id,)).fetchone()
+
+            columns = {k: _encode_value(v) for k, v in fields.items() if k in PROJECT_COLUMNS}
+            extra = {k: v for k, v in fields.items() if k not in PROJECT_COLUMNS and k not in ('id', 'sections')}
+            if extra:
+                merged = _load_extra(row['extra'])
+                merged.update(extra)
+                columns['extra'] = json.dumps(merged, default=_json_default)
+
+            if columns:
+                assignments = ', '.join(f'{column} = ?' for column in columns)
+                conn.execute(
+                    f'UPDATE projects SET {assignments} WHERE id = ?',
+                    (*columns.values(), project_id)
+                )
+            if 'sections' in fields:
+                self._write_sections(conn, project_id, fields['sections'])
+
+    def update_version_fields(self, project_id: str, updates: Dict[Tuple[str, int], dict]) -> None:
+        """Targeted row updates: only the touched versions, their sections and the project revision"""
+        with self._transaction() as conn:
+            row = conn.execute('SELECT extra FROM projects WHERE id = ?', (project_id,)).fetchone()
+            if row is None:
+                return
+            extra = _load_extra(row['extra'])
+            revision = extra.get('revision', 0) + 1
+
+            touched = set()
+            for (section_id, version), fields in updates.items():
+                columns = {k: _encode_value(v) for k, v in fields.items() if k in VERSION_COLUMNS}
+                others = [(k, v) for k, v in fields.items() if k not in VERSION_COLUMNS and k != 'version']
+                assignments = ''.join(f'{column} = ?, ' for column in columns)
+                json_paths = ''.join(f", '$.{key}', ?" for key, _ in others)
+                cursor = conn.execute(
+                    f"UPDATE versions SET {assignments}extra = json_set(extra, '$.revision', ?{json_paths}) "
+                    'WHERE project_id = ? AND section_id = ? AND version = ?',
+                    (*columns.values(), revision, *[v for _, v in others], project_id, section_id, version)
+                )
+                if cursor.rowcount:
+                    touched.add(section_id)
+
+            if not touched:
+                return
+            placeholders = ','.join('?' * len(touched))
+            conn.execute(
+                f"UPDATE sections SET extra = json_set(extra, '$.revision', ?) "
+                f'WHERE project_id = ? AND id IN ({placeholders})',
+                (revision, project_id, *touched)
+            )
+            extra['revision'] = revision
+            conn.execute(
+                'UPDATE projects SET extra = ? WHERE id = ?',
+                (json.dumps(extra, default=_json_default), project_id)
+            )
+
+    def delete_project(self, project_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM projects WHERE id = ?', (project_id,))
+
+    def clone_project(self, project_id: str, new_id: str, fields: dict, with_versions: bool = True) -> bool:
+        """Copy rows with their blob hashes; no content is read or written"""
+        with self._transaction() as conn:
+            row = conn.execute('SELECT * FROM projects WHERE id = ?', (project_id,)).fetchone()
+            if row is None:
+                return False
+            data = clone_data(self._row_to_project(row), with_versions)
+            data.update(fields)
+            stamp_revisions(None, data)
+            conn.execute(
+                'INSERT INTO projects (id, user_id, title, doc_type, topic, description, created_at, updated_at, extra) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    new_id,
+                    *[_encode_value(data.get(column)) for column in PROJECT_COLUMNS],
+                    _dump_extra(data, ('id', 'sections') + PROJECT_COLUMNS)
+                )
+            )
+            conn.execute(
+                'INSERT INTO sections (project_id, id, position, title, content, content_hash, "order", extra) '
+                'SELECT ?, id, position, title, content, content_hash, "order", '
+                "json_set(json_remove(extra, '$.archive'), '$.revision', ?) "
+                'FROM sections WHERE project_id = ?',
+                (new_id, data['revision'], project_id)
+            )
+            if with_versions:
+                conn.execute(
+                    'INSERT INTO versions (project_id, section_id, version, content, content_hash, prompt, '
+                    'timestamp, feedback, comment, extra) '
+                    'SELECT ?, section_id, version, content, content_hash, prompt, timestamp, feedback, comment, '
+                    "json_set(extra, '$.revision', ?) FROM versions WHERE project_id = ?",
+                    (new_id, data['revision'], project_id)
+                )
+            conn.execute(
+                'UPDATE users SET total_projects = total_projects + 1 WHERE id = ?', (row['user_id'],)
+            )
+        return True
+
+    def collect_garbage(self) -> int:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'DELETE FROM blobs WHERE hash NOT IN '
+                '(SELECT content_hash FROM sections WHERE content_hash IS NOT NULL '
+                'UNION SELECT content_hash FROM versions WHERE content_hash IS NOT NULL)'
+            )
+        return cursor.rowcount
+
+    def delete_projects(self, user_id: str, project_ids: List[str]) -> List[str]:
+        if not project_ids:
+            return []
+        placeholders = ','.join('?' * len(project_ids))
+        with self._transaction() as conn:
+            rows = conn.execute(
+                f'SELECT id FROM projects WHERE user_id = ? AND id IN ({placeholders})',
+                (user_id, *project_ids)
+            ).fetchall()
+            owned = [row['id'] for row in rows]
+            if not owned:
+                return []
+            conn.execute(
+                f'DELETE FROM projects WHERE id IN ({",".join("?" * len(owned))})', owned
+            )
+            conn.execute(
+                'UPDATE users SET total_projects = total_projects - ? WHERE id = ?',
+                (len(owned), user_id)
+            )
+        return owned
+
+    # ===== Jobs =====
+    def save_job(self, job_id: str, data: dict) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, user_id, status, data, artifact, updated_at) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET status = excluded.status, data = excluded.data, '
+                'artifact = excluded.artifact, updated_at = excluded.updated_at',
+                (
+                    job_id, data['user_id'], data['status'],
+                    _dump_extra(data, ('artifact',)),
+                    data.get('artifact'),
+                    _encode_value(data.get('updated_at'))
+                )
+            )
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute('SELECT data, artifact FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = _load_extra(row['data'])
+        if row['artifact'] is not None:
+            job['artifact'] = row['artifact']
+        return job
+
+    def list_jobs(self, statuses: List[str], updated_before: Optional[datetime] = None) -> List[dict]:
+        if not statuses:
+            return []
+        query = f'SELECT data FROM jobs WHERE status IN ({",".join("?" * len(statuses))})'
+        params = list(statuses)
+        if updated_before is not None:
+            query += ' AND updated_at < ?'
+            params.append(_encode_value(updated_before))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [_load_extra(row['data']) for row in rows]
+
+    def delete_job(self, job_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+
+class _Transaction:
+    """Serializes access to the shared connection and wraps it in BEGIN/COMMIT"""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._lock.acquire()
+        self._conn.execute('BEGIN IMMEDIATE')
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self._lock.release()
+        return False
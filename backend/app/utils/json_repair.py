@@ -0,0 +1,80 @@
+import json
+import re
+from typing import Any, List, Optional
+
+_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$', re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+
+# Only the most recent cut points are tried; earlier ones lose too much content
+_MAX_CANDIDATES = 64
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove a surrounding ```json ... ``` block, if present"""
+    return _FENCE.sub('', text.strip()).strip()
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    Best-effort parse of model JSON output
+    - Strips code fences and prose before the first '{' or '['
+    - Drops trailing commas
+    - Recovers truncated output by cutting back to the last complete element
+      and closing any open brackets
+    Returns None when nothing usable can be recovered.
+    """
+    text = strip_code_fences(text)
+    start = min((i for i in (text.find('{'), text.find('[')) if i >= 0), default=-1)
+    if start < 0:
+        return None
+    text = text[start:]
+
+    for candidate in (text, _TRAILING_COMMA.sub(r'\1', text)):
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            pass
+
+    for cut, closers in reversed(_cut_points(text)[-_MAX_CANDIDATES:]):
+        candidate = _TRAILING_COMMA.sub(r'\1', text[:cut].rstrip().rstrip(',')) + closers
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+def _cut_points(text: str) -> List[tuple]:
+    """
+    Positions where the text can be truncated and closed into valid JSON,
+    each paired with the closing brackets needed at that point
+    """
+    points = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            if not stack:
+                break
+            stack.pop()
+            points.append((i + 1, ''.join(reversed(stack))))
+        elif char == ',':
+            # Everything before a separator is a complete element
+            points.append((i, ''.join(reversed(stack))))
+
+    return points
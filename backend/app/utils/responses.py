@@ -0,0 +1,101 @@
+import asyncio
+import gzip
+from datetime import datetime
+from typing import Any
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    # Firestore timestamps subclass datetime
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def fast_json(content: Any, status_code: int = 200) -> FastJSONResponse:
+    """
+    Build a JSON response directly from plain dicts/lists
+    Skips FastAPI's jsonable_encoder pass when orjson can serialize the content natively
+    """
+    if orjson is None:
+        content = jsonable_encoder(content)
+    return FastJSONResponse(content, status_code=status_code)
+
+
+# Only these are compressed; docx/pptx exports are zip archives already
+COMPRESSIBLE_MEDIA_TYPES = ('application/json', 'text/html')
+
+# Bodies at least this large are compressed off the event loop
+THREADED_COMPRESSION_SIZE = 128 * 1024
+
+
+class CompressionMiddleware:
+    """
+    Gzip complete JSON and HTML responses of at least `minimum_size` bytes
+    Streamed responses pass through untouched so they are never buffered, as do
+    all other media types and bodies that are already encoded.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or 'gzip' not in Headers(scope=scope).get('accept-encoding', ''):
+            await self.app(scope, receive, send)
+            return
+
+        held: dict = {}
+
+        async def send_compressed(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message['headers'])
+                media_type = headers.get('content-type', '').partition(';')[0].strip().lower()
+                if media_type in COMPRESSIBLE_MEDIA_TYPES and 'content-encoding' not in headers:
+                    # Decide on the first body chunk
+                    held['start'] = message
+                    return
+                await send(message)
+                return
+
+            start = held.pop('start', None)
+            if start is None:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            if message.get('more_body', False) or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= THREADED_COMPRESSION_SIZE:
+                body = await asyncio.to_thread(gzip.compress, body, self.compresslevel)
+            else:
+                body = gzip.compress(body, self.compresslevel)
+            headers = MutableHeaders(raw=start['headers'])
+            headers['Content-Encoding'] = 'gzip'
+            headers['Content-Length'] = str(len(body))
+            headers.add_vary_header('Accept-Encoding')
+            await send(start)
+            await send({**message, 'body': body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,25 @@
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def trim_to_tokens(text: str, budget: int, keep_tail: bool = False) -> str:
+    """
+    Trim text to roughly `budget` tokens, preferring to cut at a sentence or word boundary
+    Keeps the start of the text, or with keep_tail its end (context that leads into an edit).
+    """
+    if budget <= 0:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text
+    if keep_tail:
+        cut = text[-budget * 4:]
+        boundary = min([i for i in (cut.find('. ') + 1, cut.find('\n')) if i > 0], default=-1)
+        if 0 < boundary < len(cut) // 2:
+            return cut[boundary + 1:].strip()
+        return "..." + cut.split(' ', 1)[-1].strip()
+    cut = text[:budget * 4]
+    boundary = max(cut.rfind('. '), cut.rfind('\n'))
+    if boundary > len(cut) // 2:
+        return cut[:boundary + 1].strip()
+    return cut.rsplit(' ', 1)[0].strip() + "..."
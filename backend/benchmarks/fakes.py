@@ -0,0 +1,354 @@
+"""
+Deterministic stand-ins for Google services used by the benchmark harness
+- FakeGenerativeModel mimics google.generativeai.GenerativeModel
+- InMemoryFirestore mimics the subset of the Firestore client the app uses
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+_VOCABULARY = (
+    "market growth strategy customer value platform data insight revenue "
+    "team product risk impact research analysis model adoption quality "
+    "process scale design network policy energy cost efficiency trend "
+    "digital service partner channel outcome metric roadmap innovation"
+).split()
+
+
+class FakeResponse:
+    """Minimal response object exposing `.text` like the Gemini SDK"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Drop-in replacement for genai.GenerativeModel
+    Output is derived from a hash of the prompt, so identical runs produce identical text
+    """
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    output_words: int = 300
+    calls: int = 0
+
+    def __init__(self, model_name: str = "fake-model", system_instruction: Optional[str] = None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    @classmethod
+    def configure(cls, latency_ms: float = 0.0, jitter_ms: float = 0.0, output_words: int = 300):
+        """Set latency and output size for every fake model instance"""
+        cls.latency_ms = latency_ms
+        cls.jitter_ms = jitter_ms
+        cls.output_words = output_words
+        cls.calls = 0
+
+    def _prompt_text(self, prompt) -> str:
+        """User turn followed by the system instruction, which is what the output depends on"""
+        text = prompt if isinstance(prompt, str) else json.dumps(prompt, default=str)
+        if self.system_instruction:
+            text += "\n\n" + self.system_instruction
+        return text
+
+    def _delay(self, rng: random.Random) -> float:
+        jitter = rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    def generate_content(self, prompt, generation_config: Optional[dict] = None, **kwargs) -> FakeResponse:
+        """Blocking call, matching the behaviour of the real SDK"""
+        prompt_text = self._prompt_text(prompt)
+        rng = random.Random(hashlib.sha256(prompt_text.encode()).hexdigest())
+        type(self).calls += 1
+        time.sleep(self._delay(rng))
+        return FakeResponse(self._render(prompt_text, rng))
+
+    async def generate_content_async(self, prompt, generation_config: Optional[dict] = None, **kwargs) -> FakeResponse:
+        """Non-blocking variant used by the SDK's async API"""
+        prompt_text = self._prompt_text(prompt)
+        rng = random.Random(hashlib.sha256(prompt_text.encode()).hexdigest())
+        type(self).calls += 1
+        await asyncio.sleep(self._delay(rng))
+        return FakeResponse(self._render(prompt_text, rng))
+
+    def _words(self, rng: random.Random, count: int) -> List[str]:
+        return [rng.choice(_VOCABULARY) for _ in range(count)]
+
+    def _sentence(self, rng: random.Random, count: int) -> str:
+        words = self._words(rng, max(count, 1))
+        return " ".join(words).capitalize() + "."
+
+    def _render(self, prompt: str, rng: random.Random) -> str:
+        if "SECTIONS TO WRITE:" in prompt:
+            return self._render_packed(prompt, rng)
+        if "valid JSON" in prompt and '"sections"' in prompt:
+            return self._render_outline(prompt, rng)
+        if prompt.startswith("Summarize"):
+            match = re.search(r"at most (\d+) words", prompt)
+            return self._sentence(rng, int(match.group(1)) if match else 50)
+        if "bullet points" in prompt:
+            return "\n".join(f"- {self._sentence(rng, 18)}" for _ in range(5))
+
+        paragraphs = []
+        remaining = self._edited_words(prompt) or self.output_words
+        while remaining > 0:
+            size = min(remaining, 60)
+            sentences = []
+            while size > 0:
+                length = min(size, rng.randint(8, 16))
+                sentences.append(self._sentence(rng, length))
+                size -= length
+            paragraphs.append(" ".join(sentences))
+            remaining -= 60
+        return "\n\n".join(paragraphs)
+
+    def _edited_words(self, prompt: str) -> int:
+        """Length of the text a refinement prompt asks to edit (edits roughly preserve length)"""
+        match = re.search(r"(?:ORIGINAL CONTENT|PART TO EDIT|SELECTED PASSAGE):\n(.*?)\n\n(?:[A-Z][A-Z ]+(?::| \()|Return the)", prompt, re.DOTALL)
+        return len(match.group(1).split()) if match else 0
+
+    def _render_outline(self, prompt: str, rng: random.Random) -> str:
+        match = re.search(r"exactly (\d+)", prompt)
+        count = int(match.group(1)) if match else 5
+        sections = [
+            {
+                "title": " ".join(self._words(rng, 3)).title(),
+                "description": self._sentence(rng, 20),
+                "key_points": [self._sentence(rng, 5) for _ in range(3)],
+            }
+            for _ in range(count)
+        ]
+        return json.dumps({"title": " ".join(self._words(rng, 4)).title(), "sections": sections})
+
+    def _render_packed(self, prompt: str, rng: random.Random) -> str:
+        listing = prompt.split("SECTIONS TO WRITE:", 1)[1].split("\n\n", 1)[0]
+        ids = [int(i) for i in re.findall(r"^(\d+)\. ", listing, re.MULTILINE)]
+        sections = []
+        for entry_id in ids:
+            if "bullet points" in prompt:
+                content = "\n".join(f"- {self._sentence(rng, 18)}" for _ in range(5))
+            else:
+                content = self._render("", rng)
+            sections.append({"id": entry_id, "content": content})
+        return json.dumps({"sections": sections})
+
+
+class _DocumentSnapshot:
+    def __init__(self, doc_id: str, data: Optional[dict], update_time: Optional[datetime] = None,
+                 reference: Optional["_DocumentReference"] = None):
+        self.id = doc_id
+        self._data = data
+        self.update_time = update_time
+        self.reference = reference
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class _DocumentReference:
+    def __init__(self, store: "InMemoryFirestore", collection: str, doc_id: str):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self, transaction: Optional["_Transaction"] = None) -> _DocumentSnapshot:
+        with self._store._lock:
+            data = self._store._data.get(self._collection, {}).get(self.id)
+            update_time = self._store._update_times.get((self._collection, self.id))
+            if transaction is not None:
+                transaction._reads.setdefault((self._collection, self.id), update_time)
+            return _DocumentSnapshot(self.id, copy.deepcopy(data), update_time, self)
+
+    def _touch(self):
+        # Strictly increasing, so transactions can tell any two writes apart
+        now = max(datetime.now(timezone.utc), self._store._last_write + timedelta(microseconds=1))
+        self._store._last_write = now
+        self._store._update_times[(self._collection, self.id)] = now
+
+    def set(self, data: dict, merge: bool = False):
+        with self._store._lock:
+            docs = self._store._data.setdefault(self._collection, {})
+            if merge and self.id in docs:
+                docs[self.id].update(copy.deepcopy(data))
+            else:
+                docs[self.id] = copy.deepcopy(data)
+            self._touch()
+
+    def update(self, fields: dict):
+        with self._store._lock:
+            docs = self._store._data.get(self._collection, {})
+            if self.id not in docs:
+                raise KeyError(f"No document to update: {self._collection}/{self.id}")
+            doc = docs[self.id]
+            for key, value in fields.items():
+                if type(value).__name__ == "Increment":
+                    doc[key] = doc.get(key, 0) + value.value
+                else:
+                    doc[key] = copy.deepcopy(value)
+            self._touch()
+
+    def delete(self, option: Optional[dict] = None):
+        with self._store._lock:
+            if option is not None:
+                current = self._store._update_times.get((self._collection, self.id))
+                if current != option['last_update_time']:
+                    from google.api_core.exceptions import FailedPrecondition
+                    raise FailedPrecondition(f"Document changed: {self._collection}/{self.id}")
+            self._store._data.get(self._collection, {}).pop(self.id, None)
+            self._store._update_times.pop((self._collection, self.id), None)
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "<": lambda a, b: a is not None and a < b,
+}
+
+
+class _Query:
+    def __init__(self, store: "InMemoryFirestore", collection: str, filters: List[tuple],
+                 fields: Optional[List[str]] = None):
+        self._store = store
+        self._collection = collection
+        self._filters = filters
+        self._fields = fields
+
+    def where(self, field: str, op: str, value: Any) -> "_Query":
+        if op not in _OPERATORS:
+            raise NotImplementedError(f"Unsupported operator: {op}")
+        return _Query(self._store, self._collection, self._filters + [(field, op, value)], self._fields)
+
+    def select(self, fields: List[str]) -> "_Query":
+        return _Query(self._store, self._collection, self._filters, list(fields))
+
+    def stream(self):
+        with self._store._lock:
+            docs = list(self._store._data.get(self._collection, {}).items())
+            update_times = dict(self._store._update_times)
+        for doc_id, data in docs:
+            if all(
+                field in data and _OPERATORS[op](data[field], value)
+                for field, op, value in self._filters
+            ):
+                if self._fields is not None:
+                    data = {k: v for k, v in data.items() if k in self._fields}
+                yield _DocumentSnapshot(
+                    doc_id, copy.deepcopy(data), update_times.get((self._collection, doc_id)),
+                    _DocumentReference(self._store, self._collection, doc_id)
+                )
+
+
+class _CollectionReference(_Query):
+    def __init__(self, store: "InMemoryFirestore", collection: str):
+        super().__init__(store, collection, [])
+
+    def document(self, doc_id: Optional[str] = None) -> _DocumentReference:
+        return _DocumentReference(self._store, self._collection, doc_id or uuid.uuid4().hex)
+
+
+class _WriteBatch:
+    """Buffers writes and applies them together on commit"""
+
+    def __init__(self, store: "InMemoryFirestore"):
+        self._store = store
+        self._writes: List[tuple] = []
+
+    def set(self, ref: _DocumentReference, data: dict, merge: bool = False):
+        self._writes.append((ref.set, (data, merge)))
+
+    def update(self, ref: _DocumentReference, fields: dict):
+        self._writes.append((ref.update, (fields,)))
+
+    def delete(self, ref: _DocumentReference):
+        self._writes.append((ref.delete, ()))
+
+    def commit(self):
+        with self._store._lock:
+            self._store.batch_commits += 1
+            for write, args in self._writes:
+                write(*args)
+        self._writes = []
+
+
+class _Transaction(_WriteBatch):
+    """
+    Optimistic transaction, driven by firestore.transactional
+    Commit aborts (and the decorator retries) if a document read in the
+    transaction has been written since.
+    """
+
+    _max_attempts = 5
+    _read_only = False
+
+    def __init__(self, store: "InMemoryFirestore"):
+        super().__init__(store)
+        self._reads: Dict[tuple, Optional[datetime]] = {}
+        self._id = None
+
+    def _clean_up(self):
+        self._writes = []
+        self._reads = {}
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        with self._store._lock:
+            for key, update_time in self._reads.items():
+                if self._store._update_times.get(key) != update_time:
+                    self._clean_up()
+                    from google.api_core.exceptions import Aborted
+                    raise Aborted(f"Document changed: {'/'.join(key)}")
+            self._store.transaction_commits += 1
+            for write, args in self._writes:
+                write(*args)
+        self._clean_up()
+
+    def _rollback(self):
+        self._clean_up()
+
+
+class InMemoryFirestore:
+    """
+    Thread-safe in-memory replacement for firestore.Client
+    Documents are deep-copied on every read and write, like a real round trip
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.RLock()
+        self._update_times: Dict[tuple, datetime] = {}
+        self._last_write = datetime.min.replace(tzinfo=timezone.utc)
+        self.batch_commits = 0
+        self.transaction_commits = 0
+
+    def collection(self, name: str) -> _CollectionReference:
+        return _CollectionReference(self, name)
+
+    def batch(self) -> _WriteBatch:
+        return _WriteBatch(self)
+
+    def transaction(self) -> _Transaction:
+        return _Transaction(self)
+
+    def write_option(self, last_update_time: datetime) -> dict:
+        return {'last_update_time': last_update_time}
+
+    def get_all(self, refs: List[_DocumentReference], field_paths: Optional[List[str]] = None):
+        for ref in refs:
+            snapshot = ref.get()
+            if field_paths is not None and snapshot.exists:
+                snapshot = _DocumentSnapshot(ref.id, {k: v for k, v in snapshot.to_dict().items() if k in field_paths})
+            yield snapshot
@@ -0,0 +1,314 @@
+"""
+Offline load test for the FastAPI backend
+Runs the real app in-process against a fake Gemini model and an in-memory Firestore,
+drives a weighted mix of user traffic and reports latency percentiles per endpoint.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --requests 500 --concurrency 16 --latency-ms 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.fakes import FakeGenerativeModel, InMemoryFirestore
+
+DEFAULT_MIX = "create=10,outline=10,generate=30,refine=20,feedback=20,export=10"
+
+REFINE_PROMPTS = [
+    "Make this more formal",
+    "Shorten this to the key points",
+    "Add a concrete example",
+    "Make the tone more persuasive",
+]
+
+
+def install_fakes(storage_kind: str = "memory"):
+    """
+    Replace Gemini with a fake model and install an offline storage backend
+    Must run before `app.main` is imported
+    """
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+    import google.generativeai as genai
+    genai.GenerativeModel = FakeGenerativeModel
+
+    from app.storage import set_storage
+    if storage_kind == "sqlite":
+        from app.storage.sqlite_storage import SQLiteStorage
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+        storage = SQLiteStorage(path)
+    else:
+        from app.storage.firestore_storage import FirestoreStorage
+        storage = FirestoreStorage(db=InMemoryFirestore())
+    set_storage(storage)
+    return storage
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    """Parse 'create=10,generate=30' into a weight table"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+class VirtualUser:
+    """One simulated editor working on their own projects"""
+
+    def __init__(self, client, token: str, rng: random.Random, samples: list):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.rng = rng
+        self.samples = samples
+        self.projects: List[dict] = []
+
+    async def _call(self, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        elapsed = time.perf_counter() - start
+        self.samples.append((label, elapsed, response.status_code))
+        return response
+
+    def _pick_section(self, predicate) -> Optional[Tuple[dict, dict]]:
+        candidates = [
+            (project, section)
+            for project in self.projects
+            for section in project["sections"]
+            if predicate(section)
+        ]
+        return self.rng.choice(candidates) if candidates else None
+
+    async def create(self):
+        doc_type = self.rng.choice(["docx", "pptx"])
+        count = self.rng.randint(4, 8)
+        payload = {
+            "title": f"Benchmark {doc_type} {len(self.projects) + 1}",
+            "doc_type": doc_type,
+            "topic": f"Benchmark topic {self.rng.randint(1, 1000)}",
+            "sections": [
+                {"title": f"Section {i + 1}", "content": "", "order": i}
+                for i in range(count)
+            ],
+        }
+        response = await self._call("POST /api/projects/", "POST", "/api/projects/", json=payload)
+        if response.status_code == 201:
+            data = response.json()
+            self.projects.append({
+                "id": data["id"],
+                "doc_type": doc_type,
+                "sections": [{"id": s["id"], "versions": 0} for s in data["sections"]],
+            })
+
+    async def outline(self):
+        payload = {
+            "topic": f"Benchmark topic {self.rng.randint(1, 1000)}",
+            "doc_type": self.rng.choice(["docx", "pptx"]),
+            "num_sections": self.rng.randint(3, 10),
+        }
+        await self._call("POST /api/generate/outline", "POST", "/api/generate/outline", json=payload)
+
+    async def generate(self):
+        picked = self._pick_section(lambda s: True)
+        if picked is None:
+            return await self.create()
+        project, section = picked
+        payload = {
+            "project_id": project["id"],
+            "section_id": section["id"],
+            "tone": self.rng.choice(["professional", "casual", "academic"]),
+        }
+        response = await self._call("POST /api/generate/content", "POST", "/api/generate/content", json=payload)
+        if response.status_code == 200:
+            section["versions"] = response.json()["version"]
+
+    async def refine(self):
+        picked = self._pick_section(lambda s: s["versions"] > 0)
+        if picked is None:
+            return await self.generate()
+        project, section = picked
+        payload = {
+            "project_id": project["id"],
+            "section_id": section["id"],
+            "refinement_prompt": self.rng.choice(REFINE_PROMPTS),
+        }
+        response = await self._call("POST /api/refine/refine", "POST", "/api/refine/refine", json=payload)
+        if response.status_code == 200:
+            section["versions"] = response.json()["version"]
+
+    async def feedback(self):
+        picked = self._pick_section(lambda s: s["versions"] > 0)
+        if picked is None:
+            return await self.generate()
+        project, section = picked
+        payload = {
+            "project_id": project["id"],
+            "section_id": section["id"],
+            "version": self.rng.randint(1, section["versions"]),
+            "feedback": self.rng.choice(["like", "dislike", None]),
+            "comment": self.rng.choice(["", "Looks good", "Too long"]),
+        }
+        await self._call("POST /api/refine/feedback", "POST", "/api/refine/feedback", json=payload)
+
+    async def export(self):
+        if not self.projects:
+            return await self.create()
+        project = self.rng.choice(self.projects)
+        doc_type = project["doc_type"]
+        await self._call(
+            f"POST /api/export/{doc_type}", "POST", f"/api/export/{doc_type}",
+            json={"project_id": project["id"]}
+        )
+
+
+OPERATIONS = {
+    "create": VirtualUser.create,
+    "outline": VirtualUser.outline,
+    "generate": VirtualUser.generate,
+    "refine": VirtualUser.refine,
+    "feedback": VirtualUser.feedback,
+    "export": VirtualUser.export,
+}
+
+
+async def run_load(
+    total_requests: int,
+    concurrency: int,
+    mix: Dict[str, int],
+    seed: int,
+    storage,
+) -> Tuple[list, float]:
+    """Drive the app in-process and return (samples, wall-clock seconds)"""
+    import httpx
+    from app.core.security import create_access_token
+    from app.main import app
+
+    # Per-request INFO logs would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+
+    samples: list = []
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            users = []
+            for i in range(concurrency):
+                user_id = f"bench-user-{i}"
+                storage.create_user(user_id, {
+                    "email": f"{user_id}@example.com",
+                    "display_name": user_id,
+                    "total_projects": 0,
+                })
+                token = create_access_token({"sub": user_id, "email": f"{user_id}@example.com"})
+                users.append(VirtualUser(client, token, random.Random(seed * 1000 + i), samples))
+
+            per_user = [total_requests // concurrency] * concurrency
+            for i in range(total_requests % concurrency):
+                per_user[i] += 1
+
+            async def drive(user: VirtualUser, count: int):
+                # Every user starts with one project so other operations have a target
+                await user.create()
+                for _ in range(count - 1):
+                    name = user.rng.choices(names, weights)[0]
+                    await OPERATIONS[name](user)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(drive(u, n) for u, n in zip(users, per_user) if n > 0))
+            wall = time.perf_counter() - start
+
+    return samples, wall
+
+
+def summarize(samples: list, wall: float) -> Dict[str, dict]:
+    """Aggregate raw samples into per-endpoint statistics"""
+    grouped: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+    for label, elapsed, status in samples:
+        grouped[label].append((elapsed, status))
+
+    report = {}
+    for label in sorted(grouped):
+        latencies = sorted(elapsed * 1000 for elapsed, _ in grouped[label])
+        errors = sum(1 for _, status in grouped[label] if status >= 400)
+        report[label] = {
+            "count": len(latencies),
+            "errors": errors,
+            "throughput_rps": len(latencies) / wall if wall else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1],
+        }
+    return report
+
+
+def format_report(report: Dict[str, dict], wall: float, total: int) -> str:
+    header = f"{'endpoint':<28}{'count':>7}{'err':>5}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    lines = [header, "-" * len(header)]
+    for label, stats in report.items():
+        lines.append(
+            f"{label:<28}{stats['count']:>7}{stats['errors']:>5}{stats['throughput_rps']:>9.1f}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}"
+        )
+    lines.append("-" * len(header))
+    lines.append(f"{total} requests in {wall:.2f}s ({total / wall if wall else 0:.1f} req/s)")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline load test with fake Gemini and in-memory Firestore")
+    parser.add_argument("--requests", type=int, default=300, help="Total number of requests to issue")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent virtual users")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated Gemini latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Deterministic +/- jitter on Gemini latency")
+    parser.add_argument("--output-words", type=int, default=300, help="Words per generated docx section")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for traffic and content generation")
+    parser.add_argument("--storage", choices=["memory", "sqlite"], default="memory",
+                        help="In-memory Firestore stand-in or a temporary SQLite database")
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    storage = install_fakes(args.storage)
+    FakeGenerativeModel.configure(args.latency_ms, args.jitter_ms, args.output_words)
+
+    samples, wall = asyncio.run(run_load(args.requests, args.concurrency, mix, args.seed, storage))
+    report = summarize(samples, wall)
+    print(format_report(report, wall, len(samples)))
+    print(f"Gemini calls: {FakeGenerativeModel.calls}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({
+                "config": vars(args),
+                "wall_seconds": wall,
+                "gemini_calls": FakeGenerativeModel.calls,
+                "endpoints": report,
+            }, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
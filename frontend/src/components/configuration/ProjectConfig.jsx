@@ -2,7 +2,7 @@ import { useState } from 'react';
 import {
   Box, Button, FormControl, FormLabel, Input, Textarea,
   VStack, HStack, Radio, RadioGroup, Stack, useToast, Heading,
-  Card, CardBody, IconButton, Text, Badge, Radio as ChakraRadio
+  Card, CardBody, IconButton, Text, Badge, Checkbox, Radio as ChakraRadio
 } from '@chakra-ui/react';
 import { AddIcon, DeleteIcon, CheckIcon } from '@chakra-ui/icons';
 import { useNavigate } from 'react-router-dom';
@@ -20,6 +20,7 @@ export const ProjectConfig = () => {
   const [numSections, setNumSections] = useState(5);
   const [isGeneratingOutline, setIsGeneratingOutline] = useState(false);
   const [aiOutline, setAiOutline] = useState(null);
+  const [pregenerate, setPregenerate] = useState(false);
   
   const toast = useToast();
   const navigate = useNavigate();
@@ -119,6 +120,7 @@ export const ProjectConfig = () => {
         doc_type: docType,
         topic,
         description,
+        pregenerate,
         sections: sections.map((s, idx) => ({
           title: s.title,
           content: s.content,
@@ -311,6 +313,13 @@ export const ProjectConfig = () => {
                     Add {docType === 'docx' ? 'Section' : 'Slide'} Manually
                   </Button>
 
+                  <Checkbox
+                    isChecked={pregenerate}
+                    onChange={(e) => setPregenerate(e.target.checked)}
+                  >
+                    Draft empty {docType === 'docx' ? 'sections' : 'slides'} in the background
+                  </Checkbox>
+
                   <HStack spacing={4}>
                     <Button onClick={() => setStep(1)} variant="outline">
                       Back
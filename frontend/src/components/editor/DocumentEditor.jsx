@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { projectsAPI, exportAPI } from '../../services/api';
+import { projectsAPI, exportAPI, projectEvents } from '../../services/api';
 import {
   Box, Button, VStack, HStack, Heading, useToast,
   Spinner, Center, Badge, Divider
@@ -14,12 +14,69 @@ export const DocumentEditor = () => {
   const [project, setProject] = useState(null);
   const [loading, setLoading] = useState(true);
   const [exporting, setExporting] = useState(false);
+  const [live, setLive] = useState(false);
   const toast = useToast();
 
   useEffect(() => {
     loadProject();
   }, [projectId]);
 
+  // Apply pushed section-level changes instead of re-fetching the whole project
+  useEffect(() => {
+    return projectEvents.subscribe(projectId, applyEvent, setLive);
+  }, [projectId]);
+
+  const updateSection = (sectionId, update) => {
+    setProject((current) => current && {
+      ...current,
+      sections: current.sections.map((section) =>
+        section.id === sectionId ? { ...section, ...update(section) } : section
+      ),
+    });
+  };
+
+  const applyEvent = (event) => {
+    switch (event.type) {
+      case 'version_added':
+        updateSection(event.section_id, (section) => ({
+          content: event.content,
+          versions: event.replaces_history
+            ? [event.version]
+            : [...(section.versions || []), event.version],
+        }));
+        break;
+      case 'feedback_changed':
+        updateSection(event.section_id, (section) => ({
+          versions: (section.versions || []).map((version) =>
+            version.version === event.version
+              ? { ...version, feedback: event.feedback, comment: event.comment }
+              : version
+          ),
+        }));
+        break;
+      case 'reverted':
+        updateSection(event.section_id, () => ({ content: event.content }));
+        break;
+      case 'section_added':
+        setProject((current) => current && {
+          ...current,
+          sections: [...current.sections, event.section],
+        });
+        break;
+      case 'project_updated':
+        setProject((current) => current && { ...current, ...event.changes });
+        break;
+      case 'project_deleted':
+        navigate('/dashboard');
+        break;
+      case 'resync':
+        loadProject();
+        break;
+      default:
+        break;
+    }
+  };
+
   const loadProject = async () => {
     try {
       const response = await projectsAPI.get(projectId);
@@ -168,7 +225,7 @@ export const DocumentEditor = () => {
                 section={section}
                 projectId={projectId}
                 projectTopic={project.topic}
-                onUpdate={loadProject}
+                onUpdate={live ? () => {} : loadProject}
               />
             ))}
         </VStack>
@@ -102,7 +102,7 @@ export const SectionCard = ({ section, projectId, projectTopic, onUpdate }) => {
       await refineAPI.feedback({
         project_id: projectId,
         section_id: section.id,
-        version: section.versions?.length || 1,
+        version: section.versions?.[section.versions.length - 1]?.version || 1,
         feedback: feedback, // Can be 'like', 'dislike', or null (for comment-only)
         comment: comment
       });
@@ -176,7 +176,7 @@ export const SectionCard = ({ section, projectId, projectTopic, onUpdate }) => {
 
           <HStack>
             <Badge colorScheme="purple">
-              {section.versions?.length || 0} versions
+              {(section.versions?.length || 0) + (section.archive?.count || 0)} versions
             </Badge>
             {isEditing ? (
               <>
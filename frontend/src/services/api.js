@@ -40,11 +40,17 @@ export const authAPI = {
 };
 
 export const projectsAPI = {
-  list: () => api.get('/api/projects'),
+  // The dashboard only shows section counts, so skip content and history
+  list: () => api.get('/api/projects', { params: { include: '' } }),
   create: (data) => api.post('/api/projects', data),
   get: (id) => api.get(`/api/projects/${id}`),
   update: (id, data) => api.put(`/api/projects/${id}`, data),
   delete: (id) => api.delete(`/api/projects/${id}`),
+  search: (q, limit = 20) => api.get('/api/search', { params: { q, limit } }),
+  bulkCreate: (projects) => api.post('/api/projects/bulk', { projects }),
+  clone: (id, data = {}) => api.post(`/api/projects/${id}/clone`, data),
+  duplicate: (projectIds) => api.post('/api/projects/bulk/duplicate', { project_ids: projectIds }),
+  bulkDelete: (projectIds) => api.post('/api/projects/bulk/delete', { project_ids: projectIds }),
 };
 
 export const generateAPI = {
@@ -71,4 +77,28 @@ export const exportAPI = {
     api.post('/api/export/pptx', { project_id: projectId }, {
       responseType: 'blob'
     }),
+  preview: (projectId) =>
+    api.get(`/api/export/preview/${projectId}`, { responseType: 'text' }),
+};
+
+// Live project updates pushed over a WebSocket instead of re-fetching the project
+export const projectEvents = {
+  subscribe: (projectId, onEvent, onStatus) => {
+    const token = localStorage.getItem('access_token');
+    const wsBase = API_BASE_URL.replace(/^http/, 'ws');
+    const socket = new WebSocket(
+      `${wsBase}/api/projects/${projectId}/ws?token=${encodeURIComponent(token || '')}`
+    );
+
+    socket.onopen = () => onStatus?.(true);
+    socket.onclose = () => onStatus?.(false);
+    socket.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      if (event.type !== 'ping') {
+        onEvent(event);
+      }
+    };
+
+    return () => socket.close();
+  },
 };